@@ -18,6 +18,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from alembic import context
 from sqlalchemy.ext.asyncio import create_async_engine
 from app.db.database import Base
+import app.models  # noqa: F401 - регистрирует модели в Base.metadata
 from app.config import settings
 
 config = context.config
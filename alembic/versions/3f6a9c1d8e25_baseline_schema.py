@@ -0,0 +1,119 @@
+"""baseline schema: users, audios, upload_sessions
+
+Revision ID: 3f6a9c1d8e25
+Revises: b20f86ff90a1
+Create Date: 2026-10-18 11:00:00.000000
+
+Ревизия b20f86ff90a1 пустая: таблицы раньше создавал create_all при
+старте приложения. На такой базе создаются только недостающие таблицы,
+уникальность (owner_id, name) у аудио и частичный индекс активных email
+вместо idx_user_email_active; на пустой базе — вся схема.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6a9c1d8e25'
+down_revision: Union[str, None] = 'b20f86ff90a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_users() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=True),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.Column('yandex_id', sa.String(length=50), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('is_superuser', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username'),
+        sa.UniqueConstraint('yandex_id')
+    )
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+
+def _create_audios() -> None:
+    op.create_table(
+        'audios',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('path', sa.String(), nullable=True),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('owner_id', 'name', name='uq_audios_owner_name')
+    )
+    op.create_index('ix_audios_id', 'audios', ['id'], unique=False)
+    op.create_index('ix_audios_name', 'audios', ['name'], unique=False)
+
+
+def _create_upload_sessions() -> None:
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('chunk_size', sa.Integer(), nullable=False),
+        sa.Column('total_size', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_upload_sessions_owner_id', 'upload_sessions', ['owner_id'], unique=False)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'users' not in tables:
+        _create_users()
+        user_indexes = set()
+    else:
+        user_indexes = {index['name'] for index in inspector.get_indexes('users')}
+        if 'idx_user_email_active' in user_indexes:
+            op.drop_index('idx_user_email_active', table_name='users')
+    if 'ix_users_active_email' not in user_indexes:
+        op.create_index(
+            'ix_users_active_email', 'users', ['email'],
+            unique=False,
+            postgresql_where=sa.text('is_active'),
+            sqlite_where=sa.text('is_active')
+        )
+
+    if 'audios' not in tables:
+        _create_audios()
+    elif 'uq_audios_owner_name' not in {c['name'] for c in inspector.get_unique_constraints('audios')}:
+        # Повторные имена у одного владельца, допущенные до ограничения, получают суффикс с id
+        op.execute(
+            "UPDATE audios SET name = name || ' (' || CAST(id AS VARCHAR) || ')' "
+            "WHERE id NOT IN (SELECT MIN(id) FROM audios GROUP BY owner_id, name)"
+        )
+        with op.batch_alter_table('audios') as batch_op:
+            batch_op.create_unique_constraint('uq_audios_owner_name', ['owner_id', 'name'])
+
+    if 'upload_sessions' not in tables:
+        _create_upload_sessions()
+
+
+def downgrade() -> None:
+    op.drop_index('ix_upload_sessions_owner_id', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
+    op.drop_index('ix_audios_name', table_name='audios')
+    op.drop_index('ix_audios_id', table_name='audios')
+    op.drop_table('audios')
+    op.drop_index('ix_users_active_email', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,39 @@
+"""audios owner/created_at keyset index
+
+Revision ID: 5c1e9a7d2f43
+Revises: 3f6a9c1d8e25
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7d2f43'
+down_revision: Union[str, None] = '3f6a9c1d8e25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_audios_owner_created_id',
+            'audios',
+            ['owner_id', 'created_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_audios_owner_created_id',
+            table_name='audios',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
@@ -0,0 +1,42 @@
+"""content addressed blobs
+
+Revision ID: 8d4b0f6a1c27
+Revises: 5c1e9a7d2f43
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4b0f6a1c27'
+down_revision: Union[str, None] = '5c1e9a7d2f43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('path', sa.String(), nullable=False),
+        sa.Column('refcount', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    with op.batch_alter_table('audios') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_audios_content_hash', ['content_hash'], unique=False)
+        batch_op.create_foreign_key('fk_audios_content_hash_blobs', 'blobs', ['content_hash'], ['sha256'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('audios') as batch_op:
+        batch_op.drop_constraint('fk_audios_content_hash_blobs', type_='foreignkey')
+        batch_op.drop_index('ix_audios_content_hash')
+        batch_op.drop_column('content_hash')
+    op.drop_table('blobs')
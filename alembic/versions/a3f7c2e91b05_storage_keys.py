@@ -0,0 +1,32 @@
+"""storage keys instead of local paths
+
+Revision ID: a3f7c2e91b05
+Revises: 8d4b0f6a1c27
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f7c2e91b05'
+down_revision: Union[str, None] = '8d4b0f6a1c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Пути вида static/... становятся ключами относительно STORAGE_LOCAL_ROOT
+    for table in ('audios', 'blobs'):
+        op.execute(
+            f"UPDATE {table} SET path = substr(path, 8) WHERE path LIKE 'static/%'"
+        )
+
+
+def downgrade() -> None:
+    for table in ('audios', 'blobs'):
+        op.execute(
+            f"UPDATE {table} SET path = 'static/' || path WHERE path NOT LIKE 'static/%'"
+        )
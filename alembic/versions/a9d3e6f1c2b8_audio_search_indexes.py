@@ -0,0 +1,57 @@
+"""audio name full-text and trigram search indexes
+
+Revision ID: a9d3e6f1c2b8
+Revises: f2c8a5e07d14
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3e6f1c2b8'
+down_revision: Union[str, None] = 'f2c8a5e07d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Должно совпадать с app.models.audio.search_document
+SEARCH_DOCUMENT = "to_tsvector('simple'::regconfig, translate(name, '._-', '   '))"
+
+
+def upgrade() -> None:
+    # В SQLite поиск идёт по индексу в памяти процесса (app.services.search_index)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_audios_search',
+            'audios',
+            ['owner_id', sa.text(SEARCH_DOCUMENT)],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'ix_audios_name_trgm',
+            'audios',
+            ['owner_id', 'name'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_audios_name_trgm', table_name='audios', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_audios_search', table_name='audios', postgresql_concurrently=True, if_exists=True)
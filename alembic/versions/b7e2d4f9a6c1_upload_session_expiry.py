@@ -0,0 +1,41 @@
+"""expiry of resumable upload sessions
+
+Revision ID: b7e2d4f9a6c1
+Revises: e5b9c7a3d1f8
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d4f9a6c1'
+down_revision: Union[str, None] = 'e5b9c7a3d1f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Существующие загрузки получают сутки с момента создания (UPLOAD_SESSION_TTL_HOURS по умолчанию)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("UPDATE upload_sessions SET expires_at = COALESCE(created_at, now()) + interval '24 hours'")
+    else:
+        op.execute(
+            "UPDATE upload_sessions SET expires_at = datetime(COALESCE(created_at, CURRENT_TIMESTAMP), '+24 hours')"
+        )
+
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.alter_column('expires_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+        batch_op.create_index('ix_upload_sessions_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.drop_index('ix_upload_sessions_expires_at')
+        batch_op.drop_column('expires_at')
@@ -0,0 +1,43 @@
+"""audio acoustic fingerprints and per-owner hash index
+
+Revision ID: c4e1f8a2b7d9
+Revises: a9d3e6f1c2b8
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1f8a2b7d9'
+down_revision: Union[str, None] = 'a9d3e6f1c2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('audios') as batch_op:
+        batch_op.add_column(sa.Column('fingerprint', sa.LargeBinary(), nullable=True))
+
+    op.create_table(
+        'audio_fingerprint_hashes',
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('hash', sa.Integer(), nullable=False),
+        sa.Column('audio_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['audio_id'], ['audios.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('owner_id', 'hash', 'audio_id')
+    )
+    op.create_index('ix_audio_fingerprint_hashes_audio_id', 'audio_fingerprint_hashes', ['audio_id'], unique=False)
+    # Существующие записи получают отпечатки при повторном анализе:
+    # UPDATE audios SET analysis_status = 'pending' WHERE fingerprint IS NULL
+
+
+def downgrade() -> None:
+    op.drop_index('ix_audio_fingerprint_hashes_audio_id', table_name='audio_fingerprint_hashes')
+    op.drop_table('audio_fingerprint_hashes')
+    with op.batch_alter_table('audios') as batch_op:
+        batch_op.drop_column('fingerprint')
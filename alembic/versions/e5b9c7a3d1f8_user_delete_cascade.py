@@ -0,0 +1,51 @@
+"""cascade user deletion to audios and upload sessions, job progress
+
+Revision ID: e5b9c7a3d1f8
+Revises: d8a3f5b1e6c2
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b9c7a3d1f8'
+down_revision: Union[str, None] = 'd8a3f5b1e6c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Внешние ключи начальной миграции созданы без имён; так их называет PostgreSQL
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+OWNER_TABLES = ('audios', 'upload_sessions')
+
+
+def _replace_owner_fk(table: str, ondelete: str | None) -> None:
+    name = f'{table}_owner_id_fkey'
+    if op.get_bind().dialect.name == 'postgresql':
+        # NOT VALID + VALIDATE: проверка существующих строк не блокирует запись в таблицу
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(
+            name, table, 'users', ['owner_id'], ['id'], ondelete=ondelete, postgresql_not_valid=True
+        )
+        op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+        return
+    with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.create_foreign_key(name, 'users', ['owner_id'], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    for table in OWNER_TABLES:
+        _replace_owner_fk(table, 'CASCADE')
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.add_column(sa.Column('progress', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_column('progress')
+    for table in OWNER_TABLES:
+        _replace_owner_fk(table, None)
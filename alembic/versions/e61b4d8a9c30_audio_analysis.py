@@ -0,0 +1,36 @@
+"""audio metadata and analysis status
+
+Revision ID: e61b4d8a9c30
+Revises: a3f7c2e91b05
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e61b4d8a9c30'
+down_revision: Union[str, None] = 'a3f7c2e91b05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('audios') as batch_op:
+        batch_op.add_column(sa.Column('analysis_status', sa.String(length=16), server_default='pending', nullable=False))
+        batch_op.add_column(sa.Column('duration', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('sample_rate', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('channels', sa.SmallInteger(), nullable=True))
+        batch_op.add_column(sa.Column('bitrate', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('audios') as batch_op:
+        batch_op.drop_column('bitrate')
+        batch_op.drop_column('channels')
+        batch_op.drop_column('sample_rate')
+        batch_op.drop_column('duration')
+        batch_op.drop_column('analysis_status')
@@ -0,0 +1,44 @@
+"""per-user storage quotas
+
+Revision ID: f2c8a5e07d14
+Revises: e61b4d8a9c30
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a5e07d14'
+down_revision: Union[str, None] = 'e61b4d8a9c30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('audios') as batch_op:
+        batch_op.add_column(sa.Column('size', sa.BigInteger(), nullable=True))
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('storage_used', sa.BigInteger(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('storage_quota', sa.BigInteger(), nullable=True))
+
+    # Разовый пересчёт по существующим данным; дальше счётчик ведётся приложением
+    op.execute(
+        "UPDATE audios SET size = (SELECT blobs.size FROM blobs WHERE blobs.sha256 = audios.content_hash) "
+        "WHERE content_hash IS NOT NULL"
+    )
+    op.execute(
+        "UPDATE users SET storage_used = COALESCE("
+        "(SELECT SUM(audios.size) FROM audios WHERE audios.owner_id = users.id), 0)"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('storage_quota')
+        batch_op.drop_column('storage_used')
+    with op.batch_alter_table('audios') as batch_op:
+        batch_op.drop_column('size')
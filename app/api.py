@@ -1,96 +1,648 @@
-from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
+from datetime import datetime
+from fastapi import APIRouter, Depends, UploadFile, File, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-import httpx
+import asyncio
 from fastapi import HTTPException
-from app.services.yandex_auth import get_yandex_token, get_yandex_user_info
+from app.services.yandex_auth import get_yandex_token, get_yandex_user_info_cached
 from app.security import create_access_token
-from app.db.database import get_db
-from app.schemas.schemas import UserCreate,AudioCreate, AudioOut, UserUpdate, Token
-from app.crud import user_crud, audio_crud
-from app.models.user import User
-from app.services.auth import get_current_user
+from app.db.database import get_db, read_session_for
+from app.schemas.schemas import (
+    UserCreate, AudioCreate, AudioOut, AudioPage, AudioFromHash, UserUpdate, Token,
+    UploadInitiate, UploadSessionOut, UploadChunkOut, UploadComplete,
+    BatchUploadItem, BatchUploadOut, StorageUsageOut, AudioBatchDelete, BatchDeleteItem, BatchDeleteOut,
+    AudioUploadOut, SimilarAudioOut, UserPurge, UserPurgeItem, UserPurgeOut, UserPurgeStatus
+)
+from app.crud import user_crud, audio_crud, upload_crud, blob_crud
+from app.config import settings
+from app.services.auth import get_current_user, get_current_superuser, get_read_db
+from app.services.user_cache import UserSnapshot
+from app.services import uploads, blobs, quotas, duplicates, jobs, tasks, accounts
+from app.services.analysis import peaks_key, store_fingerprint
+from app.services.renditions import choose_rendition, get_transcoder
+from app.services.storage import get_storage
+from app.services.streaming import file_response, object_response, media_type_for
+from app.services.pagination import encode_cursor, decode_time_cursor, decode_score_cursor
 from pathlib import Path
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.post("/auth/yandex", response_model=Token)
 async def auth_yandex(code: str, db: AsyncSession = Depends(get_db)):
-    try:
-        token_data = await get_yandex_token(code)
-        user_info = await get_yandex_user_info(token_data["access_token"])
-        
-        if not user_info.get("default_email"):
-            raise HTTPException(status_code=400, detail="Email not provided by Yandex")
-
-        user = await user_crud.get_user_by_yandex_id(db, yandex_id=user_info["id"])
-        if not user:
-            user = await user_crud.get_user_by_email(db, email=user_info["default_email"])
-            if user:
-                user = await user_crud.update_user(db, user.id, UserUpdate(yandex_id=user_info["id"]))
-            else:
-                user_in = UserCreate(
-                    email=user_info["default_email"],
-                    username=user_info["login"],
-                    yandex_id=user_info["id"],
-                    password=None
-                )
+    token_data = await get_yandex_token(code)
+    user_info = await get_yandex_user_info_cached(token_data["access_token"])
+    
+    if not user_info.get("default_email"):
+        raise HTTPException(status_code=400, detail="Email not provided by Yandex")
+
+    user = await user_crud.get_user_by_yandex_id(db, yandex_id=user_info["id"])
+    if not user:
+        user = await user_crud.get_user_by_email(db, email=user_info["default_email"])
+        if user:
+            user = await user_crud.update_user(db, user.id, UserUpdate(yandex_id=user_info["id"]))
+        else:
+            user_in = UserCreate(
+                email=user_info["default_email"],
+                username=user_info["login"],
+                yandex_id=user_info["id"],
+                password=None
+            )
+            try:
                 user = await user_crud.create_user(db, user_in)
+            except IntegrityError:
+                # Параллельный первый вход того же пользователя уже создал запись
+                await db.rollback()
+                user = await user_crud.get_user_by_yandex_id(db, yandex_id=user_info["id"])
+                if user is None:
+                    raise HTTPException(status_code=409, detail="User with this email already exists")
 
-        access_token = create_access_token(
-            data={"sub": user.email, "is_superuser": user.is_superuser}
-        )
-        return {"access_token": access_token, "token_type": "bearer"}
-    
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=400, detail=f"Yandex API error: {str(e)}")
+    access_token = create_access_token(
+        data={"sub": user.email, "is_superuser": user.is_superuser}
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
 
 ALLOWED_EXTENSIONS = {"mp3", "wav", "ogg"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_BATCH_FILES = 500
+BATCH_UPLOAD_CONCURRENCY = 8
 
-@router.post("/audio/upload", response_model=AudioOut)
+def build_filename(filename: str, name: str | None) -> str:
+    file_ext = Path(filename).suffix[1:].lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(400, detail="Invalid file extension")
+
+    clean_name = re.sub(r'[^\w.-]', '', name or Path(filename).stem)
+    if not clean_name:
+        clean_name = "audio"
+    return f"{clean_name}.{file_ext}"
+
+async def ensure_name_available(db: AsyncSession, owner_id: int, name: str) -> None:
+    if await audio_crud.get_audio_by_name(db, owner_id, name):
+        raise HTTPException(409, detail="Audio with this name already exists")
+
+async def create_blob_audio(db: AsyncSession, owner_id: int, name: str, staged: blobs.StagedBlob):
+    """Создание записи аудио со ссылкой на blob и размещение файла"""
+    try:
+        await quotas.reserve(db, owner_id, staged.size)
+        await blobs.acquire(db, staged)
+        audio = await audio_crud.create_audio(
+            db,
+            audio_in=AudioCreate(name=name),
+            owner_id=owner_id,
+            file_path=staged.key,
+            content_hash=staged.sha256,
+            size=staged.size
+        )
+    except IntegrityError:
+        await db.rollback()
+        await blobs.discard(staged)
+        raise HTTPException(409, detail="Audio with this name already exists")
+    except BaseException:
+        await db.rollback()
+        await blobs.discard(staged)
+        raise
+
+    if await publish_blob_audios(db, owner_id, [(audio, staged)]):
+        raise HTTPException(503, detail="Storage is temporarily unavailable")
+    return audio
+
+async def publish_blob_audios(db: AsyncSession, owner_id: int, published: list[tuple]) -> set[int]:
+    """Размещение blob'ов уже зафиксированных аудио `(audio, staged)`.
+
+    Запись без файла бесполезна, поэтому аудио, чей blob разместить не
+    удалось, удаляются; возвращаются их ID. При отмене удаляются все.
+    """
+    try:
+        results = await asyncio.gather(
+            *(blobs.publish(staged) for _, staged in published), return_exceptions=True
+        )
+    except BaseException:
+        await audio_crud.delete_user_audios(db, [audio.id for audio, _ in published], owner_id)
+        raise
+
+    failed = set()
+    for (audio, _), result in zip(published, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Failed to publish blob for audio {audio.id}: {result!r}")
+            failed.add(audio.id)
+    if failed:
+        await audio_crud.delete_user_audios(db, list(failed), owner_id)
+    return failed
+
+def similar_out(matches: list) -> list[SimilarAudioOut]:
+    return [SimilarAudioOut(audio=AudioOut.model_validate(audio), score=score) for audio, score in matches]
+
+@router.post("/audio/upload", response_model=AudioUploadOut)
 async def upload_audio(
     file: UploadFile = File(...),
     name: str = None,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    file_ext = Path(file.filename).suffix[1:].lower()
-    if file_ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(400, detail="Invalid file extension")
+    """Загрузка аудио; в `duplicates` — уже загруженные записи с тем же звучанием.
+
+    Дубли ищутся, только если включены FINGERPRINT_ENABLED и
+    DUPLICATE_CHECK_ON_UPLOAD; иначе список пуст, а похожие записи
+    доступны в `/audio/{id}/similar` после фонового анализа.
+    """
+    filename = build_filename(file.filename, name)
 
-    if file.size > MAX_FILE_SIZE:
+    if file.size is not None and file.size > MAX_FILE_SIZE:
         raise HTTPException(400, detail="File too large")
 
-    clean_name = re.sub(r'[^\w.-]', '', name or Path(file.filename).stem)
-    if not clean_name:
-        clean_name = "audio"
-    filename = f"{clean_name}.{file_ext}"
+    await ensure_name_available(db, current_user.id, filename)
+
+    staged = await blobs.stage_upload(file, max_size=MAX_FILE_SIZE)
+    matches = []
+    try:
+        fingerprint = await duplicates.fingerprint_staged(staged.staging_path, Path(filename).suffix[1:])
+        if fingerprint is not None:
+            matches = await duplicates.find_similar(
+                db, current_user.id, fingerprint, limit=5, min_score=settings.DUPLICATE_MIN_SCORE
+            )
+    except BaseException:
+        await blobs.discard(staged)
+        raise
+    audio = await create_blob_audio(db, current_user.id, filename, staged)
+    if fingerprint is not None:
+        await store_fingerprint(db, audio, fingerprint)
+    await tasks.schedule_processing(db, [audio])
+    return AudioUploadOut.model_validate(audio).model_copy(update={"duplicates": similar_out(matches)})
+
+@router.post("/audio/upload/by-hash", response_model=AudioOut)
+async def upload_audio_by_hash(
+    audio_in: AudioFromHash,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Мгновенная «загрузка» файла, содержимое которого уже есть в хранилище.
 
-    upload_dir = Path(f"static/audios/user_{current_user.id}")
-    upload_dir.mkdir(exist_ok=True, parents=True)
-    file_path = upload_dir / filename
+    Клиент сначала пробует этот запрос с SHA-256 файла и отправляет
+    сам файл в `/audio/upload` только при ответе 404.
+    """
+    filename = build_filename(audio_in.filename, audio_in.name)
+    await ensure_name_available(db, current_user.id, filename)
+
+    blob = await blob_crud.add_blob_reference(db, audio_in.sha256)
+    if not blob:
+        await db.rollback()
+        raise HTTPException(404, detail="Content not found, upload the file")
 
     try:
-        contents = await file.read()
-        with open(file_path, "wb") as buffer:
-            buffer.write(contents)
-    except Exception as e:
-        raise HTTPException(500, detail=f"Error saving file: {str(e)}")
-
-    audio_in = AudioCreate(name=filename)
-    audio = await audio_crud.create_audio(
-        db, 
-        audio_in=audio_in,
+        await quotas.reserve(db, current_user.id, blob.size)
+        audio = await audio_crud.create_audio(
+            db,
+            audio_in=AudioCreate(name=filename),
+            owner_id=current_user.id,
+            file_path=blob.path,
+            content_hash=blob.sha256,
+            size=blob.size
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(409, detail="Audio with this name already exists")
+    except HTTPException:
+        await db.rollback()
+        raise
+    await tasks.schedule_processing(db, [audio])
+    return audio
+
+@router.post("/audio/batch", response_model=BatchUploadOut)
+async def upload_audio_batch(
+    files: list[UploadFile] = File(...),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Загрузка нескольких файлов одним запросом.
+
+    Файлы сохраняются параллельно, строки вставляются одним запросом
+    в одной транзакции. Ошибка одного файла не отменяет остальные:
+    результат каждого возвращается в `items` со своим статусом.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(400, detail=f"Too many files, at most {MAX_BATCH_FILES}")
+
+    items = [BatchUploadItem(filename=file.filename or "", status=200) for file in files]
+    names: dict[int, str] = {}
+    for i, file in enumerate(files):
+        try:
+            name = build_filename(file.filename or "", None)
+        except HTTPException as e:
+            items[i].status, items[i].detail = e.status_code, e.detail
+            continue
+        if file.size is not None and file.size > MAX_FILE_SIZE:
+            items[i].status, items[i].detail = 400, "File too large"
+        elif name in names.values():
+            items[i].status, items[i].detail = 409, "Duplicate name in batch"
+        else:
+            names[i] = name
+
+    taken = await audio_crud.get_taken_names(db, current_user.id, list(names.values())) if names else set()
+    for i in [i for i, name in names.items() if name in taken]:
+        items[i].status, items[i].detail = 409, "Audio with this name already exists"
+        del names[i]
+
+    semaphore = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+
+    async def stage(i: int) -> blobs.StagedBlob | None:
+        async with semaphore:
+            try:
+                return await blobs.stage_upload(files[i], max_size=MAX_FILE_SIZE)
+            except HTTPException as e:
+                items[i].status, items[i].detail = e.status_code, e.detail
+                return None
+
+    results = await asyncio.gather(*(stage(i) for i in names))
+    staged = {i: result for i, result in zip(names, results) if result is not None}
+
+    try:
+        await blob_crud.acquire_blobs(db, [(blob.sha256, blob.size, blob.key) for blob in staged.values()])
+        created = await audio_crud.create_audios(
+            db,
+            current_user.id,
+            [(names[i], blob.key, blob.sha256, blob.size) for i, blob in staged.items()]
+        )
+        # Имена, занятые параллельным запросом после проверки выше
+        created_by_name = {audio.name: audio for audio in created}
+        skipped = [i for i in staged if names[i] not in created_by_name]
+        await blob_crud.release_blobs(db, [staged[i].sha256 for i in skipped])
+        await quotas.reserve(db, current_user.id, sum(audio.size for audio in created))
+        await db.commit()
+    except HTTPException as e:
+        # Квота проверяется для пачки целиком: не поместилась — не сохраняется ничего
+        await db.rollback()
+        await asyncio.gather(*(blobs.discard(blob) for blob in staged.values()))
+        for i in staged:
+            items[i].status, items[i].detail = e.status_code, e.detail
+        return BatchUploadOut(items=items)
+    except BaseException:
+        await db.rollback()
+        await asyncio.gather(*(blobs.discard(blob) for blob in staged.values()))
+        raise
+
+    for i in skipped:
+        items[i].status, items[i].detail = 409, "Audio with this name already exists"
+        await blobs.discard(staged.pop(i))
+    failed = await publish_blob_audios(
+        db, current_user.id, [(created_by_name[names[i]], blob) for i, blob in staged.items()]
+    )
+    for i in [i for i in staged if created_by_name[names[i]].id in failed]:
+        items[i].status, items[i].detail = 503, "Storage is temporarily unavailable"
+        del staged[i]
+
+    for i in staged:
+        items[i].audio = AudioOut.model_validate(created_by_name[names[i]])
+    await tasks.schedule_processing(db, [created_by_name[names[i]] for i in staged])
+    return BatchUploadOut(items=items)
+
+@router.delete("/audio/batch", response_model=BatchDeleteOut)
+async def delete_audio_batch(
+    batch: AudioBatchDelete,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Удаление нескольких аудио одним запросом; статус по каждому ID"""
+    audios = await audio_crud.delete_user_audios(db, batch.ids, current_user.id, commit=False)
+    await tasks.schedule_file_release(db, audios)
+    await db.commit()
+    jobs.notify()
+
+    deleted = {audio.id for audio in audios}
+    return BatchDeleteOut(items=[
+        BatchDeleteItem(id=audio_id, status=204)
+        if audio_id in deleted else
+        BatchDeleteItem(id=audio_id, status=404, detail="Audio not found")
+        for audio_id in dict.fromkeys(batch.ids)
+    ])
+
+async def upload_session_out(upload_session) -> UploadSessionOut:
+    received = await uploads.list_chunks(upload_session.id)
+    return UploadSessionOut(
+        upload_id=upload_session.id,
+        name=upload_session.name,
+        chunk_size=upload_session.chunk_size,
+        total_size=upload_session.total_size,
+        expires_at=upload_session.expires_at,
+        received=[UploadChunkOut(index=i, size=received[i]) for i in sorted(received)]
+    )
+
+async def get_owned_upload(db: AsyncSession, upload_id: str, owner_id: int):
+    upload_session = await upload_crud.get_upload_session(db, upload_id, owner_id)
+    if not upload_session:
+        raise HTTPException(404, detail="Upload not found")
+    return upload_session
+
+@router.post("/audio/uploads", response_model=UploadSessionOut, status_code=status.HTTP_201_CREATED)
+async def initiate_upload(
+    upload_in: UploadInitiate,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    filename = build_filename(upload_in.filename, upload_in.name)
+    await ensure_name_available(db, current_user.id, filename)
+    if await upload_crud.count_open_upload_sessions(db, current_user.id) >= settings.UPLOAD_SESSIONS_PER_USER:
+        raise HTTPException(429, detail="Too many open uploads")
+    if upload_in.total_size is None:
+        if await quotas.remaining_quota(current_user.email) is not None:
+            raise HTTPException(400, detail="total_size is required when a storage quota applies")
+    else:
+        # Объявленный размер занимает место в квоте до завершения или отмены загрузки
+        await quotas.reserve(db, current_user.id, upload_in.total_size)
+    upload_session = await upload_crud.create_upload_session(
+        db,
         owner_id=current_user.id,
-        file_path=str(file_path)
+        name=filename,
+        chunk_size=settings.RESUMABLE_CHUNK_SIZE,
+        expires_at=uploads.session_expires_at(),
+        total_size=upload_in.total_size,
+        commit=False
     )
+    await db.commit()
+    return await upload_session_out(upload_session)
+
+@router.get("/audio/uploads/{upload_id}", response_model=UploadSessionOut)
+async def get_upload_status(
+    upload_id: str,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    upload_session = await get_owned_upload(db, upload_id, current_user.id)
+    return await upload_session_out(upload_session)
+
+@router.put("/audio/uploads/{upload_id}/chunks/{index}", response_model=UploadChunkOut)
+async def upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    upload_session = await get_owned_upload(db, upload_id, current_user.id)
+    if not 0 <= index < settings.RESUMABLE_MAX_CHUNKS:
+        raise HTTPException(400, detail="Invalid chunk index")
+    max_size = upload_session.chunk_size
+    if upload_session.total_size is not None:
+        # Части не выходят за объявленный размер: в квоте учтён только он
+        max_size = min(max_size, upload_session.total_size - index * upload_session.chunk_size)
+        if max_size <= 0 and index > 0:
+            raise HTTPException(400, detail="Invalid chunk index")
+
+    await upload_crud.extend_upload_session(db, upload_session.id, uploads.session_expires_at())
+    size = await uploads.save_chunk(
+        upload_session.id,
+        index,
+        request.stream(),
+        max_size=max_size
+    )
+    return UploadChunkOut(index=index, size=size)
+
+@router.post("/audio/uploads/{upload_id}/complete", response_model=AudioOut)
+async def complete_upload(
+    upload_id: str,
+    upload_complete: UploadComplete,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    upload_session = await get_owned_upload(db, upload_id, current_user.id)
+    received = await uploads.list_chunks(upload_session.id)
+    missing = [i for i in range(upload_complete.total_chunks) if i not in received]
+    if missing:
+        raise HTTPException(409, detail={"message": "Missing chunks", "missing": missing[:100]})
+
+    size = sum(received[i] for i in range(upload_complete.total_chunks))
+    if upload_session.total_size is not None and size != upload_session.total_size:
+        raise HTTPException(409, detail="Uploaded size does not match total_size")
+
+    await ensure_name_available(db, current_user.id, upload_session.name)
+    staged = await blobs.stage_chunks(upload_session.id, upload_complete.total_chunks)
+
+    await upload_crud.delete_upload_session(db, upload_session.id, commit=False)
+    audio = await create_blob_audio(db, current_user.id, upload_session.name, staged)
+    await uploads.discard_chunks(upload_session.id)
+    await tasks.schedule_processing(db, [audio])
     return audio
 
-@router.get("/audio/", response_model=list[AudioOut])
-def list_audios(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.delete("/audio/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(
+    upload_id: str,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    upload_session = await get_owned_upload(db, upload_id, current_user.id)
+    await upload_crud.delete_upload_session(db, upload_session.id)
+    await uploads.discard_chunks(upload_session.id)
+
+@router.get("/audio/", response_model=AudioPage)
+async def list_audios(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+    name_prefix: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    return audio_crud.get_multi_by_owner(db, owner_id=current_user.id)
\ No newline at end of file
+    audios = await audio_crud.get_audios_page(
+        db,
+        owner_id=current_user.id,
+        limit=limit,
+        after=decode_time_cursor(cursor) if cursor else None,
+        name_prefix=name_prefix,
+        created_from=created_from,
+        created_to=created_to
+    )
+    next_cursor = None
+    if len(audios) == limit:
+        next_cursor = encode_cursor(audios[-1].created_at, audios[-1].id)
+    return AudioPage(items=audios, next_cursor=next_cursor)
+
+@router.get("/audio/search", response_model=AudioPage)
+async def search_audios(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    results = await audio_crud.search_audios(
+        db,
+        owner_id=current_user.id,
+        query=q,
+        limit=limit,
+        after=decode_score_cursor(cursor) if cursor else None
+    )
+    next_cursor = None
+    if len(results) == limit:
+        audio, score = results[-1]
+        next_cursor = encode_cursor(score, audio.id)
+    return AudioPage(items=[audio for audio, _ in results], next_cursor=next_cursor)
+
+@router.get("/audio/quota", response_model=StorageUsageOut)
+async def get_storage_usage(
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    usage = await user_crud.get_storage_usage(db, current_user.email)
+    if usage is None:
+        raise HTTPException(404, detail="User not found")
+    used, quota = usage
+    return StorageUsageOut(used=used, quota=quota)
+
+@router.get("/audio/export")
+async def export_audios(
+    name_prefix: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    # Сессия живёт столько же, сколько ответ, а не зависимость запроса
+    async def rows():
+        async with read_session_for(current_user.id) as db:
+            async for audio in audio_crud.stream_audios_by_owner(
+                db,
+                owner_id=current_user.id,
+                name_prefix=name_prefix,
+                created_from=created_from,
+                created_to=created_to
+            ):
+                yield AudioOut.model_validate(audio).model_dump_json() + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+@router.api_route("/audio/{audio_id}/stream", methods=["GET", "HEAD"])
+async def stream_audio(
+    audio_id: int,
+    request: Request,
+    rendition: str | None = Query(None, description="original, mp3-64k, mp3-128k, opus-48k или opus-96k"),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Отдача аудио или его перекодированного варианта.
+
+    Вариант выбирается параметром `rendition`, а без него — по `Accept`
+    (например, `audio/ogg` для файла в wav). Варианты кодируются при
+    первом запросе и кэшируются на диске.
+    """
+    audio = await audio_crud.get_audio(db, audio_id)
+    if not audio or audio.owner_id != current_user.id:
+        raise HTTPException(404, detail="Audio not found")
+
+    chosen = choose_rendition(audio.name, rendition, request.headers.get("accept"), audio.bitrate)
+    if chosen is None:
+        response = await object_response(request, get_storage(), audio.path, media_type_for(audio.name))
+    else:
+        path = await get_transcoder().get(audio.path, chosen)
+        response = await file_response(request, path, chosen.media_type)
+    if rendition is None:
+        response.headers["vary"] = "Accept"
+    return response
+
+@router.get("/audio/{audio_id}/peaks")
+async def get_audio_peaks(
+    audio_id: int,
+    request: Request,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Пики волны в бинарном формате `app.services.audio_meta.encode_peaks`.
+
+    Заголовок `<4sBBxxIII>` (magic `PEAK`, версия, каналы, частота,
+    сэмплов на пик, число пиков), за ним пары int16 `(min, max)`.
+    """
+    audio = await audio_crud.get_audio(db, audio_id)
+    if not audio or audio.owner_id != current_user.id:
+        raise HTTPException(404, detail="Audio not found")
+    if audio.analysis_status != "done":
+        raise HTTPException(404, detail="Peaks are not ready")
+    return await object_response(request, get_storage(), peaks_key(audio.path), "application/octet-stream")
+
+@router.get("/audio/{audio_id}/similar", response_model=list[SimilarAudioOut])
+async def get_similar_audios(
+    audio_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    min_score: float | None = Query(None, ge=0, le=1, description="Порог сходства; по умолчанию SIMILAR_MIN_SCORE"),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Аудио владельца, похожие по звучанию, по убыванию доли общих хешей"""
+    audio = await audio_crud.get_audio(db, audio_id, with_fingerprint=True)
+    if not audio or audio.owner_id != current_user.id:
+        raise HTTPException(404, detail="Audio not found")
+    if audio.fingerprint is None:
+        raise HTTPException(404, detail="Fingerprint is not ready")
+    if min_score is None:
+        min_score = settings.SIMILAR_MIN_SCORE
+    matches = await duplicates.find_similar(
+        db, current_user.id, audio.fingerprint, exclude_id=audio.id, limit=limit, min_score=min_score
+    )
+    return similar_out(matches)
+
+@router.delete("/audio/{audio_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_audio(
+    audio_id: int,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    audio = await audio_crud.delete_user_audio(db, audio_id, current_user.id, commit=False)
+    if not audio:
+        raise HTTPException(404, detail="Audio not found")
+
+    # Файлы удаляются в фоне; задача фиксируется вместе с удалением записи
+    await tasks.schedule_file_release(db, [audio])
+    await db.commit()
+    jobs.notify()
+
+@router.post("/admin/users/purge", response_model=UserPurgeOut, status_code=status.HTTP_202_ACCEPTED)
+async def purge_users(
+    purge: UserPurge,
+    current_user: UserSnapshot = Depends(get_current_superuser),
+    db: AsyncSession = Depends(get_db)
+):
+    """Деактивация и полное удаление нескольких пользователей.
+
+    Пользователи деактивируются сразу, одним запросом; аудио, файлы и
+    сами записи удаляются в фоне задачами `purge_user`. Ход удаления —
+    в `GET /admin/users/{user_id}/purge`.
+    """
+    requested = list(dict.fromkeys(purge.user_ids))
+    user_ids = [user_id for user_id in requested if user_id != current_user.id]
+    found = set(await user_crud.deactivate_users(db, user_ids)) if user_ids else set()
+    scheduled = await accounts.schedule_purge(db, [user_id for user_id in user_ids if user_id in found])
+    await db.commit()
+    jobs.notify()
+
+    items = []
+    for user_id in requested:
+        if user_id == current_user.id:
+            items.append(UserPurgeItem(user_id=user_id, status=400, detail="Cannot purge yourself"))
+        elif user_id in scheduled:
+            items.append(UserPurgeItem(user_id=user_id, status=202, job_id=scheduled[user_id]))
+        else:
+            items.append(UserPurgeItem(user_id=user_id, status=404, detail="User not found"))
+    return UserPurgeOut(items=items)
+
+@router.get("/admin/users/{user_id}/purge", response_model=UserPurgeStatus)
+async def get_purge_status(
+    user_id: int,
+    current_user: UserSnapshot = Depends(get_current_superuser),
+    db: AsyncSession = Depends(get_db)
+):
+    job = await accounts.get_purge_job(db, user_id)
+    if job is None:
+        raise HTTPException(404, detail="Purge not found")
+    progress = job.progress or {}
+    return UserPurgeStatus(
+        user_id=user_id,
+        job_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        audios_deleted=progress.get("audios_deleted", 0),
+        audios_total=progress.get("audios_total"),
+        bytes_released=progress.get("bytes_released", 0),
+        last_error=job.last_error
+    )
@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Optional, cast
 
 class Settings(BaseSettings):
     POSTGRES_USER: str
@@ -7,20 +9,151 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_HOST: str
     POSTGRES_PORT: str
+    DATABASE_URL: Optional[str] = None
+
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    # Общий бюджет соединений на все воркеры; если задан, пул каждого
+    # воркера равен DB_POOL_TOTAL // WEB_CONCURRENCY
+    DB_POOL_TOTAL: Optional[int] = None
+    WEB_CONCURRENCY: int = 1
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_ECHO: bool = False
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+    DB_PGBOUNCER: bool = False
+    READ_REPLICA_URL: Optional[str] = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    TRACING_ENABLED: bool = False
+    TRACE_LOG_THRESHOLD_MS: float = 1000.0
+    SLOW_QUERY_MS: Optional[float] = None
+    PROFILING_ENABLED: bool = False
+    PROFILE_INTERVAL_MS: float = 5.0
     
     YANDEX_CLIENT_ID: str
     YANDEX_CLIENT_SECRET: str
     YANDEX_REDIRECT_URI: str
+    YANDEX_HTTP2: bool = False
+    YANDEX_CONNECT_TIMEOUT: float = 3.0
+    YANDEX_READ_TIMEOUT: float = 10.0
+    YANDEX_MAX_CONNECTIONS: int = 20
+    YANDEX_MAX_KEEPALIVE: int = 10
+    YANDEX_KEEPALIVE_EXPIRY: float = 60.0
+    YANDEX_RETRIES: int = 2
+    YANDEX_RETRY_BACKOFF: float = 0.2
+    YANDEX_BREAKER_THRESHOLD: int = 5
+    YANDEX_BREAKER_RESET_SECONDS: float = 30.0
     
+    DB_CREATE_ALL_ON_STARTUP: bool = False
+
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32
+
+    TOKEN_CACHE_MAXSIZE: int = 10000
+    TOKEN_CACHE_MAX_TTL_SECONDS: float = 300.0
+
+    USER_CACHE_MAXSIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 30.0
+
+    STORAGE_BACKEND: str = "local"
+    STORAGE_LOCAL_ROOT: str = "static"
+    UPLOAD_STAGING_DIR: str = "static/.staging"
+    S3_BUCKET: str = "audios"
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_PART_SIZE: int = 8 * 1024 * 1024
+    S3_UPLOAD_CONCURRENCY: int = 4
+    S3_MAX_POOL_CONNECTIONS: int = 32
+
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    RESUMABLE_CHUNK_SIZE: int = 8 * 1024 * 1024
+    RESUMABLE_MAX_CHUNKS: int = 10000
+    # Срок жизни загрузки по частям с последней присланной части и предел
+    # открытых загрузок пользователя; брошенные удаляет периодическая задача
+    UPLOAD_SESSION_TTL_HOURS: float = 24.0
+    UPLOAD_SESSIONS_PER_USER: int = 20
+    UPLOAD_SESSION_GC_INTERVAL_SECONDS: float = 3600.0
+
+    STORAGE_QUOTA_BYTES: Optional[int] = 1024 * 1024 * 1024
+    QUOTA_MULTIPART_SLACK_BYTES: int = 64 * 1024
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_API_PER_SECOND: float = 20.0
+    RATE_LIMIT_API_BURST: float = 60.0
+    RATE_LIMIT_UPLOAD_BYTES_PER_SECOND: float = 10 * 1024 * 1024
+    RATE_LIMIT_UPLOAD_BURST_BYTES: float = 100 * 1024 * 1024
+
+    ANALYSIS_WORKERS: int = 2
+    WAVEFORM_PEAKS: int = 2048
+    FINGERPRINT_ENABLED: bool = True
+    # Отпечаток при /audio/upload считается до ответа, чтобы предупредить о дублях;
+    # при false он считается фоновым анализом, а дубли видны в /audio/{id}/similar
+    DUPLICATE_CHECK_ON_UPLOAD: bool = True
+    # Доля общих хешей: копии одной записи в разных форматах и частотах дают ~0.8 и выше,
+    # несвязанные записи — около нуля; выше SIMILAR_MIN_SCORE обычно общие фрагменты
+    DUPLICATE_MIN_SCORE: float = 0.5
+    SIMILAR_MIN_SCORE: float = 0.1
+
+    # Очередь фоновых задач (app.services.jobs); без JOBS_IN_PROCESS задачи
+    # выполняет отдельный процесс `python -m app.worker`
+    JOBS_IN_PROCESS: bool = True
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_LEASE_SECONDS: float = 300.0
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BACKOFF: float = 5.0
+    JOB_RETRY_MAX_DELAY: float = 3600.0
+    # Параллельность по типам задач поверх значений по умолчанию, например {"analyze_audio": 4}
+    JOB_CONCURRENCY: dict[str, int] = {}
+    JOB_SHUTDOWN_TIMEOUT: float = 30.0
+    JOB_RETENTION_HOURS: float = 24.0
+    BLOB_GC_INTERVAL_SECONDS: float = 3600.0
+    # Аудио, оставшееся в pending дольше этого, ставится на анализ повторно
+    ANALYSIS_STALE_SECONDS: float = 600.0
+
+    # Удаление учётных записей (app.services.accounts)
+    ACCOUNT_PURGE_BATCH_SIZE: int = 500
+    ACCOUNT_PURGE_FILE_CONCURRENCY: int = 16
+
+    TRANSCODE_WORKERS: int = 2
+    RENDITION_CACHE_DIR: str = "static/.renditions"
+    RENDITION_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    RENDITIONS_PREGENERATE: list[str] = []
+
     @property
     def database_url(self):
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
     
     class Config:
         env_file = Path(__file__).parent.parent / ".env"
 
-settings = Settings()
\ No newline at end of file
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+class _LazySettings:
+    """Настройки, которые читаются из окружения и .env при первом обращении.
+
+    Импорт модулей приложения (Alembic, CLI, сборка образа) не требует
+    заполненного окружения, пока настройки не понадобятся.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(get_settings(), name, value)
+
+settings = cast(Settings, _LazySettings())
@@ -1,23 +1,93 @@
+from datetime import datetime
+from typing import AsyncIterator
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, update
-from app.models.audio import Audio
+from sqlalchemy import select, delete, update, tuple_, or_, literal, literal_column, func, Select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import undefer
+from app.models.audio import Audio, search_document
 from app.schemas.schemas import AudioCreate
+from app.crud import blob_crud, fingerprint_crud, user_crud
+from app.db.database import mark_write
+from app.services.search_index import search_index, tokenize
 
-async def create_audio(db: AsyncSession, audio_in: AudioCreate, owner_id: int, file_path: str) -> Audio:
+async def create_audio(
+    db: AsyncSession,
+    audio_in: AudioCreate,
+    owner_id: int,
+    file_path: str,
+    content_hash: str | None = None,
+    size: int | None = None
+) -> Audio:
     db_audio = Audio(
         name=audio_in.name,
         path=file_path,
-        owner_id=owner_id
+        owner_id=owner_id,
+        content_hash=content_hash,
+        size=size
     )
     db.add(db_audio)
+    mark_write(owner_id)
+    search_index.invalidate(owner_id)
     await db.commit()
     await db.refresh(db_audio)
     return db_audio
 
-async def get_audio(db: AsyncSession, audio_id: int) -> Audio | None:
-    result = await db.execute(select(Audio).filter(Audio.id == audio_id))
+async def create_audios(
+    db: AsyncSession,
+    owner_id: int,
+    items: list[tuple[str, str, str | None, int | None]]
+) -> list[Audio]:
+    """Вставка нескольких аудио одним `INSERT ... RETURNING` (без commit).
+
+    Элементы — `(name, file_path, content_hash, size)`. Строки с уже занятым
+    именем пропускаются и в результат не попадают.
+    """
+    if not items:
+        return []
+    mark_write(owner_id)
+    search_index.invalidate(owner_id)
+    dialect = postgresql if db.get_bind().dialect.name != "sqlite" else sqlite
+    result = await db.execute(
+        dialect.insert(Audio)
+        .values([
+            {"name": name, "path": file_path, "owner_id": owner_id, "content_hash": content_hash, "size": size}
+            for name, file_path, content_hash, size in items
+        ])
+        .on_conflict_do_nothing(index_elements=[Audio.owner_id, Audio.name])
+        .returning(Audio)
+    )
+    return result.scalars().all()
+
+async def get_audio(db: AsyncSession, audio_id: int, with_fingerprint: bool = False) -> Audio | None:
+    query = select(Audio).filter(Audio.id == audio_id)
+    if with_fingerprint:
+        query = query.options(undefer(Audio.fingerprint))
+    result = await db.execute(query)
     return result.scalars().first()
 
+async def get_audio_by_name(db: AsyncSession, owner_id: int, name: str) -> Audio | None:
+    result = await db.execute(
+        select(Audio).filter(Audio.owner_id == owner_id, Audio.name == name)
+    )
+    return result.scalars().first()
+
+async def get_taken_names(db: AsyncSession, owner_id: int, names: list[str]) -> set[str]:
+    result = await db.execute(
+        select(Audio.name).filter(Audio.owner_id == owner_id, Audio.name.in_(names))
+    )
+    return set(result.scalars().all())
+
+async def get_owner_audio_batch(db: AsyncSession, owner_id: int, limit: int) -> list[Audio]:
+    """Очередная пачка аудио владельца для пакетного удаления"""
+    result = await db.execute(
+        select(Audio).filter(Audio.owner_id == owner_id).order_by(Audio.id).limit(limit)
+    )
+    return result.scalars().all()
+
+async def count_owner_audios(db: AsyncSession, owner_id: int) -> int:
+    result = await db.execute(select(func.count()).select_from(Audio).filter(Audio.owner_id == owner_id))
+    return result.scalar_one()
+
 async def get_audios_by_owner(db: AsyncSession, owner_id: int, skip: int = 0, limit: int = 100) -> list[Audio]:
     result = await db.execute(
         select(Audio)
@@ -27,12 +97,169 @@ async def get_audios_by_owner(db: AsyncSession, owner_id: int, skip: int = 0, li
     )
     return result.scalars().all()
 
-async def delete_user_audio(db: AsyncSession, audio_id: int, owner_id: int) -> None:
-    await db.execute(
+def _created_at_value(db: AsyncSession, value: datetime):
+    """Значение для сравнения с `created_at`.
+
+    CURRENT_TIMESTAMP в SQLite хранится без долей секунды, а тип по
+    умолчанию дописывает `.000000`, и строки сравнивались бы неверно.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return literal(value, sqlite.DATETIME(truncate_microseconds=True))
+    return value
+
+def _owner_audios_query(
+    owner_id: int,
+    name_prefix: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None
+) -> Select:
+    query = (
+        select(Audio)
+        .filter(Audio.owner_id == owner_id)
+        .order_by(Audio.created_at.desc(), Audio.id.desc())
+    )
+    if name_prefix:
+        query = query.filter(Audio.name.startswith(name_prefix, autoescape=True))
+    if created_from is not None:
+        query = query.filter(Audio.created_at >= created_from)
+    if created_to is not None:
+        query = query.filter(Audio.created_at < created_to)
+    return query
+
+async def get_audios_page(
+    db: AsyncSession,
+    owner_id: int,
+    limit: int = 50,
+    after: tuple[datetime, int] | None = None,
+    name_prefix: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None
+) -> list[Audio]:
+    """Страница аудио владельца, от новых к старым.
+
+    `after` — пара `(created_at, id)` последней записи предыдущей
+    страницы; поиск идёт по индексу `(owner_id, created_at, id)`
+    без OFFSET.
+    """
+    query = _owner_audios_query(owner_id, name_prefix, created_from, created_to)
+    if after is not None:
+        created_at, audio_id = after
+        query = query.filter(tuple_(Audio.created_at, Audio.id) < tuple_(_created_at_value(db, created_at), audio_id))
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+async def stream_audios_by_owner(
+    db: AsyncSession,
+    owner_id: int,
+    name_prefix: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    batch_size: int = 500
+) -> AsyncIterator[Audio]:
+    """Все аудио владельца через серверный курсор, пачками по `batch_size`"""
+    query = _owner_audios_query(owner_id, name_prefix, created_from, created_to)
+    result = await db.stream_scalars(query.execution_options(yield_per=batch_size))
+    async for audio in result:
+        yield audio
+
+async def search_audios(
+    db: AsyncSession,
+    owner_id: int,
+    query: str,
+    limit: int = 50,
+    after: tuple[float, int] | None = None
+) -> list[tuple[Audio, float]]:
+    """Поиск по имени с ранжированием; возвращает пары `(аудио, оценка)`.
+
+    Совпадением считается префиксное совпадение всех слов запроса
+    (`tsvector @@ tsquery`) или похожесть по триграммам (`<%` из pg_trgm).
+    Порядок — по убыванию оценки, затем id; `after` — пара `(оценка, id)`
+    последней записи предыдущей страницы.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    if db.get_bind().dialect.name == "sqlite":
+        return await _search_audios_fallback(db, owner_id, query, limit, after)
+
+    document = search_document(Audio.name)
+    tsquery = func.to_tsquery(
+        literal_column("'simple'::regconfig"),
+        " & ".join(f"{token}:*" for token in tokens)
+    )
+    score = func.ts_rank_cd(document, tsquery) + func.word_similarity(query, Audio.name)
+    ranked = score.label("score")
+    statement = (
+        select(Audio, ranked)
+        .filter(
+            Audio.owner_id == owner_id,
+            or_(document.op("@@")(tsquery), literal(query).op("<%")(Audio.name))
+        )
+        .order_by(ranked.desc(), Audio.id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        statement = statement.filter(tuple_(score, Audio.id) < tuple_(*after))
+    result = await db.execute(statement)
+    return [(audio, float(value)) for audio, value in result.all()]
+
+async def _search_audios_fallback(
+    db: AsyncSession,
+    owner_id: int,
+    query: str,
+    limit: int,
+    after: tuple[float, int] | None
+) -> list[tuple[Audio, float]]:
+    index = search_index.get(owner_id)
+    if index is None:
+        generation = search_index.generation(owner_id)
+        result = await db.execute(select(Audio.id, Audio.name).filter(Audio.owner_id == owner_id))
+        index = search_index.build(owner_id, result.all(), generation)
+
+    matches = index.search(query)
+    if after is not None:
+        matches = [match for match in matches if match < after]
+    matches = matches[:limit]
+    if not matches:
+        return []
+    result = await db.execute(select(Audio).filter(Audio.id.in_([audio_id for _, audio_id in matches])))
+    audios = {audio.id: audio for audio in result.scalars().all()}
+    return [(audios[audio_id], score) for score, audio_id in matches if audio_id in audios]
+
+async def delete_user_audio(db: AsyncSession, audio_id: int, owner_id: int, commit: bool = True) -> Audio | None:
+    """Удаление аудио с освобождением ссылки на blob; возвращает удалённую запись"""
+    result = await db.execute(
         delete(Audio)
         .where(Audio.id == audio_id, Audio.owner_id == owner_id)
+        .returning(Audio)
     )
-    await db.commit()
+    audio = result.scalars().first()
+    if audio is not None:
+        await blob_crud.release_blobs(db, [audio.content_hash])
+        await fingerprint_crud.delete_fingerprint_hashes(db, [audio.id])
+        await user_crud.release_storage(db, owner_id, audio.size or 0)
+    mark_write(owner_id)
+    search_index.invalidate(owner_id)
+    if commit:
+        await db.commit()
+    return audio
+
+async def delete_user_audios(db: AsyncSession, audio_ids: list[int], owner_id: int, commit: bool = True) -> list[Audio]:
+    """Удаление нескольких аудио одним запросом; возвращает удалённые записи"""
+    result = await db.execute(
+        delete(Audio)
+        .where(Audio.id.in_(audio_ids), Audio.owner_id == owner_id)
+        .returning(Audio)
+    )
+    audios = result.scalars().all()
+    await blob_crud.release_blobs(db, [audio.content_hash for audio in audios])
+    await fingerprint_crud.delete_fingerprint_hashes(db, [audio.id for audio in audios])
+    await user_crud.release_storage(db, owner_id, sum(audio.size or 0 for audio in audios))
+    mark_write(owner_id)
+    search_index.invalidate(owner_id)
+    if commit:
+        await db.commit()
+    return audios
 
 async def update_audio_name(db: AsyncSession, audio_id: int, new_name: str) -> Audio | None:
     await db.execute(
@@ -41,4 +268,36 @@ async def update_audio_name(db: AsyncSession, audio_id: int, new_name: str) -> A
         .values(name=new_name)
     )
     await db.commit()
-    return await get_audio(db, audio_id)
\ No newline at end of file
+    audio = await get_audio(db, audio_id)
+    if audio is not None:
+        mark_write(audio.owner_id)
+        search_index.invalidate(audio.owner_id)
+    return audio
+
+async def get_analyzed_audio_by_hash(db: AsyncSession, content_hash: str) -> Audio | None:
+    """Уже проанализированная запись с тем же содержимым"""
+    result = await db.execute(
+        select(Audio)
+        .options(undefer(Audio.fingerprint))
+        .filter(Audio.content_hash == content_hash, Audio.analysis_status == "done")
+        .limit(1)
+    )
+    return result.scalars().first()
+
+async def get_pending_audio_ids(db: AsyncSession, created_before: datetime, limit: int = 1000) -> list[int]:
+    """Записи, ожидающие анализа дольше, чем до `created_before`"""
+    result = await db.execute(
+        select(Audio.id)
+        .filter(Audio.analysis_status == "pending", Audio.created_at < _created_at_value(db, created_before))
+        .order_by(Audio.id)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+async def update_audio_analysis(db: AsyncSession, audio_id: int, **values) -> None:
+    await db.execute(
+        update(Audio)
+        .where(Audio.id == audio_id)
+        .values(**values)
+    )
+    await db.commit()
@@ -0,0 +1,85 @@
+from collections import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.audio import Audio
+from app.models.blob import Blob
+
+def _insert(db: AsyncSession):
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(Blob)
+    return postgresql.insert(Blob)
+
+async def get_blob(db: AsyncSession, sha256: str) -> Blob | None:
+    result = await db.execute(select(Blob).filter(Blob.sha256 == sha256))
+    return result.scalars().first()
+
+async def acquire_blob(db: AsyncSession, sha256: str, size: int, path: str, count: int = 1) -> None:
+    """Добавление ссылок на blob (без commit), blob создаётся при необходимости"""
+    insert = _insert(db).values(sha256=sha256, size=size, path=path, refcount=count)
+    await db.execute(
+        insert.on_conflict_do_update(
+            index_elements=[Blob.sha256],
+            set_={"refcount": Blob.refcount + count}
+        )
+    )
+
+async def acquire_blobs(db: AsyncSession, blobs: list[tuple[str, int, str]]) -> None:
+    """То же для нескольких blob'ов одним запросом; элементы — `(sha256, size, path)`"""
+    counts = Counter(sha256 for sha256, _, _ in blobs)
+    rows = {
+        sha256: {"sha256": sha256, "size": size, "path": path, "refcount": counts[sha256]}
+        for sha256, size, path in blobs
+    }
+    if not rows:
+        return
+    insert = _insert(db).values(list(rows.values()))
+    await db.execute(
+        insert.on_conflict_do_update(
+            index_elements=[Blob.sha256],
+            set_={"refcount": Blob.refcount + insert.excluded.refcount}
+        )
+    )
+
+async def add_blob_reference(db: AsyncSession, sha256: str) -> Blob | None:
+    """Ссылка на уже существующий blob (без commit)"""
+    result = await db.execute(
+        update(Blob)
+        .where(Blob.sha256 == sha256)
+        .values(refcount=Blob.refcount + 1)
+        .returning(Blob)
+    )
+    return result.scalars().first()
+
+async def release_blobs(db: AsyncSession, hashes: list[str]) -> None:
+    """Снятие ссылок на blob'ы (без commit), по одной на каждый элемент `hashes`"""
+    for sha256, count in Counter(h for h in hashes if h).items():
+        await db.execute(
+            update(Blob)
+            .where(Blob.sha256 == sha256)
+            .values(refcount=Blob.refcount - count)
+        )
+
+async def lock_unreferenced_blobs(db: AsyncSession, hashes: list[str] | None = None, limit: int = 500) -> list[Blob]:
+    """Blob'ы без ссылок, заблокированные до конца транзакции"""
+    query = select(Blob).filter(Blob.refcount <= 0)
+    if hashes is not None:
+        query = query.filter(Blob.sha256.in_(hashes))
+    result = await db.execute(query.limit(limit).with_for_update(skip_locked=True))
+    return result.scalars().all()
+
+async def delete_blobs(db: AsyncSession, hashes: list[str]) -> None:
+    await db.execute(delete(Blob).where(Blob.sha256.in_(hashes), Blob.refcount <= 0))
+
+async def release_owner_blobs(db: AsyncSession, owner_id: int) -> None:
+    """Снятие ссылок всех аудио владельца одним запросом (без commit)"""
+    references = (
+        select(func.count())
+        .where(Audio.owner_id == owner_id, Audio.content_hash == Blob.sha256)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(Blob)
+        .where(Blob.sha256.in_(select(Audio.content_hash).where(Audio.owner_id == owner_id)))
+        .values(refcount=Blob.refcount - references)
+    )
@@ -0,0 +1,58 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, insert, func
+from sqlalchemy.orm import undefer
+from app.models.audio import Audio
+from app.models.fingerprint import AudioFingerprintHash
+
+async def store_fingerprint(
+    db: AsyncSession,
+    audio_id: int,
+    owner_id: int,
+    fingerprint: bytes,
+    index_hashes: list[int],
+    commit: bool = True
+) -> None:
+    """Сохранение отпечатка и его хешей в инвертированном индексе владельца"""
+    await db.execute(update(Audio).where(Audio.id == audio_id).values(fingerprint=fingerprint))
+    await db.execute(delete(AudioFingerprintHash).where(AudioFingerprintHash.audio_id == audio_id))
+    if index_hashes:
+        await db.execute(
+            insert(AudioFingerprintHash),
+            [{"owner_id": owner_id, "hash": h, "audio_id": audio_id} for h in index_hashes]
+        )
+    if commit:
+        await db.commit()
+
+async def find_candidates(
+    db: AsyncSession,
+    owner_id: int,
+    index_hashes: list[int],
+    exclude_id: int | None = None,
+    min_shared: int = 2,
+    limit: int = 50
+) -> list[tuple[int, int]]:
+    """Аудио владельца с наибольшим числом общих хешей: пары `(audio_id, общих)`"""
+    shared = func.count().label("shared")
+    query = (
+        select(AudioFingerprintHash.audio_id, shared)
+        .filter(AudioFingerprintHash.owner_id == owner_id, AudioFingerprintHash.hash.in_(index_hashes))
+        .group_by(AudioFingerprintHash.audio_id)
+        .having(func.count() >= min_shared)
+        .order_by(shared.desc())
+        .limit(limit)
+    )
+    if exclude_id is not None:
+        query = query.filter(AudioFingerprintHash.audio_id != exclude_id)
+    result = await db.execute(query)
+    return [(audio_id, count) for audio_id, count in result.all()]
+
+async def get_audios_with_fingerprints(db: AsyncSession, audio_ids: list[int]) -> list[Audio]:
+    result = await db.execute(
+        select(Audio).options(undefer(Audio.fingerprint)).filter(Audio.id.in_(audio_ids))
+    )
+    return result.scalars().all()
+
+async def delete_fingerprint_hashes(db: AsyncSession, audio_ids: list[int]) -> None:
+    """Удаление из индекса (без commit); в Postgres то же делает ON DELETE CASCADE"""
+    if audio_ids:
+        await db.execute(delete(AudioFingerprintHash).where(AudioFingerprintHash.audio_id.in_(audio_ids)))
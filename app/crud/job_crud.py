@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+from typing import Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, and_, or_, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.job import Job
+
+async def enqueue_job(
+    db: AsyncSession,
+    job_type: str,
+    payload: dict[str, Any],
+    run_at: datetime,
+    max_attempts: int,
+    idempotency_key: str | None = None
+) -> int | None:
+    """Постановка задачи (без commit); None, если задача с этим ключом уже есть"""
+    dialect = postgresql if db.get_bind().dialect.name != "sqlite" else sqlite
+    result = await db.execute(
+        dialect.insert(Job)
+        .values(
+            type=job_type,
+            payload=payload,
+            run_at=run_at,
+            max_attempts=max_attempts,
+            idempotency_key=idempotency_key
+        )
+        .on_conflict_do_nothing(index_elements=[Job.idempotency_key])
+        .returning(Job.id)
+    )
+    return result.scalar()
+
+async def requeue_failed_job(db: AsyncSession, idempotency_key: str, run_at: datetime, max_attempts: int) -> int | None:
+    """Повторная постановка проваленной задачи с этим ключом (без commit); None, если её нет.
+
+    Попытки считаются заново, прогресс прошлых попыток сохраняется.
+    """
+    result = await db.execute(
+        update(Job)
+        .where(Job.idempotency_key == idempotency_key, Job.status == "failed")
+        .values(
+            status="queued",
+            attempts=0,
+            max_attempts=max_attempts,
+            run_at=run_at,
+            locked_until=None,
+            finished_at=None,
+            last_error=None
+        )
+        .returning(Job.id)
+    )
+    return result.scalar()
+
+def _ready_jobs(job_type: str, limit: int, now: datetime):
+    return (
+        select(Job.id)
+        .filter(
+            Job.type == job_type,
+            or_(
+                and_(Job.status == "queued", Job.run_at <= now),
+                and_(Job.status == "running", Job.locked_until < now)
+            )
+        )
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .subquery()
+    )
+
+async def claim_jobs(db: AsyncSession, limits: dict[str, int], now: datetime, lease_seconds: float) -> list[Job]:
+    """Захват готовых задач с арендой до `now + lease_seconds` (с commit).
+
+    `limits` — сколько задач каждого типа можно взять; все типы
+    захватываются одним запросом. Готовы задачи в очереди с наступившим
+    `run_at` и задачи, аренда которых истекла. Строки, захватываемые
+    другим воркером, пропускаются (`SKIP LOCKED`), поэтому воркеры не
+    ждут друг друга.
+    """
+    ready = union_all(*(
+        select(subquery.c.id) for subquery in (
+            _ready_jobs(job_type, limit, now) for job_type, limit in limits.items()
+        )
+    ))
+    result = await db.execute(
+        update(Job)
+        .where(Job.id.in_(ready.scalar_subquery()))
+        .values(
+            status="running",
+            attempts=Job.attempts + 1,
+            locked_until=now + timedelta(seconds=lease_seconds)
+        )
+        .returning(Job)
+    )
+    jobs = result.scalars().all()
+    await db.commit()
+    return jobs
+
+async def _update_claimed(db: AsyncSession, job: Job, **values) -> bool:
+    """Изменение задачи, пока она за этим воркером: тот же статус и номер попытки"""
+    result = await db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == "running", Job.attempts == job.attempts)
+        .values(**values)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+async def extend_lease(db: AsyncSession, job: Job, locked_until: datetime) -> bool:
+    return await _update_claimed(db, job, locked_until=locked_until)
+
+async def finish_job(db: AsyncSession, job: Job, now: datetime) -> bool:
+    return await _update_claimed(db, job, status="done", locked_until=None, finished_at=now)
+
+async def retry_job(db: AsyncSession, job: Job, run_at: datetime, error: str) -> bool:
+    return await _update_claimed(db, job, status="queued", run_at=run_at, locked_until=None, last_error=error)
+
+async def fail_job(db: AsyncSession, job: Job, now: datetime, error: str) -> bool:
+    return await _update_claimed(db, job, status="failed", locked_until=None, finished_at=now, last_error=error)
+
+async def release_job(db: AsyncSession, job: Job) -> bool:
+    """Возврат задачи в очередь без учёта попытки (остановка воркера)"""
+    return await _update_claimed(db, job, status="queued", attempts=Job.attempts - 1, locked_until=None)
+
+async def update_progress(db: AsyncSession, job: Job, progress: dict[str, Any]) -> bool:
+    return await _update_claimed(db, job, progress=progress)
+
+async def get_job(db: AsyncSession, job_id: int) -> Job | None:
+    result = await db.execute(select(Job).filter(Job.id == job_id))
+    return result.scalars().first()
+
+async def get_job_by_key(db: AsyncSession, idempotency_key: str) -> Job | None:
+    result = await db.execute(select(Job).filter(Job.idempotency_key == idempotency_key))
+    return result.scalars().first()
+
+async def delete_finished_jobs(db: AsyncSession, before: datetime) -> int:
+    """Удаление завершённых задач; вместе с ними освобождаются их ключи идемпотентности"""
+    result = await db.execute(
+        delete(Job).where(Job.status.in_(["done", "failed"]), Job.finished_at < before)
+    )
+    await db.commit()
+    return result.rowcount
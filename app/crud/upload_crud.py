@@ -0,0 +1,102 @@
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, func
+from app.models.upload import UploadSession
+from app.crud import user_crud
+
+async def create_upload_session(
+    db: AsyncSession,
+    owner_id: int,
+    name: str,
+    chunk_size: int,
+    expires_at: datetime,
+    total_size: int | None = None,
+    commit: bool = True
+) -> UploadSession:
+    db_session = UploadSession(
+        id=uuid.uuid4().hex,
+        owner_id=owner_id,
+        name=name,
+        chunk_size=chunk_size,
+        total_size=total_size,
+        expires_at=expires_at
+    )
+    db.add(db_session)
+    if commit:
+        await db.commit()
+        await db.refresh(db_session)
+    else:
+        await db.flush()
+    return db_session
+
+async def get_upload_session(db: AsyncSession, upload_id: str, owner_id: int) -> UploadSession | None:
+    """Открытая загрузка пользователя; истёкшая считается несуществующей"""
+    result = await db.execute(
+        select(UploadSession)
+        .filter(
+            UploadSession.id == upload_id,
+            UploadSession.owner_id == owner_id,
+            UploadSession.expires_at > datetime.now(timezone.utc)
+        )
+    )
+    return result.scalars().first()
+
+async def extend_upload_session(db: AsyncSession, upload_id: str, expires_at: datetime) -> None:
+    await db.execute(
+        update(UploadSession).where(UploadSession.id == upload_id).values(expires_at=expires_at)
+    )
+    await db.commit()
+
+async def count_open_upload_sessions(db: AsyncSession, owner_id: int) -> int:
+    result = await db.execute(
+        select(func.count())
+        .select_from(UploadSession)
+        .filter(UploadSession.owner_id == owner_id, UploadSession.expires_at > datetime.now(timezone.utc))
+    )
+    return result.scalar_one()
+
+async def get_expired_upload_ids(db: AsyncSession, now: datetime, limit: int) -> list[str]:
+    result = await db.execute(
+        select(UploadSession.id)
+        .filter(UploadSession.expires_at <= now)
+        .order_by(UploadSession.expires_at)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+async def _release_reserved(db: AsyncSession, deleted) -> None:
+    """Возврат в квоту `total_size`, учтённого при создании загрузки"""
+    reserved = {}
+    for owner_id, total_size in deleted:
+        reserved[owner_id] = reserved.get(owner_id, 0) + (total_size or 0)
+    for owner_id, size in reserved.items():
+        await user_crud.release_storage(db, owner_id, size)
+
+async def delete_upload_sessions(db: AsyncSession, upload_ids: list[str]) -> None:
+    result = await db.execute(
+        delete(UploadSession)
+        .where(UploadSession.id.in_(upload_ids))
+        .returning(UploadSession.owner_id, UploadSession.total_size)
+    )
+    await _release_reserved(db, result.all())
+    await db.commit()
+
+async def delete_upload_session(db: AsyncSession, upload_id: str, commit: bool = True) -> None:
+    result = await db.execute(
+        delete(UploadSession)
+        .where(UploadSession.id == upload_id)
+        .returning(UploadSession.owner_id, UploadSession.total_size)
+    )
+    await _release_reserved(db, result.all())
+    if commit:
+        await db.commit()
+
+async def get_owner_upload_ids(db: AsyncSession, owner_id: int) -> list[str]:
+    result = await db.execute(select(UploadSession.id).filter(UploadSession.owner_id == owner_id))
+    return result.scalars().all()
+
+async def delete_owner_upload_sessions(db: AsyncSession, owner_id: int, commit: bool = True) -> None:
+    await db.execute(delete(UploadSession).where(UploadSession.owner_id == owner_id))
+    if commit:
+        await db.commit()
@@ -1,9 +1,13 @@
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, func, or_
 from app.models.user import User
-from app.security import get_password_hash
+from app.config import settings
+from app.security import get_password_hash_async
 from app.schemas.schemas import UserCreate, UserUpdate
+from app.services.user_cache import get_user_cache
+from app.db.database import mark_write
+from app.crud import blob_crud
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -23,7 +27,7 @@ async def get_user_by_yandex_id(db: AsyncSession, yandex_id: str) -> User | None
     return result.scalars().first()
 
 async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
-    hashed_password = get_password_hash(user_in.password) if user_in.password else None
+    hashed_password = await get_password_hash_async(user_in.password) if user_in.password else None
     db_user = User(
         email=user_in.email,
         username=user_in.username,
@@ -34,24 +38,35 @@ async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    mark_write(db_user.id)
     return db_user
 
 async def update_user(db: AsyncSession, user_id: int, user_in: UserUpdate) -> User:
     update_data = user_in.model_dump(exclude_unset=True)
     if "password" in update_data:
-        update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
+        update_data["hashed_password"] = await get_password_hash_async(update_data.pop("password"))
     
     await db.execute(
         update(User)
         .where(User.id == user_id)
         .values(**update_data)
     )
+    mark_write(user_id)
     await db.commit()
+    get_user_cache().invalidate(user_id)
     return await get_user(db, user_id)
 
 async def delete_user(db: AsyncSession, user_id: int) -> None:
+    """Удаление строки пользователя; аудио и загрузки удаляет ON DELETE CASCADE.
+
+    Ссылки на blob'ы снимаются здесь же, но файлы старых записей без
+    `content_hash` остаются: полное удаление — app.services.accounts.
+    """
+    await blob_crud.release_owner_blobs(db, user_id)
     await db.execute(delete(User).where(User.id == user_id))
+    mark_write(user_id)
     await db.commit()
+    get_user_cache().invalidate(user_id)
 
 async def get_users(
     db: AsyncSession, 
@@ -74,9 +89,27 @@ async def deactivate_user(
         .where(User.id == user_id)
         .values(is_active=False)
     )
+    mark_write(user_id)
     await db.commit()
+    get_user_cache().invalidate(user_id)
     return await get_user(db, user_id)
 
+async def deactivate_users(db: AsyncSession, user_ids: list[int]) -> list[int]:
+    """Деактивация нескольких пользователей одним запросом; возвращает найденные ID"""
+    result = await db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(is_active=False)
+        .returning(User.id)
+    )
+    found = result.scalars().all()
+    for user_id in found:
+        mark_write(user_id)
+    await db.commit()
+    for user_id in found:
+        get_user_cache().invalidate(user_id)
+    return found
+
 async def delete_user_as_superuser(
     db: AsyncSession,
     user_id: int,
@@ -85,6 +118,43 @@ async def delete_user_as_superuser(
     remover = await get_user(db, superuser_id)
     if not remover or not remover.is_superuser:
         raise PermissionError("Only superuser can delete users")
-        
-    await db.execute(delete(User).where(User.id == user_id))
-    await db.commit()
\ No newline at end of file
+
+    await delete_user(db, user_id)
+
+async def get_storage_usage(db: AsyncSession, email: str) -> tuple[int, int | None] | None:
+    """Занятое место и квота пользователя (None — без ограничения)"""
+    result = await db.execute(
+        select(User.storage_used, User.storage_quota).filter(User.email == email)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    used, quota = row
+    return used, quota if quota is not None else settings.STORAGE_QUOTA_BYTES
+
+async def reserve_storage(db: AsyncSession, user_id: int, size: int) -> bool:
+    """Учёт `size` байт в квоте пользователя (без commit).
+
+    Проверка и увеличение выполняются одним UPDATE, поэтому параллельные
+    загрузки не могут вместе превысить квоту. False — места не хватает.
+    """
+    if settings.STORAGE_QUOTA_BYTES is None:
+        fits = or_(User.storage_quota.is_(None), User.storage_used + size <= User.storage_quota)
+    else:
+        fits = User.storage_used + size <= func.coalesce(User.storage_quota, settings.STORAGE_QUOTA_BYTES)
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id, fits)
+        .values(storage_used=User.storage_used + size)
+        .returning(User.id)
+    )
+    return result.first() is not None
+
+async def release_storage(db: AsyncSession, user_id: int, size: int) -> None:
+    """Освобождение места в квоте (без commit)"""
+    if size:
+        await db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(storage_used=User.storage_used - size)
+        )
@@ -1,32 +1,131 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from typing import AsyncGenerator
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.engine import make_url
+from cachetools import TTLCache
+from typing import AsyncGenerator, Any, Callable
+import uuid
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.sql import text
 from app.config import settings
+from app.services.tracing import instrument_engine, span
 import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
-engine = create_async_engine(
-    settings.database_url,
-    pool_size=20,
-    max_overflow=10,
-    echo=True,
-    connect_args={"server_settings": {"jit": "off"}}  
+def pool_size() -> int:
+    """Размер пула воркера: доля общего бюджета или DB_POOL_SIZE"""
+    if settings.DB_POOL_TOTAL:
+        return max(1, settings.DB_POOL_TOTAL // max(1, settings.WEB_CONCURRENCY))
+    return settings.DB_POOL_SIZE
+
+def engine_options(url: str) -> dict[str, Any]:
+    """Параметры create_async_engine из настроек.
+
+    В режиме DB_PGBOUNCER (transaction pooling) кэши подготовленных
+    запросов отключаются, а имена выражений делаются уникальными:
+    следующая транзакция может попасть на другое серверное соединение.
+    """
+    options: dict[str, Any] = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    backend = make_url(url).get_backend_name()
+    if backend != "sqlite":
+        options.update(
+            pool_size=pool_size(),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    if make_url(url).get_driver_name() == "asyncpg":
+        connect_args: dict[str, Any] = {"server_settings": {"jit": "off"}}
+        if settings.DB_PGBOUNCER:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        else:
+            connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+            connect_args["prepared_statement_cache_size"] = settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+        options["connect_args"] = connect_args
+    return options
+
+class TracedSession(AsyncSession):
+    """Сессия, commit которой виден в трассировке запроса как отдельная фаза"""
+
+    async def commit(self) -> None:
+        with span("db_commit"):
+            await super().commit()
+
+class LazySessionmaker(sessionmaker):
+    """Фабрика сессий, которая получает движок при создании первой сессии"""
+
+    def __init__(self, get_bind: Callable[[], AsyncEngine], **kw: Any) -> None:
+        super().__init__(**kw)
+        self._get_bind = get_bind
+
+    def __call__(self, **local_kw: Any) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            self.configure(bind=self._get_bind())
+        return super().__call__(**local_kw)
+
+# Движки создаются при первом обращении (обычно в lifespan), а не при
+# импорте: Alembic и CLI, которым нужны только модели, не создают пул
+# и не загружают драйвер базы
+_engine: AsyncEngine | None = None
+_read_engine: AsyncEngine | None = None
+
+def _create_engine(url: str) -> AsyncEngine:
+    engine = create_async_engine(url, **engine_options(url))
+    instrument_engine(engine)
+    return engine
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(settings.database_url)
+    return _engine
+
+def get_read_engine() -> AsyncEngine:
+    """Реплика только для чтения; без READ_REPLICA_URL чтение идёт в основную базу"""
+    global _read_engine
+    if _read_engine is None:
+        _read_engine = _create_engine(settings.READ_REPLICA_URL) if settings.READ_REPLICA_URL else get_engine()
+    return _read_engine
+
+AsyncSessionLocal = LazySessionmaker(
+    get_engine,
+    class_=TracedSession,
+    expire_on_commit=False,
+    autoflush=False
 )
 
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
+ReadSessionLocal = LazySessionmaker(
+    get_read_engine,
+    class_=TracedSession,
     expire_on_commit=False,
     autoflush=False
 )
 
+# Пользователи, недавно писавшие в базу: их чтения идут в основную базу,
+# пока реплика может отставать. Учёт ведётся в памяти процесса.
+_recent_writers: TTLCache | None = None
+
+def mark_write(user_id: int) -> None:
+    global _recent_writers
+    if not settings.READ_REPLICA_URL:
+        return
+    if _recent_writers is None:
+        _recent_writers = TTLCache(maxsize=100_000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+    _recent_writers[user_id] = True
+
+def is_pinned(user_id: int) -> bool:
+    return _recent_writers is not None and user_id in _recent_writers
+
 Base = declarative_base()
 
 async def create_all_async():
-    async with engine.begin() as conn:
+    import app.models  # noqa: F401
+    async with get_engine().begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -36,17 +135,50 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         finally:
             await session.close()
 
+async def get_replica_db() -> AsyncGenerator[AsyncSession, None]:
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+def read_session_for(user_id: int) -> AsyncSession:
+    """Сессия для чтений пользователя с учётом окна read-your-writes"""
+    if is_pinned(user_id):
+        return AsyncSessionLocal()
+    return ReadSessionLocal()
+
 async def check_db_health() -> bool:
     try:
-        async with engine.begin() as conn:
+        async with get_engine().begin() as conn:
             await conn.execute(text("SELECT 1"))
         return True
     except Exception as e:
         logger.error(f"Database health check failed: {e}")
         return False
 
+def pool_status() -> dict[str, int]:
+    """Состояние пула соединений текущего воркера; пустое, пока движок не создан"""
+    if _engine is None:
+        return {}
+    pool = _engine.pool
+    stats = {}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if method is not None:
+            stats[name] = method()
+    return stats
+
 async def shutdown_db():
-    await engine.dispose()
+    global _engine, _read_engine
+    if _read_engine is not None and _read_engine is not _engine:
+        await _read_engine.dispose()
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = _read_engine = None
+    # Следующая сессия снова создаст движок (повторный запуск lifespan в тестах)
+    AsyncSessionLocal.configure(bind=None)
+    ReadSessionLocal.configure(bind=None)
 
 if __name__ == "__main__":
     asyncio.run(create_all_async())
\ No newline at end of file
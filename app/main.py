@@ -1,51 +1,87 @@
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api import router
+import asyncio
 import logging
-from contextlib import asynccontextmanager
-from app.db.database import engine, Base
+from contextlib import asynccontextmanager, suppress
+from app.config import settings
+from app.db.database import get_engine, Base, check_db_health, pool_status, shutdown_db
+from app import models  # noqa: F401
+from app.security import get_hashing_pool, token_cache_stats, get_claims_cache
+from app.services import metrics
+from app.services.tracing import TracingMiddleware
+from app.services.ratelimit import RateLimitMiddleware, close_limiter
+from app.services.user_cache import get_user_cache
+from app.services.renditions import get_rendition_cache
+from app.services.yandex_auth import close_yandex_client, yandex_cache, yandex_cache_stats
+from app.services.storage import get_storage, close_storage
+from app.services.analysis import get_analysis_pool
+from app.services.jobs import worker
+from app.services import tasks  # noqa: F401 - регистрирует типы задач
 from typing import AsyncIterator
 
 logger = logging.getLogger(__name__)
 
+metrics.register_stats("db_pool_connections", "Primary database pool connections by state", pool_status, "state")
+# Пулы и кэши создаются при первом обращении, поэтому счётчики берутся через геттеры
+metrics.register_stats(
+    "password_hashing_pool", "Password hashing thread pool counters", lambda: get_hashing_pool().stats(), "stat"
+)
+metrics.register_stats("user_cache", "Current-user cache counters", lambda: get_user_cache().stats(), "stat")
+metrics.register_stats(
+    "token_cache", "Decoded JWT claims cache counters",
+    lambda: {**token_cache_stats, "size": len(get_claims_cache()), "maxsize": get_claims_cache().maxsize}, "stat"
+)
+metrics.register_stats(
+    "yandex_cache", "Yandex user info cache counters",
+    lambda: {**yandex_cache_stats, "size": len(yandex_cache), "maxsize": yandex_cache.maxsize}, "stat"
+)
+metrics.register_stats(
+    "rendition_cache", "Transcoded rendition disk cache", lambda: get_rendition_cache().stats(), "stat"
+)
+metrics.register_stats("job_worker", "Background job worker counters", worker.stats, "stat")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     logger.info("Starting application...")
+    # Движок создаётся здесь, а не при импорте: он нужен почти каждому
+    # запросу. Клиент Яндекса (импорт httpx и загрузка сертификатов TLS —
+    # основная часть времени старта) создаётся при первом входе
+    engine = get_engine()
     
-    try:
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("Database tables created")
-    except Exception as e:
-        logger.error(f"Database initialization error: {str(e)}")
-        raise
-    
+    # Схема создаётся миграциями (alembic upgrade head) до старта воркеров;
+    # create_all оставлен для локальной разработки и тестов
+    if settings.DB_CREATE_ALL_ON_STARTUP:
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            logger.info("Database tables created")
+        except Exception as e:
+            logger.error(f"Database initialization error: {str(e)}")
+            raise
+
+    get_storage()
+    loop_monitor = asyncio.create_task(metrics.monitor_event_loop())
+    if settings.JOBS_IN_PROCESS:
+        worker.start()
+
     yield
 
     logger.info("Shutting down application...")
-    await engine.dispose()
+    await worker.stop()
+    loop_monitor.cancel()
+    with suppress(asyncio.CancelledError):
+        await loop_monitor
+    get_hashing_pool().shutdown()
+    get_analysis_pool().shutdown()
+    await close_yandex_client()
+    await close_storage()
+    await close_limiter()
+    await shutdown_db()
     logger.info("Database connections closed")
 
-app = FastAPI(
-    title="Audio File Service API",
-    description="API for uploading and managing audio files with Yandex OAuth",
-    version="1.0.0",
-    docs_url="/api/docs",
-    redoc_url="/api/redoc",
-    lifespan=lifespan
-)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.exception_handler(RequestValidationError)
 async def validation_exception_handler(
     request: Request, 
     exc: RequestValidationError
@@ -59,7 +95,6 @@ async def validation_exception_handler(
         },
     )
 
-@app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     logger.error(f"Unexpected error for {request.url}: {str(exc)}", exc_info=True)
     return JSONResponse(
@@ -67,17 +102,72 @@ async def global_exception_handler(request: Request, exc: Exception) -> JSONResp
         content={"detail": "Internal server error"},
     )
 
-app.include_router(
-    router,
-    prefix="/api/v1",
-    tags=["API v1"],
-    responses={
-        status.HTTP_401_UNAUTHORIZED: {
-            "description": "Missing or invalid credentials"
+async def health_check() -> dict[str, str]:
+    return {"status": "ok"}
+
+async def health_check_db() -> JSONResponse:
+    healthy = await check_db_health()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ok" if healthy else "unavailable", "pool": pool_status()},
+    )
+
+async def metrics_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+def create_app() -> FastAPI:
+    """Сборка приложения; набор middleware зависит от настроек, поэтому они
+    читаются здесь, а не при импорте модуля (`uvicorn --factory app.main:create_app`)
+    """
+    app = FastAPI(
+        title="Audio File Service API",
+        description="API for uploading and managing audio files with Yandex OAuth",
+        version="1.0.0",
+        docs_url="/api/docs",
+        redoc_url="/api/redoc",
+        lifespan=lifespan
+    )
+
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(RateLimitMiddleware)
+
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    # Без трассировки и профилирования middleware не добавляется вовсе
+    if settings.TRACING_ENABLED or settings.PROFILING_ENABLED:
+        app.add_middleware(TracingMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    app.add_exception_handler(RequestValidationError, validation_exception_handler)
+    app.add_exception_handler(Exception, global_exception_handler)
+
+    app.include_router(
+        router,
+        prefix="/api/v1",
+        tags=["API v1"],
+        responses={
+            status.HTTP_401_UNAUTHORIZED: {
+                "description": "Missing or invalid credentials"
+            }
         }
-    }
-)
+    )
 
-@app.get("/health", include_in_schema=False)
-async def health_check() -> dict[str, str]:
-    return {"status": "ok"}
\ No newline at end of file
+    app.add_api_route("/health", health_check, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/health/db", health_check_db, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+    return app
+
+def __getattr__(name: str):
+    # `uvicorn app.main:app`: приложение собирается при первом обращении к атрибуту
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
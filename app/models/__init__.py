@@ -0,0 +1,6 @@
+from app.models.user import User
+from app.models.audio import Audio
+from app.models.blob import Blob
+from app.models.upload import UploadSession
+from app.models.fingerprint import AudioFingerprintHash
+from app.models.job import Job
@@ -1,15 +1,64 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import (
+    Column, Integer, BigInteger, SmallInteger, Float, String, LargeBinary, ForeignKey, DateTime, Index,
+    UniqueConstraint, DDL, event, literal_column
+)
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from app.db.database import Base
 
 class Audio(Base):
     __tablename__ = "audios"
+    __table_args__ = (
+        Index('ix_audios_owner_created_id', 'owner_id', 'created_at', 'id'),
+        UniqueConstraint('owner_id', 'name', name='uq_audios_owner_name'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     path = Column(String)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    content_hash = Column(String(64), ForeignKey("blobs.sha256"), index=True, nullable=True)
+    size = Column(BigInteger, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Заполняются фоновым анализом после загрузки (app.services.analysis)
+    analysis_status = Column(String(16), nullable=False, server_default="pending")
+    duration = Column(Float, nullable=True)
+    sample_rate = Column(Integer, nullable=True)
+    channels = Column(SmallInteger, nullable=True)
+    bitrate = Column(Integer, nullable=True)
+    # Упакованный акустический отпечаток (app.services.fingerprint); в списках не нужен
+    fingerprint = deferred(Column(LargeBinary, nullable=True))
     
-    owner = relationship("User", back_populates="audios")
\ No newline at end of file
+    owner = relationship("User", back_populates="audios")
+
+
+def search_document(name):
+    """tsvector имени для полнотекстового поиска.
+
+    Выражение должно совпадать с выражением индекса `ix_audios_search`
+    до символа, иначе планировщик его не использует; константы поэтому
+    встраиваются в SQL, а не передаются параметрами.
+    """
+    return func.to_tsvector(
+        literal_column("'simple'::regconfig"),
+        func.translate(name, literal_column("'._-'"), literal_column("'   '"))
+    )
+
+
+# GIN-индексы поиска есть только в Postgres; owner_id в них — через btree_gin,
+# чтобы отбор по владельцу и совпадению шёл одним обходом индекса
+Index(
+    'ix_audios_search', Audio.owner_id, search_document(Audio.name),
+    postgresql_using='gin'
+).ddl_if(dialect='postgresql')
+Index(
+    'ix_audios_name_trgm', Audio.owner_id, Audio.name,
+    postgresql_using='gin',
+    postgresql_ops={'name': 'gin_trgm_ops'}
+).ddl_if(dialect='postgresql')
+
+event.listen(
+    Audio.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm; CREATE EXTENSION IF NOT EXISTS btree_gin").execute_if(dialect="postgresql")
+)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    path = Column(String, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, ForeignKey, Index
+from app.db.database import Base
+
+class AudioFingerprintHash(Base):
+    """Инвертированный индекс отпечатков: хеш -> аудио внутри владельца.
+
+    Хранится только выборка хешей каждого отпечатка
+    (`fingerprint.index_hashes`), поиск по (owner_id, hash) идёт по
+    первичному ключу и не зависит от размера библиотеки.
+    """
+    __tablename__ = "audio_fingerprint_hashes"
+    __table_args__ = (
+        Index('ix_audio_fingerprint_hashes_audio_id', 'audio_id'),
+    )
+
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    hash = Column(Integer, primary_key=True)
+    audio_id = Column(Integer, ForeignKey("audios.id", ondelete="CASCADE"), primary_key=True)
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class Job(Base):
+    """Задача фоновой очереди (app.services.jobs).
+
+    Воркеры забирают задачи через `FOR UPDATE SKIP LOCKED` и держат их
+    до `locked_until`; задача с истёкшей арендой считается брошенной и
+    забирается снова. `attempts` служит токеном: результат записывается,
+    только если задачу за это время не забрал другой воркер.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index('ix_jobs_type_status_run_at', 'type', 'status', 'run_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    type = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False)
+    # queued -> running -> done | failed; при повторе снова queued
+    status = Column(String(16), nullable=False, server_default="queued")
+    # Повторная постановка с тем же ключом не создаёт новую задачу
+    idempotency_key = Column(String(255), unique=True, nullable=True)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    # Прогресс долгой задачи (jobs.report_progress); сохраняется между попытками
+    progress = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, BigInteger
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    name = Column(String, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    total_size = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Продлевается с каждой частью; истёкшие загрузки удаляются вместе с частями
+    expires_at = Column(DateTime(timezone=True), index=True, nullable=False)
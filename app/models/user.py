@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -6,7 +6,11 @@ from app.db.database import Base
 class User(Base):
     __tablename__ = "users"
     __table_args__ = (
-        Index('idx_user_email_active', 'email', 'is_active'),
+        Index(
+            'ix_users_active_email', 'email',
+            postgresql_where=text('is_active'),
+            sqlite_where=text('is_active')
+        ),
     )
     
     id = Column(Integer, primary_key=True, index=True)
@@ -16,7 +20,12 @@ class User(Base):
     yandex_id = Column(String(50), unique=True, nullable=True)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
+    # Суммарный размер аудио пользователя, ведётся при загрузке и удалении
+    storage_used = Column(BigInteger, nullable=False, server_default="0")
+    # Индивидуальная квота; NULL — STORAGE_QUOTA_BYTES из настроек
+    storage_quota = Column(BigInteger, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    audios = relationship("Audio", back_populates="owner", cascade="all, delete-orphan")
\ No newline at end of file
+    # Строки аудио удаляет база (ON DELETE CASCADE), файлы — app.services.accounts
+    audios = relationship("Audio", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
\ No newline at end of file
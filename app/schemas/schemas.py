@@ -24,8 +24,98 @@ class AudioOut(AudioBase):
     path: str
     owner_id: int
     created_at: datetime
+    size: Optional[int] = Field(None, description="Размер файла в байтах")
+    analysis_status: str = "pending"
+    duration: Optional[float] = Field(None, description="Длительность в секундах")
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    bitrate: Optional[int] = Field(None, description="Битрейт, бит/с")
     model_config = ConfigDict(from_attributes=True)
 
+class SimilarAudioOut(BaseModel):
+    audio: AudioOut
+    score: float = Field(..., description="Доля общих хешей отпечатка, 0..1")
+
+class AudioUploadOut(AudioOut):
+    duplicates: list[SimilarAudioOut] = Field([], description="Уже загруженные аудио с тем же звучанием")
+
+class StorageUsageOut(BaseModel):
+    used: int = Field(..., description="Занято, байт, включая размер незавершённых загрузок")
+    quota: Optional[int] = Field(None, description="Квота, байт; null — без ограничения")
+
+class AudioFromHash(BaseModel):
+    sha256: str = Field(..., pattern=r"^[0-9a-f]{64}$", description="SHA-256 содержимого файла")
+    filename: str = Field(..., description="Исходное имя файла с расширением")
+    name: Optional[str] = Field(None, description="Имя для аудиофайла")
+
+class AudioPage(BaseModel):
+    items: list[AudioOut]
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы")
+
+class BatchUploadItem(BaseModel):
+    filename: str
+    status: int = Field(..., description="HTTP-статус для этого файла")
+    detail: Optional[str] = None
+    audio: Optional[AudioOut] = None
+
+class BatchUploadOut(BaseModel):
+    items: list[BatchUploadItem]
+
+class AudioBatchDelete(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=1000, description="ID удаляемых аудио")
+
+class BatchDeleteItem(BaseModel):
+    id: int
+    status: int = Field(..., description="HTTP-статус для этого аудио")
+    detail: Optional[str] = None
+
+class BatchDeleteOut(BaseModel):
+    items: list[BatchDeleteItem]
+
+class UserPurge(BaseModel):
+    user_ids: list[int] = Field(..., min_length=1, max_length=1000, description="ID удаляемых пользователей")
+
+class UserPurgeItem(BaseModel):
+    user_id: int
+    status: int = Field(..., description="HTTP-статус для этого пользователя")
+    detail: Optional[str] = None
+    job_id: Optional[int] = Field(None, description="ID задачи удаления")
+
+class UserPurgeOut(BaseModel):
+    items: list[UserPurgeItem]
+
+class UserPurgeStatus(BaseModel):
+    user_id: int
+    job_id: int
+    status: str = Field(..., description="queued, running, done или failed")
+    attempts: int
+    audios_deleted: int = Field(0, description="Удалено аудио")
+    audios_total: Optional[int] = Field(None, description="Всего аудио на момент начала удаления")
+    bytes_released: int = Field(0, description="Освобождено байт")
+    last_error: Optional[str] = None
+
+class UploadInitiate(BaseModel):
+    filename: str = Field(..., description="Исходное имя файла с расширением")
+    name: Optional[str] = Field(None, description="Имя для аудиофайла")
+    total_size: Optional[int] = Field(
+        None, ge=0, description="Размер файла в байтах; обязателен при квоте и занимает её до завершения загрузки"
+    )
+
+class UploadChunkOut(BaseModel):
+    index: int
+    size: int
+
+class UploadSessionOut(BaseModel):
+    upload_id: str
+    name: str
+    chunk_size: int
+    total_size: Optional[int] = None
+    expires_at: Optional[datetime] = None
+    received: list[UploadChunkOut] = []
+
+class UploadComplete(BaseModel):
+    total_chunks: int = Field(..., gt=0, description="Количество частей")
+
 class UserCreate(UserBase):
     password: Optional[str] = Field(None, description="Пароль (не используется при Яндекс-авторизации)")
     is_superuser: bool = Field(False, description="Флаг суперпользователя")
@@ -1,29 +1,58 @@
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import jwt
-from passlib.context import CryptContext
-from pydantic import BaseModel
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Optional, TypeVar
+import asyncio
+import hashlib
+import time
+from cachetools import TLRUCache
 from app.config import settings
+from app.services.tracing import span
 from fastapi import HTTPException
 import logging
 
 logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=12 
-)
+T = TypeVar("T")
 
-class TokenPayload(BaseModel):
+# passlib и python-jose (вместе с cryptography) импортируются при первом
+# хешировании или проверке токена, а не при старте приложения
+@lru_cache
+def get_pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=12
+    )
+
+@dataclass(frozen=True, slots=True)
+class TokenClaims:
     sub: str
-    exp: datetime
+    exp: float
     is_superuser: bool = False
+    type: str = "access"
+
+def _claims_expire_at(_key: bytes, claims: TokenClaims, now: float) -> float:
+    return min(claims.exp, now + settings.TOKEN_CACHE_MAX_TTL_SECONDS)
+
+# Кэши и пулы создаются при первом использовании: при импорте настройки не читаются
+@lru_cache
+def get_claims_cache() -> TLRUCache:
+    return TLRUCache(
+        maxsize=settings.TOKEN_CACHE_MAXSIZE,
+        ttu=_claims_expire_at,
+        timer=time.time
+    )
+
+token_cache_stats = {"hits": 0, "misses": 0}
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Сравнение пароля с хешем"""
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        return get_pwd_context().verify(plain_password, hashed_password)
     except Exception as e:
         logger.error(f"Password verification failed: {str(e)}")
         return False
@@ -32,7 +61,74 @@ def get_password_hash(password: str) -> str:
     """Генерация хеша пароля"""
     if len(password) < 8:
         raise ValueError("Password too short")
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+class HashingPool:
+    """Ограниченный пул потоков для bcrypt.
+
+    bcrypt отпускает GIL, поэтому хеширование в потоках не блокирует
+    event loop. Если в работе и в очереди уже `workers + queue_limit`
+    задач, новые запросы сразу получают 429 вместо ожидания.
+    """
+
+    def __init__(self, workers: int, queue_limit: int) -> None:
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def queued(self) -> int:
+        return max(self.in_flight - self.workers, 0)
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many password operations, retry later",
+                headers={"Retry-After": "1"}
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+@lru_cache
+def get_hashing_pool() -> HashingPool:
+    return HashingPool(
+        workers=settings.PASSWORD_HASH_WORKERS,
+        queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT
+    )
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await get_hashing_pool().run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    if len(password) < 8:
+        raise ValueError("Password too short")
+    return await get_hashing_pool().run(get_pwd_context().hash, password)
 
 def create_access_token(
     data: dict,
@@ -40,6 +136,8 @@ def create_access_token(
     refresh: bool = False
 ) -> str:
     """Создание JWT токена"""
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + (
         expires_delta or 
@@ -59,22 +157,54 @@ def create_access_token(
         logger.error(f"Token creation failed: {str(e)}")
         raise
 
-def verify_token(token: str) -> TokenPayload:
-    """Верификация JWT токена"""
-    try:
+def decode_token(token: str) -> TokenClaims:
+    """Проверка подписи JWT с кешированием результата до `exp` токена.
+
+    Ключ кеша — SHA-256 от токена, поэтому сами токены в памяти
+    не хранятся. Ошибки проверки пробрасываются как `jwt.JWTError`.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    claims = get_claims_cache().get(key)
+    if claims is not None:
+        token_cache_stats["hits"] += 1
+        return claims
+
+    token_cache_stats["misses"] += 1
+    from jose import jwt
+
+    with span("jwt_decode"):
         payload = jwt.decode(
             token,
             settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
+            algorithms=[settings.ALGORITHM],
+            options={"verify_aud": False}
         )
-        return TokenPayload(**payload)
+    sub = payload.get("sub")
+    if not sub:
+        raise jwt.JWTError("Token has no subject")
+
+    claims = TokenClaims(
+        sub=sub,
+        exp=float(payload.get("exp") or time.time() + settings.TOKEN_CACHE_MAX_TTL_SECONDS),
+        is_superuser=bool(payload.get("is_superuser", False)),
+        type=payload.get("type", "access")
+    )
+    get_claims_cache()[key] = claims
+    return claims
+
+def verify_token(token: str) -> TokenClaims:
+    """Верификация JWT токена"""
+    from jose import jwt
+
+    try:
+        return decode_token(token)
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=401,
             detail="Token expired"
         )
-    except jwt.JWTError as e:
+    except jwt.JWTError:
         raise HTTPException(
             status_code=401,
             detail="Invalid token"
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,106 @@
+"""Полное удаление учётных записей: аудио, файлы, загрузки и сама строка.
+
+Аудио удаляются пачками по ACCOUNT_PURGE_BATCH_SIZE, каждая в своей
+транзакции, поэтому блокировки короткие даже для тысяч записей. Файлы
+удаляются параллельно в пуле потоков хранилища. Удаление выполняется
+задачей `purge_user`: прерванная задача повторяется и продолжает с
+оставшихся записей, а прогресс сохраняется в строке задачи. Строка
+пользователя удаляется последней.
+"""
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.crud import audio_crud, job_crud, upload_crud, user_crud
+from app.db.database import AsyncSessionLocal
+from app.models.job import Job
+from app.services import blobs, jobs, uploads
+from app.services.analysis import peaks_key
+from app.services.renditions import get_rendition_cache
+from app.services.storage import get_storage
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def purge_key(user_id: int) -> str:
+    return f"purge_user:{user_id}"
+
+
+async def _remove_objects(keys: list[str]) -> None:
+    storage = get_storage()
+    semaphore = asyncio.Semaphore(settings.ACCOUNT_PURGE_FILE_CONCURRENCY)
+
+    async def remove(key: str) -> None:
+        async with semaphore:
+            await storage.delete(key)
+
+    await asyncio.gather(*(remove(key) for key in keys))
+
+
+async def purge_user(user_id: int) -> None:
+    """Удаление пользователя со всеми аудио и файлами; безопасно повторять"""
+    progress = jobs.current_progress()
+    deleted = progress.get("audios_deleted", 0)
+    released = progress.get("bytes_released", 0)
+    async with AsyncSessionLocal() as db:
+        if await user_crud.get_user(db, user_id) is None:
+            return
+        total = progress.get("audios_total") or await audio_crud.count_owner_audios(db, user_id)
+
+    while True:
+        async with AsyncSessionLocal() as db:
+            audios = await audio_crud.get_owner_audio_batch(db, user_id, settings.ACCOUNT_PURGE_BATCH_SIZE)
+            if not audios:
+                break
+            # Собственные файлы старых записей удаляются до строк: прерывание
+            # между шагами оставит строки без файлов, которые удалятся при повторе
+            paths = [audio.path for audio in audios if not audio.content_hash]
+            await _remove_objects([key for path in paths for key in (path, peaks_key(path))])
+            for path in paths:
+                await get_rendition_cache().discard(path)
+
+            removed = await audio_crud.delete_user_audios(db, [audio.id for audio in audios], user_id)
+            deleted += len(removed)
+            released += sum(audio.size or 0 for audio in removed)
+            await jobs.report_progress({"audios_deleted": deleted, "audios_total": total, "bytes_released": released})
+
+            # Без ссылок остались blob'ы только этого пользователя; если
+            # удаление файлов прервётся, их подберёт периодическая сборка мусора
+            hashes = [audio.content_hash for audio in removed if audio.content_hash]
+            if hashes:
+                await blobs.purge_unreferenced(db, hashes)
+        logger.info(f"Purging user {user_id}: {deleted}/{total} audios deleted")
+
+    async with AsyncSessionLocal() as db:
+        upload_ids = await upload_crud.get_owner_upload_ids(db, user_id)
+    for upload_id in upload_ids:
+        await uploads.discard_chunks(upload_id)
+    # Каталог файлов, загруженных до перехода на blob'ы
+    legacy = await get_storage().list(f"audios/user_{user_id}/")
+    await _remove_objects([item.key for item in legacy])
+
+    async with AsyncSessionLocal() as db:
+        await upload_crud.delete_owner_upload_sessions(db, user_id, commit=False)
+        await user_crud.delete_user(db, user_id)
+    logger.info(f"Purged user {user_id}: {deleted} audios, {released} bytes")
+
+
+async def schedule_purge(db: AsyncSession, user_ids: list[int]) -> dict[int, int]:
+    """Постановка удаления пользователей (без commit); ID пользователя -> ID задачи.
+
+    Уже поставленное удаление не дублируется, проваленное ставится заново.
+    """
+    scheduled = {}
+    for user_id in user_ids:
+        key = purge_key(user_id)
+        job_id = await jobs.enqueue(db, "purge_user", {"user_id": user_id}, idempotency_key=key)
+        if job_id is None:
+            job_id = await jobs.requeue_failed(db, "purge_user", key)
+        if job_id is None:
+            job_id = (await job_crud.get_job_by_key(db, key)).id
+        scheduled[user_id] = job_id
+    return scheduled
+
+
+async def get_purge_job(db: AsyncSession, user_id: int) -> Job | None:
+    return await job_crud.get_job_by_key(db, purge_key(user_id))
@@ -0,0 +1,128 @@
+import asyncio
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterator
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.crud import audio_crud, fingerprint_crud
+from app.db.database import AsyncSessionLocal
+from app.services import audio_meta, uploads
+from app.services import fingerprint as fingerprint_lib
+from app.services.storage import get_storage
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def peaks_key(path: str) -> str:
+    """Ключ пиков волны рядом с объектом аудио"""
+    return f"{path}.peaks"
+
+
+class AnalysisPool:
+    """Пул процессов для разбора и декодирования аудио.
+
+    Расчёт пиков и отпечатков нагружает CPU и держит GIL, поэтому выполняется
+    в отдельных процессах; пул создаётся при первом использовании.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # multiprocessing импортируется с пулом, а не при старте приложения
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def analyze(
+        self,
+        path: Path,
+        ext: str,
+        with_fingerprint: bool = False
+    ) -> tuple[audio_meta.AudioInfo, bytes | None, bytes | None]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), audio_meta.analyze_file, str(path), ext, settings.WAVEFORM_PEAKS, with_fingerprint
+        )
+
+    async def fingerprint(self, path: Path, ext: str) -> bytes | None:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), audio_meta.fingerprint_file, str(path), ext)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+@lru_cache
+def get_analysis_pool() -> AnalysisPool:
+    return AnalysisPool(settings.ANALYSIS_WORKERS)
+
+
+async def _single(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+async def analyze_audio(audio_id: int) -> None:
+    """Заполнение метаданных, пиков волны и отпечатка аудио.
+
+    Результат зависит только от содержимого, поэтому запись с тем же
+    `content_hash`, уже прошедшая анализ, просто копируется. Отпечаток,
+    посчитанный ещё при загрузке, не пересчитывается.
+    """
+    async with AsyncSessionLocal() as db:
+        audio = await audio_crud.get_audio(db, audio_id, with_fingerprint=True)
+        if audio is None or audio.analysis_status != "pending":
+            return
+        with_fingerprint = settings.FINGERPRINT_ENABLED and audio.fingerprint is None
+
+        if audio.content_hash:
+            done = await audio_crud.get_analyzed_audio_by_hash(db, audio.content_hash)
+            if done is not None:
+                if with_fingerprint and done.fingerprint is not None:
+                    await store_fingerprint(db, audio, done.fingerprint)
+                await audio_crud.update_audio_analysis(
+                    db,
+                    audio_id,
+                    analysis_status="done",
+                    duration=done.duration,
+                    sample_rate=done.sample_rate,
+                    channels=done.channels,
+                    bitrate=done.bitrate
+                )
+                return
+
+        path, ext = audio.path, Path(audio.name).suffix[1:].lower()
+        try:
+            async with uploads.local_copy(path) as local_path:
+                info, peaks, fingerprint = await get_analysis_pool().analyze(local_path, ext, with_fingerprint)
+            if peaks is not None:
+                await get_storage().put_stream(peaks_key(path), _single(peaks))
+        except Exception as e:
+            logger.error(f"Analysis of audio {audio_id} failed: {str(e)}")
+            await audio_crud.update_audio_analysis(db, audio_id, analysis_status="failed")
+            return
+
+        if fingerprint is not None:
+            await store_fingerprint(db, audio, fingerprint)
+        await audio_crud.update_audio_analysis(
+            db,
+            audio_id,
+            analysis_status="done" if peaks is not None else "failed",
+            duration=info.duration,
+            sample_rate=info.sample_rate,
+            channels=info.channels,
+            bitrate=info.bitrate
+        )
+        logger.info(f"Analyzed audio {audio_id}: {info}")
+
+
+async def store_fingerprint(db: AsyncSession, audio, fingerprint: bytes, commit: bool = False) -> None:
+    """Отпечаток и выборка его хешей в индекс владельца"""
+    index_hashes = fingerprint_lib.index_hashes(fingerprint_lib.decode_fingerprint(fingerprint))
+    await fingerprint_crud.store_fingerprint(db, audio.id, audio.owner_id, fingerprint, index_hashes, commit=commit)
@@ -0,0 +1,357 @@
+"""Разбор заголовков mp3/wav/ogg и расчёт пиков волны.
+
+Функции модуля не зависят от приложения и выполняются в пуле процессов,
+поэтому принимают и возвращают только простые значения.
+"""
+import math
+import os
+import shutil
+import struct
+import subprocess
+from dataclasses import dataclass
+from typing import Iterator
+from app.services import fingerprint
+
+PEAKS_MAGIC = b"PEAK"
+PEAKS_VERSION = 1
+# magic, версия, каналы, частота дискретизации, сэмплов на пик, число пиков
+PEAKS_HEADER = struct.Struct("<4sBBxxIII")
+DECODE_BLOCK_SAMPLES = 1 << 18
+
+
+@dataclass(frozen=True, slots=True)
+class AudioInfo:
+    duration: float | None = None
+    sample_rate: int | None = None
+    channels: int | None = None
+    bitrate: int | None = None
+
+
+# --- WAV ---------------------------------------------------------------------
+
+@dataclass(frozen=True, slots=True)
+class _WavLayout:
+    format_tag: int
+    channels: int
+    sample_rate: int
+    byte_rate: int
+    block_align: int
+    bits: int
+    data_offset: int
+    data_size: int
+
+
+def _wav_layout(path: str) -> _WavLayout:
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff not in (b"RIFF", b"RF64") or wave != b"WAVE":
+            raise ValueError("Not a RIFF/WAVE file")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("WAV data chunk not found")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                body = f.read(chunk_size + (chunk_size & 1))
+                fmt = list(struct.unpack("<HHIIHH", body[:16]))
+                # WAVE_FORMAT_EXTENSIBLE: настоящий формат в начале SubFormat GUID
+                if fmt[0] == 0xFFFE and len(body) >= 26:
+                    fmt[0] = struct.unpack("<H", body[24:26])[0]
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError("WAV fmt chunk missing")
+                data_offset = f.tell()
+                # Размер 0xFFFFFFFF встречается у потоковых и RF64 файлов
+                data_size = min(chunk_size, file_size - data_offset)
+                return _WavLayout(*fmt, data_offset, data_size)
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def parse_wav(path: str) -> AudioInfo:
+    layout = _wav_layout(path)
+    duration = layout.data_size / layout.byte_rate if layout.byte_rate else None
+    return AudioInfo(duration, layout.sample_rate, layout.channels, layout.byte_rate * 8)
+
+
+# --- MP3 ---------------------------------------------------------------------
+
+_MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],   # MPEG 1
+    2: [22050, 24000, 16000],   # MPEG 2
+    0: [11025, 12000, 8000],    # MPEG 2.5
+}
+MP3_SCAN_LIMIT = 256 * 1024
+
+
+def _skip_id3(f) -> int:
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b"ID3":
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        footer = 10 if header[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def parse_mp3(path: str) -> AudioInfo:
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        offset = _skip_id3(f)
+        f.seek(offset)
+        data = f.read(MP3_SCAN_LIMIT)
+
+    for i in range(len(data) - 4):
+        if data[i] != 0xFF or data[i + 1] & 0xE0 != 0xE0:
+            continue
+        header = int.from_bytes(data[i:i + 4], "big")
+        version_bits = (header >> 19) & 0b11
+        layer_bits = (header >> 17) & 0b11
+        bitrate_index = (header >> 12) & 0b1111
+        rate_index = (header >> 10) & 0b11
+        if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+            continue
+
+        version = 1 if version_bits == 3 else 2
+        layer = 4 - layer_bits
+        sample_rate = _MP3_SAMPLE_RATES[version_bits][rate_index]
+        bitrate = _MP3_BITRATES[(version, layer)][bitrate_index] * 1000
+        channels = 1 if (header >> 6) & 0b11 == 3 else 2
+        if layer == 1:
+            samples_per_frame = 384
+        elif layer == 3 and version == 2:
+            samples_per_frame = 576
+        else:
+            samples_per_frame = 1152
+
+        # Xing/Info (VBR) заголовок стоит после side information первого кадра
+        if version == 1:
+            side_info = 17 if channels == 1 else 32
+        else:
+            side_info = 9 if channels == 1 else 17
+        xing = i + 4 + side_info
+        frames = None
+        if data[xing:xing + 4] in (b"Xing", b"Info"):
+            flags = int.from_bytes(data[xing + 4:xing + 8], "big")
+            if flags & 0x1:
+                frames = int.from_bytes(data[xing + 8:xing + 12], "big")
+        elif data[i + 36:i + 40] == b"VBRI":
+            frames = int.from_bytes(data[i + 50:i + 54], "big")
+
+        audio_bytes = file_size - offset - i
+        if frames:
+            duration = frames * samples_per_frame / sample_rate
+            bitrate = int(audio_bytes * 8 / duration) if duration else bitrate
+        else:
+            duration = audio_bytes * 8 / bitrate
+        return AudioInfo(duration, sample_rate, channels, bitrate)
+
+    raise ValueError("MPEG audio frame not found")
+
+
+# --- OGG ---------------------------------------------------------------------
+
+OGG_TAIL_SIZE = 64 * 1024
+
+
+def _last_granule(path: str, file_size: int) -> int | None:
+    with open(path, "rb") as f:
+        f.seek(max(file_size - OGG_TAIL_SIZE, 0))
+        tail = f.read()
+    position = tail.rfind(b"OggS")
+    while position != -1:
+        if position + 14 <= len(tail):
+            granule = struct.unpack("<q", tail[position + 6:position + 14])[0]
+            if granule >= 0:
+                return granule
+        position = tail.rfind(b"OggS", 0, position)
+    return None
+
+
+def parse_ogg(path: str) -> AudioInfo:
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        page = f.read(28 + 255 + 64)
+    if page[:4] != b"OggS":
+        raise ValueError("Not an Ogg file")
+
+    segments = page[26]
+    packet = page[27 + segments:]
+    if packet[:7] == b"\x01vorbis":
+        channels = packet[11]
+        sample_rate, _, nominal_bitrate = struct.unpack("<Iii", packet[12:24])
+        granule_rate = sample_rate
+    elif packet[:8] == b"OpusHead":
+        channels = packet[9]
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+        sample_rate = struct.unpack("<I", packet[12:16])[0] or 48000
+        nominal_bitrate = 0
+        granule_rate = 48000
+    else:
+        raise ValueError("Unsupported Ogg codec")
+
+    granule = _last_granule(path, file_size)
+    duration = None
+    if granule is not None:
+        if packet[:8] == b"OpusHead":
+            granule = max(granule - pre_skip, 0)
+        duration = granule / granule_rate
+    bitrate = nominal_bitrate if nominal_bitrate > 0 else None
+    if bitrate is None and duration:
+        bitrate = int(file_size * 8 / duration)
+    return AudioInfo(duration, sample_rate, channels, bitrate)
+
+
+PARSERS = {
+    "wav": parse_wav,
+    "mp3": parse_mp3,
+    "ogg": parse_ogg,
+}
+
+
+def parse_audio(path: str, ext: str) -> AudioInfo:
+    return PARSERS[ext](path)
+
+
+# --- Пики волны ----------------------------------------------------------------
+
+def _wav_blocks(path: str) -> Iterator:
+    import numpy as np
+
+    layout = _wav_layout(path)
+    if layout.format_tag not in (1, 3) or not layout.channels:
+        raise ValueError(f"Unsupported WAV format {layout.format_tag}")
+    is_float = layout.format_tag == 3
+    width = layout.block_align // layout.channels
+    if width not in (1, 2, 3, 4):
+        raise ValueError(f"Unsupported WAV sample width {width}")
+    frames = layout.data_size // layout.block_align
+    if width == 3:
+        raw = np.memmap(path, dtype=np.uint8, mode="r", offset=layout.data_offset, shape=(frames * layout.block_align,))
+    else:
+        dtype = {1: np.uint8, 2: np.int16, 4: np.float32 if is_float else np.int32}[width]
+        raw = np.memmap(path, dtype=dtype, mode="r", offset=layout.data_offset, shape=(frames * layout.channels,))
+
+    step = DECODE_BLOCK_SAMPLES
+    for start in range(0, frames, step):
+        stop = min(start + step, frames)
+        if width == 3:
+            block = np.asarray(raw[start * layout.block_align:stop * layout.block_align]).reshape(-1, 3)
+            samples = (block[:, 0].astype(np.int32) | (block[:, 1].astype(np.int32) << 8) | (block[:, 2].astype(np.int32) << 16))
+            samples = np.where(samples & 0x800000, samples - 0x1000000, samples).astype(np.float32) / 8388608.0
+        else:
+            samples = np.asarray(raw[start * layout.channels:stop * layout.channels]).astype(np.float32)
+            if width == 1:
+                samples = (samples - 128.0) / 128.0
+            elif width == 2:
+                samples /= 32768.0
+            elif not is_float:
+                samples /= 2147483648.0
+        yield samples.reshape(-1, layout.channels).mean(axis=1)
+
+
+def _ffmpeg_blocks(path: str, sample_rate: int) -> Iterator:
+    import numpy as np
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is required to decode this format")
+    process = subprocess.Popen(
+        [ffmpeg, "-v", "error", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        stdout=subprocess.PIPE
+    )
+    try:
+        while data := process.stdout.read(DECODE_BLOCK_SAMPLES * 2):
+            usable = len(data) - len(data) % 2
+            yield np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {path}")
+
+
+def decode_mono(path: str, ext: str, sample_rate: int) -> Iterator:
+    """Блоки моно PCM float32 в диапазоне [-1, 1]"""
+    if ext == "wav":
+        return _wav_blocks(path)
+    return _ffmpeg_blocks(path, sample_rate)
+
+
+def compute_peaks(blocks: Iterator, samples_per_peak: int):
+    """Пары (min, max) по окнам из `samples_per_peak` сэмплов, int16"""
+    import numpy as np
+
+    mins, maxs = [], []
+    carry = np.empty(0, dtype=np.float32)
+    for block in blocks:
+        if carry.size:
+            block = np.concatenate((carry, block))
+        usable = block.size - block.size % samples_per_peak
+        if usable:
+            windows = block[:usable].reshape(-1, samples_per_peak)
+            mins.append(windows.min(axis=1))
+            maxs.append(windows.max(axis=1))
+        carry = block[usable:]
+    if carry.size:
+        mins.append(carry.min(keepdims=True))
+        maxs.append(carry.max(keepdims=True))
+    if not mins:
+        return np.zeros((0, 2), dtype=np.int16)
+
+    peaks = np.stack((np.concatenate(mins), np.concatenate(maxs)), axis=1)
+    return np.clip(np.round(peaks * 32767.0), -32768, 32767).astype("<i2")
+
+
+def encode_peaks(peaks, sample_rate: int, samples_per_peak: int) -> bytes:
+    header = PEAKS_HEADER.pack(PEAKS_MAGIC, PEAKS_VERSION, 1, sample_rate, samples_per_peak, len(peaks))
+    return header + peaks.tobytes()
+
+
+def analyze_file(
+    path: str,
+    ext: str,
+    target_peaks: int,
+    with_fingerprint: bool = False
+) -> tuple[AudioInfo, bytes | None, bytes | None]:
+    """Метаданные, пики и отпечаток файла за один проход декодирования (в пуле процессов)"""
+    info = parse_audio(path, ext)
+    if not info.duration or not info.sample_rate:
+        return info, None, None
+    total_samples = info.duration * info.sample_rate
+    samples_per_peak = max(1, math.ceil(total_samples / target_peaks))
+    builder = fingerprint.SpectrogramBuilder(info.sample_rate) if with_fingerprint else None
+
+    def blocks() -> Iterator:
+        for block in decode_mono(path, ext, info.sample_rate):
+            if builder is not None:
+                builder.feed(block)
+            yield block
+
+    peaks = compute_peaks(blocks(), samples_per_peak)
+    encoded_fingerprint = None
+    if builder is not None:
+        encoded_fingerprint = fingerprint.encode_fingerprint(fingerprint.fingerprint_spectrogram(builder.finish()))
+    return info, encode_peaks(peaks, info.sample_rate, samples_per_peak), encoded_fingerprint
+
+
+def fingerprint_file(path: str, ext: str) -> bytes | None:
+    """Только отпечаток; сжатые форматы декодируются сразу в `DECODE_SAMPLE_RATE`,
+    WAV передискретизируется в неё при построении спектрограммы"""
+    if ext == "wav":
+        sample_rate = parse_wav(path).sample_rate
+        if not sample_rate:
+            return None
+    else:
+        sample_rate = fingerprint.DECODE_SAMPLE_RATE
+    hashes = fingerprint.compute_fingerprint(decode_mono(path, ext, sample_rate), sample_rate)
+    return fingerprint.encode_fingerprint(hashes)
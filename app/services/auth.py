@@ -1,43 +1,73 @@
+from typing import AsyncGenerator
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.config import settings
-from app.models.user import User
+from app.security import TokenClaims, decode_token
 from app.db import database
 from app.crud.user_crud import get_user_by_email
+from app.services.user_cache import UserSnapshot, get_user_cache
+from app.services.tracing import span
 import logging
 
 logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/yandex")
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(database.get_db)
-) -> User:
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def get_token_claims(token: str = Depends(oauth2_scheme)) -> TokenClaims:
+    """Проверенные claims токена.
+
+    FastAPI кеширует зависимость в рамках запроса, поэтому токен
+    декодируется один раз, сколько бы зависимостей его ни запросили.
+    """
+    from jose import JWTError
+
     try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM],
-            options={"verify_aud": False}
-        )
-        email: str = payload.get("sub")
-        if not email:
-            logger.error("No email in JWT token")
-            raise credentials_exception
-            
-        user = await get_user_by_email(db, email=email)
-        if user is None or not user.is_active:
-            logger.error(f"User not found or inactive: {email}")
-            raise credentials_exception
-        return user
-        
+        claims = decode_token(token)
     except JWTError as e:
         logger.error(f"JWT error: {str(e)}")
-        raise credentials_exception
\ No newline at end of file
+        raise credentials_exception()
+
+    if claims.type != "access":
+        logger.error(f"Rejected {claims.type} token for {claims.sub}")
+        raise credentials_exception()
+    return claims
+
+async def get_current_user(
+    claims: TokenClaims = Depends(get_token_claims),
+    db: AsyncSession = Depends(database.get_db)
+) -> UserSnapshot:
+    email = claims.sub
+    user = get_user_cache().get(email)
+    if user is None:
+        with span("user_lookup"):
+            # Короткая сессия, а не зависимость: соединение не держится до конца
+            # запроса, пока обработчик берёт своё из того же пула
+            async with database.ReadSessionLocal() as read_db:
+                db_user = await get_user_by_email(read_db, email=email)
+            # Реплика могла ещё не увидеть недавнее изменение пользователя
+            if db_user is not None and database.is_pinned(db_user.id):
+                db_user = await get_user_by_email(db, email=email)
+        if db_user is not None:
+            user = UserSnapshot.from_user(db_user)
+            get_user_cache().put(user)
+
+    if user is None or not user.is_active:
+        logger.error(f"User not found or inactive: {email}")
+        raise credentials_exception()
+    return user
+
+async def get_current_superuser(current_user: UserSnapshot = Depends(get_current_user)) -> UserSnapshot:
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Superuser privileges required")
+    return current_user
+
+async def get_read_db(current_user: UserSnapshot = Depends(get_current_user)) -> AsyncGenerator[AsyncSession, None]:
+    """Сессия для чтения: реплика, либо основная база сразу после записи пользователя"""
+    async with database.read_session_for(current_user.id) as session:
+        yield session
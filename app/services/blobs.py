@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.crud import blob_crud
+from app.services import uploads
+from app.services.analysis import peaks_key
+from app.services.renditions import get_rendition_cache
+from app.services.storage import get_storage
+from app.services.metrics import record_upload
+from app.services.tracing import span
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def blob_key(sha256: str) -> str:
+    """Ключ blob'а в хранилище: `blobs/ab/cd/abcd...`"""
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+@dataclass(frozen=True, slots=True)
+class StagedBlob:
+    """Загруженный в локальный staging, но ещё не размещённый в хранилище файл"""
+    staging_path: Path
+    sha256: str
+    size: int
+
+    @property
+    def key(self) -> str:
+        return blob_key(self.sha256)
+
+
+def _staging_path() -> Path:
+    return Path(settings.UPLOAD_STAGING_DIR) / uuid.uuid4().hex
+
+
+async def stage_stream(chunks: AsyncIterator[bytes], max_size: int | None = None) -> StagedBlob:
+    """Запись потока во временный файл с подсчётом SHA-256 по ходу записи"""
+    hasher = hashlib.sha256()
+    staging_path = _staging_path()
+    size = await uploads.save_stream(chunks, staging_path, max_size, hasher)
+    return StagedBlob(staging_path, hasher.hexdigest(), size)
+
+
+async def stage_upload(file: UploadFile, max_size: int | None = None) -> StagedBlob:
+    hasher = hashlib.sha256()
+    staging_path = _staging_path()
+    start = time.perf_counter()
+    with span("file_write"):
+        size = await uploads.save_upload_file(file, staging_path, max_size, hasher=hasher)
+    record_upload("file", size, time.perf_counter() - start)
+    return StagedBlob(staging_path, hasher.hexdigest(), size)
+
+
+async def stage_chunks(upload_id: str, total_chunks: int) -> StagedBlob:
+    return await stage_stream(uploads.iter_chunks(upload_id, total_chunks))
+
+
+async def acquire(db: AsyncSession, staged: StagedBlob) -> None:
+    """Ссылка на blob в текущей транзакции; файл размещается в `publish`"""
+    await blob_crud.acquire_blob(db, staged.sha256, staged.size, staged.key)
+
+
+async def publish(staged: StagedBlob) -> None:
+    """Размещение blob'а после commit.
+
+    Вызывается, когда строка `blobs` уже держит ссылку, поэтому сборщик
+    мусора не может удалить файл между проверкой и заменой. Дубликат
+    просто удаляется из staging.
+    """
+    storage = get_storage()
+    if await storage.stat(staged.key) is not None:
+        await discard(staged)
+        return
+    try:
+        await storage.put_file(staged.key, staged.staging_path)
+    except BaseException:
+        await discard(staged)
+        raise
+
+
+async def discard(staged: StagedBlob) -> None:
+    await run_in_threadpool(staged.staging_path.unlink, True)
+
+
+async def purge_unreferenced(db: AsyncSession, hashes: list[str] | None = None) -> int:
+    """Удаление blob'ов без ссылок: строки блокируются, объекты удаляются до commit"""
+    if hashes is not None:
+        blobs = await blob_crud.lock_unreferenced_blobs(db, hashes, limit=len(hashes))
+    else:
+        blobs = await blob_crud.lock_unreferenced_blobs(db)
+    if not blobs:
+        return 0
+    storage = get_storage()
+    keys = [key for blob in blobs for key in (blob.path, peaks_key(blob.path))]
+    await asyncio.gather(*(storage.delete(key) for key in keys))
+    rendition_cache = get_rendition_cache()
+    for blob in blobs:
+        await rendition_cache.discard(blob.path)
+    await blob_crud.delete_blobs(db, [blob.sha256 for blob in blobs])
+    await db.commit()
+    logger.info(f"Purged {len(blobs)} unreferenced blobs")
+    return len(blobs)
@@ -0,0 +1,61 @@
+"""Поиск дублей и похожих аудио владельца по акустическим отпечаткам.
+
+Кандидаты берутся из инвертированного индекса по выборке хешей, поэтому
+стоимость запроса зависит от числа совпадений, а не от размера
+библиотеки; точная оценка считается только для кандидатов.
+"""
+from pathlib import Path
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.crud import fingerprint_crud
+from app.models.audio import Audio
+from app.services import fingerprint as fingerprint_lib
+from app.services.analysis import get_analysis_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Во сколько раз больше кандидатов, чем нужно результатов, проверяется точно
+CANDIDATES_FACTOR = 4
+
+
+async def find_similar(
+    db: AsyncSession,
+    owner_id: int,
+    fingerprint: bytes,
+    exclude_id: int | None = None,
+    limit: int = 10,
+    min_score: float = 0.0
+) -> list[tuple[Audio, float]]:
+    """Похожие аудио владельца: пары `(аудио, оценка)` по убыванию оценки"""
+    hashes = fingerprint_lib.decode_fingerprint(fingerprint)
+    index_hashes = fingerprint_lib.index_hashes(hashes)
+    if not index_hashes:
+        return []
+    candidates = await fingerprint_crud.find_candidates(
+        db, owner_id, index_hashes, exclude_id=exclude_id, limit=limit * CANDIDATES_FACTOR
+    )
+    if not candidates:
+        return []
+
+    audios = await fingerprint_crud.get_audios_with_fingerprints(db, [audio_id for audio_id, _ in candidates])
+    results = []
+    for audio in audios:
+        if audio.fingerprint is None:
+            continue
+        score = fingerprint_lib.similarity(hashes, fingerprint_lib.decode_fingerprint(audio.fingerprint))
+        if score >= min_score:
+            results.append((audio, score))
+    results.sort(key=lambda item: (-item[1], -item[0].id))
+    return results[:limit]
+
+
+async def fingerprint_staged(path: Path, ext: str) -> bytes | None:
+    """Отпечаток загруженного, но ещё не сохранённого файла; ошибки не мешают загрузке"""
+    if not settings.FINGERPRINT_ENABLED or not settings.DUPLICATE_CHECK_ON_UPLOAD:
+        return None
+    try:
+        return await get_analysis_pool().fingerprint(path, ext)
+    except Exception as e:
+        logger.warning(f"Fingerprinting {path} failed: {str(e)}")
+        return None
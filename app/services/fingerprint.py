@@ -0,0 +1,215 @@
+"""Акустические отпечатки аудио для поиска дублей и похожих записей.
+
+Отпечаток — набор хешей пар спектральных пиков ("созвездие"): частоты
+двух пиков и расстояние между ними во времени. Спектрограмма всегда
+считается по моно PCM в `DECODE_SAMPLE_RATE`: сжатые форматы ffmpeg
+декодирует сразу в этой частоте, PCM другой частоты (WAV, общий проход
+с пиками волны) передискретизируется `Resampler`. Иначе размер окна
+FFT, утечка спектра и округление шага зависят от частоты файла, и у
+копий одной записи в 44.1 и 22.05 кГц совпадает лишь часть хешей.
+
+Как и `audio_meta`, модуль выполняется в пуле процессов и работает
+только с простыми значениями.
+"""
+import struct
+from typing import Iterator
+
+FINGERPRINT_MAGIC = b"AFP1"
+FINGERPRINT_HEADER = struct.Struct("<4sI")
+
+FRAME_SECONDS = 0.1858    # окно STFT (2048 сэмплов при 11025 Гц)
+HOP_SECONDS = 0.0464      # шаг окна (512 сэмплов при 11025 Гц)
+GRID_BINS = 256           # полосы сетки частот
+GRID_HZ = 5000 / GRID_BINS
+MIN_BIN = 13              # ниже ~250 Гц спектр сильнее всего искажают кодеки
+PEAK_TIME_RADIUS = 10     # окрестность локального максимума, кадров
+PEAK_FREQ_RADIUS = 10     # и полос
+PEAK_MIN_DB = 10.0        # превышение над средним уровнем спектрограммы
+FANOUT = 3                # пар на каждый опорный пик
+MAX_DT = 63               # максимальное расстояние в паре, кадров (6 бит)
+MAX_SECONDS = 600         # отпечаток строится по первым десяти минутам
+DECODE_SAMPLE_RATE = 11025  # частота PCM, по которой строится спектрограмма
+RESAMPLE_CUTOFF_HZ = 5000   # полоса фильтра перед прореживанием: верх сетки частот
+RESAMPLE_TAPS = 32          # длина фильтра на один выходной сэмпл
+RESAMPLE_PHASES = 1024      # шаг дробной позиции в таблице весов фильтра
+
+# В индекс попадает детерминированная выборка хешей: у двух копий одного
+# трека выбираются одни и те же хеши, а индекс меньше в INDEX_SAMPLING раз
+INDEX_SAMPLING = 8
+
+
+class Resampler:
+    """Потоковая передискретизация моно PCM в `DECODE_SAMPLE_RATE`.
+
+    Каждый выходной отсчёт — свёртка входа с оконным sinc-фильтром,
+    центрированным в его дробной позиции: фильтр заодно срезает всё выше
+    сетки частот, что иначе отразилось бы в неё при прореживании.
+    """
+
+    def __init__(self, sample_rate: int) -> None:
+        import numpy as np
+
+        self.step = sample_rate / DECODE_SAMPLE_RATE
+        cutoff = min(RESAMPLE_CUTOFF_HZ, sample_rate / 2) / sample_rate
+        self.half = int(RESAMPLE_TAPS * max(self.step, 1.0)) // 2
+        self.offsets = np.arange(-self.half + 1, self.half + 1)
+        # Веса для RESAMPLE_PHASES + 1 дробных позиций между соседними сэмплами
+        distance = self.offsets[None, :] - np.arange(RESAMPLE_PHASES + 1)[:, None] / RESAMPLE_PHASES
+        weights = np.sinc(2 * cutoff * distance) * (0.54 + 0.46 * np.cos(np.pi * distance / self.half))
+        self.weights = (weights / weights.sum(axis=1, keepdims=True)).astype(np.float32)
+        # Перед первым сэмплом — тишина, чтобы фильтр был центрирован с самого начала
+        self.buffer = np.zeros(self.half, dtype=np.float32)
+        self.position = float(self.half)
+
+    def feed(self, block):
+        import numpy as np
+
+        samples = np.concatenate((self.buffer, block))
+        positions = np.arange(self.position, samples.size - self.half, self.step)
+        if not positions.size:
+            self.buffer = samples
+            return np.empty(0, dtype=np.float32)
+        base = np.floor(positions)
+        phases = np.round((positions - base) * RESAMPLE_PHASES).astype(np.int64)
+        indices = base.astype(np.int64)[:, None] + self.offsets
+        resampled = np.einsum("ij,ij->i", samples[indices], self.weights[phases])
+
+        following = positions[-1] + self.step
+        keep = int(following) - self.half + 1
+        self.buffer = samples[keep:]
+        self.position = following - keep
+        return resampled
+
+
+class SpectrogramBuilder:
+    """Потоковый расчёт лог-мощности на сетке `GRID_BINS` полос.
+
+    Блоки PCM частоты `sample_rate` подаются по мере декодирования через
+    `feed` и при необходимости приводятся к `DECODE_SAMPLE_RATE`, так что
+    отпечаток считается за тот же проход, что и пики волны.
+    """
+
+    def __init__(self, sample_rate: int) -> None:
+        import numpy as np
+
+        self.resampler = Resampler(sample_rate) if sample_rate != DECODE_SAMPLE_RATE else None
+        self.frame = int(round(DECODE_SAMPLE_RATE * FRAME_SECONDS))
+        self.hop = int(round(DECODE_SAMPLE_RATE * HOP_SECONDS))
+        self.window = np.hanning(self.frame).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame, 1 / DECODE_SAMPLE_RATE)
+        grid = (freqs / GRID_HZ).astype(np.int64)
+        valid = grid < GRID_BINS
+        # Суммирование мощности бинов FFT по полосам сетки одним умножением матриц
+        self.mapping = np.zeros((len(freqs), GRID_BINS), dtype=np.float32)
+        self.mapping[np.nonzero(valid)[0], grid[valid]] = 1.0
+        self.remaining = int(MAX_SECONDS * sample_rate)
+        self.rows = []
+        self.carry = np.empty(0, dtype=np.float32)
+
+    def feed(self, block) -> None:
+        import numpy as np
+        from numpy.lib.stride_tricks import sliding_window_view
+
+        if self.remaining <= 0:
+            return
+        block = block[:self.remaining]
+        self.remaining -= block.size
+        if self.resampler is not None:
+            block = self.resampler.feed(block)
+        samples = np.concatenate((self.carry, block)) if self.carry.size else block
+        if samples.size < self.frame:
+            self.carry = samples
+            return
+        frames = sliding_window_view(samples, self.frame)[::self.hop]
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        self.rows.append(power.astype(np.float32) @ self.mapping)
+        self.carry = samples[len(frames) * self.hop:]
+
+    def finish(self):
+        import numpy as np
+
+        if not self.rows:
+            return np.zeros((0, GRID_BINS), dtype=np.float32)
+        return 10 * np.log10(np.concatenate(self.rows) + 1e-10)
+
+
+def _peaks(spectrogram):
+    """Локальные максимумы спектрограммы: массивы (кадр, полоса)"""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    if spectrogram.shape[0] < 2 * PEAK_TIME_RADIUS + 1:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # Прямоугольный максимум-фильтр раскладывается на два одномерных
+    padded = np.pad(spectrogram, ((PEAK_TIME_RADIUS,) * 2, (0, 0)), constant_values=-np.inf)
+    local = sliding_window_view(padded, 2 * PEAK_TIME_RADIUS + 1, axis=0).max(axis=-1)
+    padded = np.pad(local, ((0, 0), (PEAK_FREQ_RADIUS,) * 2), constant_values=-np.inf)
+    local = sliding_window_view(padded, 2 * PEAK_FREQ_RADIUS + 1, axis=1).max(axis=-1)
+
+    threshold = spectrogram[:, MIN_BIN:].mean() + PEAK_MIN_DB
+    is_peak = (spectrogram == local) & (spectrogram > threshold)
+    is_peak[:, :MIN_BIN] = False
+    times, bins = np.nonzero(is_peak)
+    return times, bins
+
+
+def _hashes(times, bins):
+    """Хеши пар пиков: `f1 << 14 | f2 << 6 | dt`, отсортированные и уникальные"""
+    import numpy as np
+
+    order = np.lexsort((bins, times))
+    times, bins = times[order], bins[order]
+    parts = []
+    for k in range(1, FANOUT + 1):
+        if times.size <= k:
+            break
+        dt = times[k:] - times[:-k]
+        ok = dt <= MAX_DT
+        parts.append((bins[:-k][ok] << 14) | (bins[k:][ok] << 6) | dt[ok])
+    if not parts:
+        return np.empty(0, dtype=np.uint32)
+    return np.unique(np.concatenate(parts)).astype(np.uint32)
+
+
+def fingerprint_spectrogram(spectrogram):
+    """Отсортированный массив уникальных хешей uint32"""
+    return _hashes(*_peaks(spectrogram))
+
+
+def compute_fingerprint(blocks: Iterator, sample_rate: int):
+    """Отпечаток по блокам моно PCM"""
+    builder = SpectrogramBuilder(sample_rate)
+    for block in blocks:
+        builder.feed(block)
+    return fingerprint_spectrogram(builder.finish())
+
+
+def encode_fingerprint(hashes) -> bytes:
+    return FINGERPRINT_HEADER.pack(FINGERPRINT_MAGIC, len(hashes)) + hashes.astype("<u4").tobytes()
+
+
+def decode_fingerprint(data: bytes):
+    import numpy as np
+
+    magic, count = FINGERPRINT_HEADER.unpack_from(data)
+    if magic != FINGERPRINT_MAGIC:
+        raise ValueError("Not a fingerprint")
+    return np.frombuffer(data, dtype="<u4", count=count, offset=FINGERPRINT_HEADER.size)
+
+
+def index_hashes(hashes) -> list[int]:
+    """Хеши отпечатка, попадающие в инвертированный индекс"""
+    import numpy as np
+
+    mixed = (hashes.astype(np.uint64) * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)
+    return hashes[(mixed >> np.uint64(16)) % np.uint64(INDEX_SAMPLING) == 0].astype(np.int64).tolist()
+
+
+def similarity(a, b) -> float:
+    """Доля общих хешей относительно меньшего отпечатка"""
+    import numpy as np
+
+    if not len(a) or not len(b):
+        return 0.0
+    shared = np.intersect1d(a, b, assume_unique=True).size
+    return shared / min(len(a), len(b))
@@ -0,0 +1,295 @@
+"""Надёжная очередь фоновых задач на таблице `jobs`.
+
+Задача ставится в той же транзакции, что и изменение, которое её
+порождает, поэтому после commit она не потеряется при перезапуске
+процесса. Воркер забирает задачи через `FOR UPDATE SKIP LOCKED` с
+арендой, продлевает аренду, пока задача выполняется, повторяет упавшие
+задачи с экспоненциальной задержкой и ограничивает параллельность
+отдельно для каждого типа. Воркер работает в процессе приложения
+(JOBS_IN_PROCESS) или отдельно (`python -m app.worker`).
+"""
+import asyncio
+import random
+import time
+from collections import defaultdict
+from contextlib import suppress
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.crud import job_crud
+from app.db.database import AsyncSessionLocal
+from app.models.job import Job
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class JobType:
+    """Тип задачи. Числа из настроек передаются функциями без аргументов
+    и читаются при использовании: типы регистрируются при импорте модулей.
+    """
+    name: str
+    # Вызывается как handler(**payload)
+    handler: Callable[..., Awaitable[None]]
+    default_concurrency: int | Callable[[], int]
+    default_max_attempts: int | None
+    # Периодические задачи ставятся воркером раз в `every` секунд
+    default_every: float | Callable[[], float] | None = None
+
+    @property
+    def concurrency(self) -> int:
+        return settings.JOB_CONCURRENCY.get(self.name, _resolve(self.default_concurrency))
+
+    @property
+    def max_attempts(self) -> int:
+        return self.default_max_attempts or settings.JOB_MAX_ATTEMPTS
+
+    @property
+    def every(self) -> float | None:
+        return _resolve(self.default_every)
+
+
+def _resolve(value):
+    return value() if callable(value) else value
+
+
+job_types: dict[str, JobType] = {}
+
+# Задача, которую выполняет текущая asyncio-задача воркера
+_current_job: ContextVar[Job | None] = ContextVar("current_job", default=None)
+
+
+def register(
+    name: str,
+    handler: Callable[..., Awaitable[None]],
+    concurrency: int | Callable[[], int] = 1,
+    max_attempts: int | None = None,
+    every: float | Callable[[], float] | None = None
+) -> None:
+    job_types[name] = JobType(
+        name=name,
+        handler=handler,
+        default_concurrency=concurrency,
+        default_max_attempts=max_attempts,
+        default_every=every
+    )
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enqueue(
+    db: AsyncSession,
+    job_type: str,
+    payload: dict[str, Any],
+    idempotency_key: str | None = None,
+    delay: float = 0.0
+) -> int | None:
+    """Постановка задачи в текущей транзакции (без commit).
+
+    Возвращает id задачи или None, если задача с этим ключом уже есть.
+    После commit стоит вызвать `notify`, чтобы воркер в этом процессе
+    не ждал очередного опроса.
+    """
+    return await job_crud.enqueue_job(
+        db,
+        job_type,
+        payload,
+        run_at=_now() + timedelta(seconds=delay),
+        max_attempts=job_types[job_type].max_attempts,
+        idempotency_key=idempotency_key
+    )
+
+
+async def requeue_failed(db: AsyncSession, job_type: str, idempotency_key: str) -> int | None:
+    """Повторная постановка проваленной задачи с этим ключом (без commit).
+
+    Возвращает id задачи или None, если такой задачи нет или она не
+    провалена; ключ идемпотентности иначе навсегда закрепил бы провал.
+    """
+    return await job_crud.requeue_failed_job(
+        db, idempotency_key, run_at=_now(), max_attempts=job_types[job_type].max_attempts
+    )
+
+
+def current_progress() -> dict[str, Any]:
+    """Прогресс выполняемой задачи, сохранённый прошлыми попытками"""
+    job = _current_job.get()
+    return dict(job.progress or {}) if job is not None else {}
+
+
+async def report_progress(progress: dict[str, Any]) -> None:
+    """Сохранение прогресса выполняемой задачи; вне воркера ничего не делает"""
+    job = _current_job.get()
+    if job is None:
+        return
+    job.progress = progress
+    async with AsyncSessionLocal() as db:
+        await job_crud.update_progress(db, job, progress)
+
+
+def retry_delay(attempts: int) -> float:
+    """Экспоненциальная задержка повтора со случайным разбросом"""
+    delay = min(settings.JOB_RETRY_MAX_DELAY, settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class Worker:
+    """Цикл опроса очереди и выполнения задач зарегистрированных типов"""
+
+    def __init__(self) -> None:
+        self._loop_task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._running: dict[str, set[asyncio.Task]] = defaultdict(set)
+        self._next_periodic: dict[str, float] = {}
+        self.counters = {"claimed": 0, "done": 0, "retried": 0, "failed": 0}
+
+    def start(self) -> None:
+        if self._loop_task is None:
+            self._wakeup = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._run())
+            logger.info(f"Job worker started: {', '.join(sorted(job_types))}")
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        """Остановка опроса и ожидание текущих задач; незавершённые возвращаются в очередь"""
+        if self._loop_task is None:
+            return
+        self._loop_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._loop_task
+        self._loop_task = None
+
+        tasks = [task for running in self._running.values() for task in running]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=settings.JOB_SHUTDOWN_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._wakeup = None
+        logger.info("Job worker stopped")
+
+    def stats(self) -> dict[str, int]:
+        return {**self.counters, "running": sum(len(running) for running in self._running.values())}
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await self._enqueue_periodic()
+                await self._claim()
+            except Exception as e:
+                logger.error(f"Job polling failed: {str(e)}")
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_INTERVAL)
+
+    async def _enqueue_periodic(self) -> None:
+        """Постановка периодических задач; ключ по интервалу не даёт нескольким воркерам задвоить их"""
+        due = []
+        for job_type in job_types.values():
+            if job_type.every and time.monotonic() >= self._next_periodic.get(job_type.name, 0.0):
+                due.append(job_type)
+        if not due:
+            return
+        async with AsyncSessionLocal() as db:
+            for job_type in due:
+                bucket = int(time.time() // job_type.every)
+                await enqueue(db, job_type.name, {}, idempotency_key=f"{job_type.name}:{bucket}")
+            await db.commit()
+        for job_type in due:
+            self._next_periodic[job_type.name] = time.monotonic() + job_type.every
+
+    async def _claim(self) -> None:
+        """Захват задач всех типов, у которых есть свободные места, одним запросом"""
+        limits = {
+            name: job_type.concurrency - len(self._running[name])
+            for name, job_type in job_types.items()
+            if job_type.concurrency > len(self._running[name])
+        }
+        if not limits:
+            return
+        async with AsyncSessionLocal() as db:
+            jobs = await job_crud.claim_jobs(db, limits, _now(), settings.JOB_LEASE_SECONDS)
+        self.counters["claimed"] += len(jobs)
+        for job in jobs:
+            task = asyncio.create_task(self._execute(job_types[job.type], job))
+            self._running[job.type].add(task)
+            task.add_done_callback(lambda task, name=job.type: self._done(name, task))
+
+    def _done(self, name: str, task: asyncio.Task) -> None:
+        self._running[name].discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # Не удалось записать результат; задача вернётся в очередь по истечении аренды
+            logger.error(f"Job bookkeeping failed: {str(task.exception())}")
+        self.wake()
+
+    async def _execute(self, job_type: JobType, job: Job) -> None:
+        if job.attempts > job.max_attempts:
+            # Аренда истекала на каждой попытке: воркер падал вместе с задачей
+            await self._fail(job, "Lease expired on every attempt")
+            return
+
+        _current_job.set(job)
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await job_type.handler(**job.payload)
+        except asyncio.CancelledError:
+            async with AsyncSessionLocal() as db:
+                await job_crud.release_job(db, job)
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            if job.attempts >= job.max_attempts:
+                logger.error(f"Job {job.id} ({job.type}) failed after {job.attempts} attempts: {error}")
+                await self._fail(job, error)
+            else:
+                delay = retry_delay(job.attempts)
+                logger.warning(f"Job {job.id} ({job.type}) failed, retry in {delay:.1f}s: {error}")
+                async with AsyncSessionLocal() as db:
+                    await job_crud.retry_job(db, job, _now() + timedelta(seconds=delay), error)
+                self.counters["retried"] += 1
+        else:
+            async with AsyncSessionLocal() as db:
+                if not await job_crud.finish_job(db, job, _now()):
+                    logger.warning(f"Job {job.id} ({job.type}) lease was lost before completion")
+            self.counters["done"] += 1
+        finally:
+            heartbeat.cancel()
+
+    async def _fail(self, job: Job, error: str) -> None:
+        async with AsyncSessionLocal() as db:
+            await job_crud.fail_job(db, job, _now(), error)
+        self.counters["failed"] += 1
+
+    async def _heartbeat(self, job: Job) -> None:
+        """Продление аренды, пока задача выполняется"""
+        interval = settings.JOB_LEASE_SECONDS / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with AsyncSessionLocal() as db:
+                    extended = await job_crud.extend_lease(
+                        db, job, _now() + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+                    )
+            except Exception as e:
+                logger.warning(f"Extending lease of job {job.id} failed: {str(e)}")
+                continue
+            if not extended:
+                logger.warning(f"Job {job.id} ({job.type}) lease was taken over by another worker")
+                return
+
+
+worker = Worker()
+
+
+def notify() -> None:
+    """Пробуждение воркера этого процесса после commit новых задач"""
+    worker.wake()
@@ -0,0 +1,243 @@
+"""Метрики в формате Prometheus.
+
+Значения меняются только из потока event loop, а операции над
+словарями атомарны под GIL, поэтому запись метрики — это поиск
+в словаре и сложение, без блокировок. Gauge'и, отражающие состояние
+других компонентов (пул БД, кэши), вычисляются при чтении `/metrics`.
+"""
+import asyncio
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import logging
+
+logger = logging.getLogger(__name__)
+
+Labels = tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # По каждому набору меток: счётчики корзин (последняя — +Inf) и сумма
+        self._values: dict[Labels, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts, total = series
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labels, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class CallbackGauge(Metric):
+    """Gauge, значения которого вычисляются при каждом чтении"""
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], dict[Labels, float]],
+        labelnames: tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.error(f"Metric {self.name} callback failed: {str(e)}")
+            return lines
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template, method and status",
+    ("method", "route", "status")
+))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route")
+))
+upload_bytes = registry.register(Counter(
+    "upload_bytes_total", "Bytes received in uploads", ("kind",)
+))
+upload_throughput = registry.register(Histogram(
+    "upload_throughput_bytes_per_second", "Per-upload receive throughput", ("kind",),
+    buckets=(64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6)
+))
+yandex_latency = registry.register(Histogram(
+    "yandex_request_duration_seconds", "Yandex OAuth call latency including retries",
+    ("endpoint", "outcome")
+))
+event_loop_lag = registry.register(Histogram(
+    "event_loop_lag_seconds", "Delay of event loop wakeups beyond the scheduled time",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+))
+
+
+def record_upload(kind: str, size: int, seconds: float) -> None:
+    upload_bytes.inc(kind, amount=size)
+    if seconds > 0:
+        upload_throughput.observe(size / seconds, kind)
+
+
+def register_stats(name: str, documentation: str, stats: Callable[[], dict[str, float]], label: str) -> None:
+    """Gauge по словарю статистики компонента: ключ словаря — значение метки"""
+    registry.register(CallbackGauge(
+        name,
+        documentation,
+        lambda: {(key,): value for key, value in stats().items() if isinstance(value, (int, float))},
+        (label,)
+    ))
+
+
+class MetricsMiddleware:
+    """Счётчик и гистограмма задержки запросов по шаблону маршрута.
+
+    Метка `route` берётся из найденного маршрута (`/audio/{audio_id}`),
+    а не из пути, чтобы число рядов не росло с числом объектов.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, path, str(status_code))
+            http_latency.observe(time.perf_counter() - start, method, path)
+
+
+async def monitor_event_loop(interval: float = 0.5) -> None:
+    """Замер задержки пробуждений event loop, пока задача не отменена"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(loop.time() - expected, 0.0))
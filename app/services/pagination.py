@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+
+
+def encode_cursor(*values) -> str:
+    """Непрозрачный курсор для keyset-пагинации"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, detail="Invalid cursor")
+    if not isinstance(payload, list):
+        raise HTTPException(400, detail="Invalid cursor")
+    return payload
+
+
+def decode_time_cursor(cursor: str) -> tuple[datetime, int]:
+    """Курсор вида `(created_at, id)`"""
+    payload = decode_cursor(cursor)
+    try:
+        created_at, item_id = payload
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (TypeError, ValueError):
+        raise HTTPException(400, detail="Invalid cursor")
+
+
+def decode_score_cursor(cursor: str) -> tuple[float, int]:
+    """Курсор вида `(оценка, id)` для ранжированной выдачи"""
+    payload = decode_cursor(cursor)
+    try:
+        score, item_id = payload
+        return float(score), int(item_id)
+    except (TypeError, ValueError):
+        raise HTTPException(400, detail="Invalid cursor")
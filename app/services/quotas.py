@@ -0,0 +1,24 @@
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import user_crud
+from app.db.database import AsyncSessionLocal
+
+
+def quota_exceeded() -> HTTPException:
+    return HTTPException(413, detail="Storage quota exceeded")
+
+
+async def remaining_quota(email: str) -> int | None:
+    """Свободное место пользователя в байтах; None — без ограничения"""
+    async with AsyncSessionLocal() as db:
+        usage = await user_crud.get_storage_usage(db, email)
+    if usage is None:
+        return None
+    used, quota = usage
+    return None if quota is None else max(quota - used, 0)
+
+
+async def reserve(db: AsyncSession, user_id: int, size: int) -> None:
+    """Учёт размера в квоте в текущей транзакции; 413, если места нет"""
+    if not await user_crud.reserve_storage(db, user_id, size):
+        raise quota_exceeded()
@@ -0,0 +1,241 @@
+"""Ограничение частоты запросов и объёма загрузок по алгоритму token bucket.
+
+Проверка выполняется в ASGI middleware до чтения тела запроса: для
+загрузок стоимость берётся из `Content-Length`. Состояние корзин хранится
+в памяти процесса или в Redis, если лимиты должны быть общими для всех
+воркеров.
+"""
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import lru_cache
+from cachetools import TTLCache
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Limit:
+    name: str
+    rate: float      # пополнение, единиц в секунду
+    capacity: float  # размер корзины (допустимый всплеск)
+
+
+class RateLimiter(ABC):
+    @abstractmethod
+    async def acquire(self, key: str, limit: Limit, cost: float = 1) -> float:
+        """Списание `cost` из корзины; 0 — разрешено, иначе секунды до повтора"""
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Корзины в памяти процесса; лимит действует на каждый воркер отдельно"""
+
+    def __init__(self, maxsize: int = 100_000, idle_seconds: float = 3600) -> None:
+        self._buckets: TTLCache = TTLCache(maxsize=maxsize, ttl=idle_seconds)
+
+    async def acquire(self, key: str, limit: Limit, cost: float = 1) -> float:
+        now = time.monotonic()
+        bucket_key = (limit.name, key)
+        tokens, updated = self._buckets.get(bucket_key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+        if tokens >= cost:
+            self._buckets[bucket_key] = (tokens - cost, now)
+            return 0.0
+        self._buckets[bucket_key] = (tokens, now)
+        return (cost - tokens) / limit.rate
+
+
+# Атомарное пополнение и списание на стороне Redis; время берётся у сервера,
+# чтобы расхождение часов воркеров не влияло на лимит
+_REDIS_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """Общие для всех воркеров корзины в Redis.
+
+    При недоступности Redis запросы пропускаются: ограничение частоты
+    не должно становиться точкой отказа всего API.
+    """
+
+    def __init__(self, url: str, client=None) -> None:
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package") from e
+            client = redis.from_url(url)
+        self._client = client
+        self._script = client.register_script(_REDIS_SCRIPT)
+
+    async def acquire(self, key: str, limit: Limit, cost: float = 1) -> float:
+        try:
+            wait = await self._script(
+                keys=[f"ratelimit:{limit.name}:{key}"],
+                args=[limit.capacity, limit.rate, cost]
+            )
+        except Exception as e:
+            logger.error(f"Rate limiter backend failed: {str(e)}")
+            return 0.0
+        return float(wait)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+_limiter: RateLimiter | None = None
+
+
+def create_limiter() -> RateLimiter:
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MemoryRateLimiter()
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimiter(settings.REDIS_URL)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND}")
+
+
+def get_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = create_limiter()
+    return _limiter
+
+
+def set_limiter(limiter: RateLimiter | None) -> None:
+    global _limiter
+    _limiter = limiter
+
+
+async def close_limiter() -> None:
+    global _limiter
+    if _limiter is not None:
+        await _limiter.close()
+        _limiter = None
+
+
+@lru_cache
+def api_limit() -> Limit:
+    return Limit("api", settings.RATE_LIMIT_API_PER_SECOND, settings.RATE_LIMIT_API_BURST)
+
+
+@lru_cache
+def upload_limit() -> Limit:
+    return Limit("upload", settings.RATE_LIMIT_UPLOAD_BYTES_PER_SECOND, settings.RATE_LIMIT_UPLOAD_BURST_BYTES)
+
+_UPLOAD_ROUTES = re.compile(r"^/api/v1/audio/(upload|batch|uploads/[^/]+/chunks/\d+)$")
+# Части загрузки уже учтены в квоте: её объявленный размер резервируется при создании
+_QUOTA_CHECKED_ROUTES = re.compile(r"^/api/v1/audio/(upload|batch)$")
+
+
+def is_upload(scope: Scope) -> bool:
+    return scope["method"] in ("POST", "PUT") and _UPLOAD_ROUTES.match(scope["path"]) is not None
+
+
+def checks_quota(scope: Scope) -> bool:
+    return _QUOTA_CHECKED_ROUTES.match(scope["path"]) is not None
+
+
+def _header(scope: Scope, name: bytes) -> str | None:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def content_length(scope: Scope) -> int | None:
+    value = _header(scope, b"content-length")
+    return int(value) if value and value.isdigit() else None
+
+
+def request_subject(scope: Scope) -> str:
+    """Email из токена или адрес клиента для анонимных запросов"""
+    from app.security import decode_token
+
+    authorization = _header(scope, b"authorization")
+    if authorization:
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer":
+            try:
+                return f"user:{decode_token(token).sub}"
+            except Exception:
+                pass
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+async def _reject(send: Send, status_code: int, detail: str, retry_after: float | None = None) -> None:
+    body = ('{"detail":"%s"}' % detail).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(max(1, math.ceil(retry_after))).encode()))
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """Лимиты API и загрузок, проверяемые до чтения тела запроса.
+
+    Для загрузок файлом целиком дополнительно сверяется `Content-Length`
+    с остатком квоты пользователя, чтобы не принимать заведомо не
+    помещающийся файл; части возобновляемой загрузки ограничены её
+    резервом в квоте.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = get_limiter()
+        subject = request_subject(scope)
+        wait = await limiter.acquire(subject, api_limit())
+        if wait:
+            await _reject(send, 429, "Too many requests", wait)
+            return
+
+        if is_upload(scope):
+            size = content_length(scope)
+            # Размер неизвестен (chunked) — списывается целая корзина
+            upload = upload_limit()
+            cost = min(size if size is not None else upload.capacity, upload.capacity)
+            wait = await limiter.acquire(subject, upload, cost)
+            if wait:
+                await _reject(send, 429, "Upload rate limit exceeded", wait)
+                return
+            if size is not None and subject.startswith("user:") and checks_quota(scope):
+                from app.services.quotas import remaining_quota
+                remaining = await remaining_quota(subject[len("user:"):])
+                if remaining is not None and size > remaining + settings.QUOTA_MULTIPART_SLACK_BYTES:
+                    await _reject(send, 413, "Storage quota exceeded")
+                    return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.services import uploads
+from app.services.singleflight import SingleFlight
+from app.services.streaming import media_type_for
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Rendition:
+    name: str
+    ext: str
+    codec: str
+    bitrate: int
+    media_type: str
+
+    def ffmpeg_args(self) -> list[str]:
+        return ["-c:a", self.codec, "-b:a", str(self.bitrate), "-f", self.ext]
+
+
+RENDITIONS = {
+    rendition.name: rendition
+    for rendition in (
+        Rendition("mp3-64k", "mp3", "libmp3lame", 64_000, "audio/mpeg"),
+        Rendition("mp3-128k", "mp3", "libmp3lame", 128_000, "audio/mpeg"),
+        Rendition("opus-48k", "ogg", "libopus", 48_000, "audio/ogg"),
+        Rendition("opus-96k", "ogg", "libopus", 96_000, "audio/ogg"),
+    )
+}
+# Для согласования по Accept: вариант каждого типа в обычном качестве прослушивания;
+# экономные mp3-64k и opus-48k выбираются явно через `rendition`
+_BY_MEDIA_TYPE = {"audio/mpeg": "mp3-128k", "audio/mp3": "mp3-128k", "audio/ogg": "opus-96k"}
+
+
+def _parse_accept(header: str) -> list[str]:
+    """Медиатипы из `Accept` по убыванию q; с q=0 отбрасываются"""
+    ranked = []
+    for position, item in enumerate(header.split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            ranked.append((-quality, position, media_type.lower()))
+    return [media_type for _, _, media_type in sorted(ranked)]
+
+
+def choose_rendition(
+    name: str,
+    requested: str | None,
+    accept: str | None,
+    bitrate: int | None = None
+) -> Rendition | None:
+    """Вариант для отдачи; None — исходный файл.
+
+    Явный параметр `rendition` важнее `Accept`. Если клиент принимает
+    исходный тип (или любой аудио), отдаётся оригинал. Оригинал того же
+    формата с битрейтом не выше варианта тоже отдаётся как есть.
+    """
+    rendition = _negotiate(name, requested, accept)
+    if (
+        rendition is not None
+        and bitrate is not None
+        and media_type_for(name) == rendition.media_type
+        and bitrate <= rendition.bitrate
+    ):
+        return None
+    return rendition
+
+
+def _negotiate(name: str, requested: str | None, accept: str | None) -> Rendition | None:
+    if requested:
+        if requested == "original":
+            return None
+        if requested not in RENDITIONS:
+            raise HTTPException(400, detail=f"Unknown rendition, expected one of: original, {', '.join(RENDITIONS)}")
+        return RENDITIONS[requested]
+
+    if not accept:
+        return None
+    original = media_type_for(name)
+    for media_type in _parse_accept(accept):
+        if media_type in (original, "*/*", "audio/*"):
+            return None
+        if media_type in _BY_MEDIA_TYPE:
+            return RENDITIONS[_BY_MEDIA_TYPE[media_type]]
+    return None
+
+
+class RenditionCache:
+    """LRU-кэш перекодированных файлов на локальном диске.
+
+    Состояние кэша — только сами файлы, поэтому каталог можно делить
+    между воркерами и процессами. Использование отмечается временем
+    доступа (atime): время изменения не трогается, по нему строится ETag.
+    После добавления файла каталог сканируется, и, пока суммарный размер
+    больше `max_bytes`, удаляются файлы с самым старым atime. Файл,
+    удалённый другим процессом, — обычный промах. `stats` показывает
+    итог последнего сканирования в этом процессе.
+    """
+
+    # Не чаще раза в минуту на файл: отметка использования — запись метаданных
+    touch_interval = 60.0
+
+    def __init__(self, root: str | os.PathLike, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._entries = 0
+        self._total = 0
+
+    @staticmethod
+    def entry_name(source_key: str, rendition: Rendition) -> str:
+        digest = hashlib.sha256(source_key.encode()).hexdigest()[:32]
+        return f"{digest}.{rendition.name}.{rendition.ext}"
+
+    def _touch(self, path: Path) -> bool:
+        try:
+            stat_result = path.stat()
+            if time.time() - stat_result.st_atime > self.touch_interval:
+                os.utime(path, ns=(time.time_ns(), stat_result.st_mtime_ns))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _scan(self) -> list[tuple[float, str, int]]:
+        """Файлы кэша `(atime, имя, размер)`; временные `.encode-*` пропускаются"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.root):
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_file():
+                    stat_result = entry.stat()
+                    found.append((stat_result.st_atime, entry.name, stat_result.st_size))
+            except FileNotFoundError:
+                continue
+        return found
+
+    def _evict(self, keep: str) -> int:
+        entries = sorted(self._scan())
+        total = sum(size for _, _, size in entries)
+        evicted = 0
+        for _, name, size in entries:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            (self.root / name).unlink(True)
+            total -= size
+            evicted += 1
+        self._entries, self._total = len(entries) - evicted, total
+        return evicted
+
+    async def get(self, name: str) -> Path | None:
+        path = self.root / name
+        if not await run_in_threadpool(self._touch, path):
+            return None
+        return path
+
+    async def add(self, name: str, tmp_path: Path) -> Path:
+        """Перенос готового файла в кэш с вытеснением старых записей"""
+        path = self.root / name
+        await run_in_threadpool(os.replace, tmp_path, path)
+        evicted = await run_in_threadpool(self._evict, name)
+        if evicted:
+            logger.info(f"Evicted {evicted} renditions from cache")
+        return path
+
+    async def discard(self, source_key: str) -> None:
+        """Удаление всех вариантов исходного объекта"""
+        for rendition in RENDITIONS.values():
+            await run_in_threadpool((self.root / self.entry_name(source_key, rendition)).unlink, True)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": self._entries,
+            "bytes": self._total,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class Transcoder:
+    """Перекодирование через ffmpeg не более чем в `workers` процессах.
+
+    Одновременные запросы одного варианта схлопываются в одно задание.
+    """
+
+    def __init__(self, cache: RenditionCache, workers: int) -> None:
+        self.cache = cache
+        self._semaphore = asyncio.Semaphore(workers)
+        self._flights = SingleFlight()
+
+    async def get(self, source_key: str, rendition: Rendition) -> Path:
+        name = self.cache.entry_name(source_key, rendition)
+        path = await self.cache.get(name)
+        if path is not None:
+            return path
+        return await self._flights.do(name, lambda: self._encode(source_key, rendition, name))
+
+    async def _encode(self, source_key: str, rendition: Rendition, name: str) -> Path:
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise HTTPException(503, detail="Transcoding is unavailable")
+
+        async with self._semaphore:
+            # Другой запрос мог закончить кодирование, пока этот ждал
+            path = await self.cache.get(name)
+            if path is not None:
+                return path
+
+            await run_in_threadpool(self.cache.root.mkdir, parents=True, exist_ok=True)
+            fd, tmp_name = await run_in_threadpool(
+                tempfile.mkstemp, dir=self.cache.root, prefix=".encode-", suffix=f".{rendition.ext}"
+            )
+            os.close(fd)
+            tmp_path = Path(tmp_name)
+            try:
+                async with uploads.local_copy(source_key) as source_path:
+                    process = await asyncio.create_subprocess_exec(
+                        ffmpeg, "-v", "error", "-y", "-i", str(source_path),
+                        "-vn", "-map_metadata", "-1", *rendition.ffmpeg_args(), str(tmp_path),
+                        stdout=asyncio.subprocess.DEVNULL,
+                        stderr=asyncio.subprocess.PIPE
+                    )
+                    _, stderr = await process.communicate()
+                if process.returncode != 0:
+                    logger.error(f"ffmpeg failed for {source_key} -> {rendition.name}: {stderr.decode(errors='replace')}")
+                    raise HTTPException(500, detail="Transcoding failed")
+                path = await self.cache.add(name, tmp_path)
+            except BaseException:
+                await run_in_threadpool(tmp_path.unlink, True)
+                raise
+
+        logger.info(f"Encoded {source_key} -> {rendition.name}")
+        return path
+
+    async def pregenerate(self, source_key: str, names: list[str]) -> None:
+        for name in names:
+            try:
+                await self.get(source_key, RENDITIONS[name])
+            except Exception as e:
+                logger.error(f"Rendition {name} for {source_key} failed: {str(e)}")
+
+
+@lru_cache
+def get_rendition_cache() -> RenditionCache:
+    return RenditionCache(settings.RENDITION_CACHE_DIR, settings.RENDITION_CACHE_MAX_BYTES)
+
+
+@lru_cache
+def get_transcoder() -> Transcoder:
+    return Transcoder(get_rendition_cache(), settings.TRANSCODE_WORKERS)
@@ -0,0 +1,122 @@
+"""Поиск по именам аудио без Postgres.
+
+В Postgres поиск идёт по GIN-индексам (`to_tsvector` и `pg_trgm`), а для
+SQLite, на которой гоняются тесты и локальная разработка, тот же поиск
+выполняется по триграммному индексу в памяти процесса. Семантика
+повторяет серверную: все слова запроса — префиксы слов имени, либо
+похожесть по триграммам не ниже порога `word_similarity` из pg_trgm.
+"""
+import re
+from collections import Counter
+from cachetools import LRUCache
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+# Порог по умолчанию для оператора `<%` (pg_trgm.word_similarity_threshold)
+WORD_SIMILARITY_THRESHOLD = 0.6
+# Вклад совпадения по словам в оценку, сопоставимый с ts_rank_cd для коротких имён
+PREFIX_MATCH_SCORE = 0.1
+
+
+def tokenize(text: str) -> list[str]:
+    """Слова в нижнем регистре; `.`, `_` и `-` — разделители, как в индексе"""
+    return _WORD_RE.findall(text.lower())
+
+
+def trigrams(text: str) -> set[str]:
+    """Триграммы в духе pg_trgm: каждое слово дополняется двумя пробелами слева и одним справа"""
+    result = set()
+    for word in tokenize(text):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def _prefix_trigrams(token: str) -> set[str]:
+    """Триграммы, которые есть в любом слове, начинающемся с `token`"""
+    padded = f"  {token}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class OwnerIndex:
+    """Инвертированный индекс триграмм по аудио одного владельца"""
+
+    def __init__(self, rows: list[tuple[int, str]]) -> None:
+        self.names: dict[int, str] = {}
+        self.postings: dict[str, set[int]] = {}
+        for audio_id, name in rows:
+            self.names[audio_id] = name
+            for trigram in trigrams(name):
+                self.postings.setdefault(trigram, set()).add(audio_id)
+
+    def _prefix_candidates(self, tokens: list[str]) -> set[int]:
+        candidates: set[int] | None = None
+        for token in tokens:
+            for trigram in _prefix_trigrams(token):
+                ids = self.postings.get(trigram, set())
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return set()
+        return candidates or set()
+
+    def search(self, query: str) -> list[tuple[float, int]]:
+        """Совпадения `(оценка, id)`, от лучших к худшим"""
+        tokens = tokenize(query)
+        query_trigrams = trigrams(query)
+        if not tokens or not query_trigrams:
+            return []
+
+        overlap = Counter()
+        for trigram in query_trigrams:
+            overlap.update(self.postings.get(trigram, ()))
+        fuzzy = {
+            audio_id: count / len(query_trigrams)
+            for audio_id, count in overlap.items()
+            if count / len(query_trigrams) >= WORD_SIMILARITY_THRESHOLD
+        }
+
+        results = []
+        for audio_id in self._prefix_candidates(tokens) | fuzzy.keys():
+            words = tokenize(self.names[audio_id])
+            prefix_match = all(any(word.startswith(token) for word in words) for token in tokens)
+            if not prefix_match and audio_id not in fuzzy:
+                continue
+            similarity = overlap.get(audio_id, 0) / len(query_trigrams)
+            score = similarity + (PREFIX_MATCH_SCORE if prefix_match else 0.0)
+            results.append((score, audio_id))
+        results.sort(reverse=True)
+        return results
+
+
+class SearchIndex:
+    """LRU индексов по владельцам; строится лениво при первом поиске.
+
+    Записи в `audio_crud` вызывают `invalidate`. Поколение защищает от
+    гонки, когда индекс строится по данным, прочитанным до записи.
+    """
+
+    def __init__(self, max_owners: int) -> None:
+        self._indexes: LRUCache = LRUCache(maxsize=max_owners)
+        self._generations: dict[int, int] = {}
+
+    def get(self, owner_id: int) -> OwnerIndex | None:
+        return self._indexes.get(owner_id)
+
+    def generation(self, owner_id: int) -> int:
+        return self._generations.get(owner_id, 0)
+
+    def build(self, owner_id: int, rows: list[tuple[int, str]], generation: int) -> OwnerIndex:
+        index = OwnerIndex(rows)
+        if self.generation(owner_id) == generation:
+            self._indexes[owner_id] = index
+        return index
+
+    def invalidate(self, owner_id: int) -> None:
+        self._generations[owner_id] = self.generation(owner_id) + 1
+        self._indexes.pop(owner_id, None)
+
+    def clear(self) -> None:
+        self._indexes.clear()
+
+
+search_index = SearchIndex(max_owners=256)
@@ -0,0 +1,359 @@
+import asyncio
+import os
+import shutil
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 256 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class ObjectStat:
+    key: str
+    size: int
+    etag: str
+    modified: float
+
+
+async def limit_stream(chunks: AsyncIterator[bytes], max_size: int | None) -> AsyncIterator[bytes]:
+    """Поток, прерываемый с 400, как только превышен `max_size`"""
+    written = 0
+    async for chunk in chunks:
+        written += len(chunk)
+        if max_size is not None and written > max_size:
+            raise HTTPException(400, detail="File too large")
+        yield chunk
+
+
+async def iter_file(path: Path, chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    with open(path, "rb") as source:
+        while chunk := await run_in_threadpool(source.read, chunk_size):
+            yield chunk
+
+
+class StorageBackend(ABC):
+    """Хранилище объектов, адресуемых относительными ключами вида `a/b/c`"""
+
+    @abstractmethod
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        """Атомарная запись потока в объект; возвращает размер"""
+
+    async def put_file(self, key: str, path: Path) -> None:
+        """Перенос локального файла в хранилище; исходный файл удаляется"""
+        await self.put_stream(key, iter_file(path))
+        await run_in_threadpool(path.unlink, True)
+
+    @abstractmethod
+    def get_range(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        """Байты объекта с `start` по `end` включительно"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Удаление объекта; отсутствующий объект не ошибка"""
+
+    @abstractmethod
+    async def stat(self, key: str) -> ObjectStat | None:
+        """Метаданные объекта или None, если его нет"""
+
+    @abstractmethod
+    async def list(self, prefix: str) -> list[ObjectStat]:
+        """Объекты с ключами, начинающимися с `prefix`"""
+
+    def local_path(self, key: str) -> Path | None:
+        """Путь на локальном диске, если объект можно отдать через sendfile"""
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str | os.PathLike) -> None:
+        self.root = Path(root)
+
+    def _resolve(self, key: str) -> Path:
+        path = self.root / key
+        if ".." in Path(key).parts or Path(key).is_absolute():
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        # Импорт здесь: uploads сам использует хранилище для частей загрузок
+        from app.services.uploads import save_stream
+        return await save_stream(chunks, self._resolve(key))
+
+    async def put_file(self, key: str, path: Path) -> None:
+        destination = self._resolve(key)
+
+        def move() -> None:
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.replace(path, destination)
+            except OSError:
+                shutil.move(path, destination)
+
+        await run_in_threadpool(move)
+
+    async def get_range(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        with open(self._resolve(key), "rb") as source:
+            await run_in_threadpool(source.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining)
+                chunk = await run_in_threadpool(source.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        path = self._resolve(key)
+
+        def remove() -> None:
+            path.unlink(missing_ok=True)
+            try:
+                path.parent.rmdir()
+            except OSError:
+                pass
+
+        await run_in_threadpool(remove)
+
+    def _stat(self, key: str) -> ObjectStat | None:
+        try:
+            stat_result = os.stat(self._resolve(key))
+        except FileNotFoundError:
+            return None
+        return ObjectStat(
+            key=key,
+            size=stat_result.st_size,
+            etag=f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"',
+            modified=stat_result.st_mtime
+        )
+
+    async def stat(self, key: str) -> ObjectStat | None:
+        return await run_in_threadpool(self._stat, key)
+
+    async def list(self, prefix: str) -> list[ObjectStat]:
+        def scan() -> list[ObjectStat]:
+            directory = self._resolve(prefix).parent if not prefix.endswith("/") else self._resolve(prefix)
+            if not directory.is_dir():
+                return []
+            found = []
+            for path in directory.rglob("*"):
+                key = path.relative_to(self.root).as_posix()
+                if path.is_file() and key.startswith(prefix) and not path.name.startswith("."):
+                    found.append(self._stat(key))
+            return [item for item in found if item is not None]
+
+        return await run_in_threadpool(scan)
+
+    def local_path(self, key: str) -> Path | None:
+        return self._resolve(key)
+
+
+class S3Storage(StorageBackend):
+    """S3-совместимое хранилище (AWS S3, MinIO, moto).
+
+    Клиент boto3 потокобезопасен и держит пул соединений размером
+    `S3_MAX_POOL_CONNECTIONS`; вызовы выполняются в пуле потоков.
+    Крупные объекты загружаются multipart-частями по `S3_PART_SIZE`,
+    до `S3_UPLOAD_CONCURRENCY` частей параллельно.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        access_key_id: str | None = None,
+        secret_access_key: str | None = None,
+        part_size: int = 8 * 1024 * 1024,
+        upload_concurrency: int = 4,
+        max_pool_connections: int = 32
+    ) -> None:
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires the boto3 package") from e
+
+        self.bucket = bucket
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self.upload_concurrency = upload_concurrency
+        self._client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=Config(
+                max_pool_connections=max_pool_connections,
+                retries={"max_attempts": 3, "mode": "standard"}
+            )
+        )
+
+    async def _call(self, method: str, **kwargs):
+        return await run_in_threadpool(getattr(self._client, method), **kwargs)
+
+    async def _parts(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        buffer = bytearray()
+        async for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= self.part_size:
+                yield bytes(buffer[:self.part_size])
+                del buffer[:self.part_size]
+        if buffer:
+            yield bytes(buffer)
+
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        parts = self._parts(chunks)
+        first = await anext(parts, b"")
+        second = await anext(parts, None)
+        if second is None:
+            await self._call("put_object", Bucket=self.bucket, Key=key, Body=first)
+            return len(first)
+
+        upload = await self._call("create_multipart_upload", Bucket=self.bucket, Key=key)
+        upload_id = upload["UploadId"]
+        semaphore = asyncio.Semaphore(self.upload_concurrency)
+        tasks: list[asyncio.Task] = []
+        size = 0
+
+        async def upload_part(number: int, body: bytes) -> dict:
+            try:
+                response = await self._call(
+                    "upload_part",
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=body
+                )
+                return {"PartNumber": number, "ETag": response["ETag"]}
+            finally:
+                semaphore.release()
+
+        async def all_parts() -> AsyncIterator[bytes]:
+            yield first
+            yield second
+            async for part in parts:
+                yield part
+
+        try:
+            number = 0
+            async for part in all_parts():
+                # Не держим в памяти больше `upload_concurrency` частей
+                await semaphore.acquire()
+                number += 1
+                size += len(part)
+                tasks.append(asyncio.create_task(upload_part(number, part)))
+            completed = await asyncio.gather(*tasks)
+            await self._call(
+                "complete_multipart_upload",
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": completed}
+            )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await self._call("abort_multipart_upload", Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+        return size
+
+    async def get_range(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        response = await self._call("get_object", Bucket=self.bucket, Key=key, Range=byte_range)
+        body = response["Body"]
+        try:
+            while chunk := await run_in_threadpool(body.read, READ_CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, key: str) -> None:
+        await self._call("delete_object", Bucket=self.bucket, Key=key)
+
+    async def stat(self, key: str) -> ObjectStat | None:
+        from botocore.exceptions import ClientError
+        try:
+            response = await self._call("head_object", Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return ObjectStat(
+            key=key,
+            size=response["ContentLength"],
+            etag=response["ETag"],
+            modified=response["LastModified"].timestamp()
+        )
+
+    async def list(self, prefix: str) -> list[ObjectStat]:
+        def scan() -> list[ObjectStat]:
+            paginator = self._client.get_paginator("list_objects_v2")
+            return [
+                ObjectStat(
+                    key=item["Key"],
+                    size=item["Size"],
+                    etag=item["ETag"],
+                    modified=item["LastModified"].timestamp()
+                )
+                for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix)
+                for item in page.get("Contents", [])
+            ]
+
+        return await run_in_threadpool(scan)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self._client.close)
+
+
+_storage: StorageBackend | None = None
+
+
+def create_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.STORAGE_LOCAL_ROOT)
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            part_size=settings.S3_PART_SIZE,
+            upload_concurrency=settings.S3_UPLOAD_CONCURRENCY,
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage: StorageBackend | None) -> None:
+    """Подмена хранилища, например на S3Storage с endpoint moto/MinIO"""
+    global _storage
+    _storage = storage
+
+
+async def close_storage() -> None:
+    global _storage
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
@@ -0,0 +1,228 @@
+import mmap
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Callable
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+from app.services.storage import StorageBackend
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+    "ogg": "audio/ogg",
+}
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def media_type_for(path: str) -> str:
+    return MEDIA_TYPES.get(Path(path).suffix[1:].lower(), "application/octet-stream")
+
+
+def make_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Разбор заголовка `Range` с одним диапазоном.
+
+    Возвращает включительные границы `(start, end)` или None, если
+    заголовок нужно проигнорировать (несколько диапазонов, другой
+    формат). Для невыполнимого диапазона поднимает 416.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise _range_not_satisfiable(size)
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise _range_not_satisfiable(size)
+    return start, min(end, size - 1)
+
+
+def _range_not_satisfiable(size: int) -> HTTPException:
+    return HTTPException(416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _range_applies(request: Request, etag: str, last_modified: str) -> bool:
+    if_range = request.headers.get("if-range")
+    return if_range is None or if_range in (etag, last_modified)
+
+
+class FileRangeResponse(Response):
+    """Отдача участка файла без чтения его в Python-объекты.
+
+    Если ASGI-сервер поддерживает расширение `http.response.zerocopy`,
+    байты уходят в сокет через sendfile. Иначе файл отображается
+    в память и отправляется срезами `STREAM_CHUNK_SIZE`.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        start: int,
+        end: int,
+        status_code: int,
+        headers: dict[str, str],
+        media_type: str,
+        send_body: bool = True
+    ) -> None:
+        self.path = path
+        self.start = start
+        self.count = end - start + 1 if end >= start else 0
+        self.status_code = status_code
+        self.media_type = media_type
+        self.send_body = send_body
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if not self.send_body or self.count == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        fd = await run_in_threadpool(os.open, self.path, os.O_RDONLY)
+        try:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": fd,
+                    "offset": self.start,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            else:
+                await self._send_mapped(fd, send)
+        finally:
+            os.close(fd)
+
+    async def _send_mapped(self, fd: int, send: Send) -> None:
+        # mmap требует смещение, кратное гранулярности страниц
+        offset = self.start - self.start % mmap.ALLOCATIONGRANULARITY
+        skip = self.start - offset
+        with mmap.mmap(fd, skip + self.count, access=mmap.ACCESS_READ, offset=offset) as mapped:
+            position = skip
+            stop = skip + self.count
+            while position < stop:
+                upto = min(position + STREAM_CHUNK_SIZE, stop)
+                chunk = await run_in_threadpool(mapped.__getitem__, slice(position, upto))
+                position = upto
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": position < stop,
+                })
+
+
+def _range_response(
+    request: Request,
+    size: int,
+    etag: str,
+    modified: float,
+    media_type: str,
+    make_body: Callable[[int, int, int, dict[str, str], bool], Response]
+) -> Response:
+    last_modified = formatdate(modified, usegmt=True)
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": last_modified,
+        "cache-control": "private, max-age=0, must-revalidate",
+    }
+
+    if _not_modified(request, etag, modified):
+        return Response(status_code=304, headers=headers)
+
+    send_body = request.method != "HEAD"
+
+    range_header = request.headers.get("range")
+    if range_header and _range_applies(request, etag, last_modified):
+        byte_range = parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            return make_body(start, end, 206, headers, send_body)
+
+    return make_body(0, size - 1, 200, headers, send_body)
+
+
+async def file_response(request: Request, path: str | os.PathLike, media_type: str | None = None) -> Response:
+    """Ответ с поддержкой `Range`, `ETag`/`If-None-Match` и `Last-Modified`"""
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(404, detail="File not found")
+
+    media_type = media_type or media_type_for(str(path))
+
+    def make_body(start: int, end: int, status_code: int, headers: dict[str, str], send_body: bool) -> Response:
+        return FileRangeResponse(path, start, end, status_code, headers, media_type, send_body)
+
+    return _range_response(
+        request, stat_result.st_size, make_etag(stat_result), stat_result.st_mtime, media_type, make_body
+    )
+
+
+async def object_response(request: Request, storage: StorageBackend, key: str, media_type: str) -> Response:
+    """То же для объекта хранилища.
+
+    Локальные объекты отдаются через `file_response` (sendfile/mmap),
+    удалённые — потоком запросов `get_range` к хранилищу.
+    """
+    local_path = storage.local_path(key)
+    if local_path is not None:
+        return await file_response(request, local_path, media_type)
+
+    stat = await storage.stat(key)
+    if stat is None:
+        raise HTTPException(404, detail="File not found")
+
+    def make_body(start: int, end: int, status_code: int, headers: dict[str, str], send_body: bool) -> Response:
+        headers["content-length"] = str(max(end - start + 1, 0))
+        if not send_body or end < start:
+            return Response(status_code=status_code, headers=headers, media_type=media_type)
+        return StreamingResponse(
+            storage.get_range(key, start, end),
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type
+        )
+
+    return _range_response(request, stat.size, stat.etag, stat.modified, media_type, make_body)
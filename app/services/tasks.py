@@ -0,0 +1,129 @@
+"""Типы фоновых задач приложения и их постановка в очередь (app.services.jobs)"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.crud import audio_crud, job_crud, upload_crud
+from app.db.database import AsyncSessionLocal
+from app.services import accounts, blobs, jobs, uploads
+from app.services.analysis import analyze_audio, peaks_key
+from app.services.renditions import get_rendition_cache, get_transcoder
+from app.services.storage import get_storage
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def analysis_key(audio_id: int) -> str:
+    return f"analyze_audio:{audio_id}"
+
+
+async def release_audio_files(hashes: list[str], paths: list[str]) -> None:
+    """Удаление файлов уже удалённых записей аудио.
+
+    Файлы blob'ов удаляются, когда на них не осталось ссылок; файлы
+    старых записей без `content_hash` (`paths`) принадлежат только им.
+    """
+    if hashes:
+        async with AsyncSessionLocal() as db:
+            await blobs.purge_unreferenced(db, hashes)
+
+    storage = get_storage()
+
+    async def remove(path: str) -> None:
+        await storage.delete(path)
+        await storage.delete(peaks_key(path))
+        await get_rendition_cache().discard(path)
+
+    await asyncio.gather(*(remove(path) for path in paths))
+
+
+async def purge_unreferenced_blobs() -> None:
+    """Сборка мусора: blob'ы, ссылки на которые сняты, но файлы не удалены"""
+    async with AsyncSessionLocal() as db:
+        while await blobs.purge_unreferenced(db):
+            pass
+
+
+async def requeue_stale_analysis() -> None:
+    """Повторная постановка анализа записей, задача которых потерялась"""
+    before = datetime.now(timezone.utc) - timedelta(seconds=settings.ANALYSIS_STALE_SECONDS)
+    async with AsyncSessionLocal() as db:
+        audio_ids = await audio_crud.get_pending_audio_ids(db, created_before=before)
+        queued = 0
+        for audio_id in audio_ids:
+            if await jobs.enqueue(db, "analyze_audio", {"audio_id": audio_id}, idempotency_key=analysis_key(audio_id)):
+                queued += 1
+        await db.commit()
+    if queued:
+        logger.info(f"Requeued analysis of {queued} audios")
+
+
+async def purge_expired_uploads() -> None:
+    """Удаление брошенных загрузок по частям: сначала части, затем сессии"""
+    now = datetime.now(timezone.utc)
+    purged = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            upload_ids = await upload_crud.get_expired_upload_ids(db, now, limit=500)
+        if not upload_ids:
+            break
+        for upload_id in upload_ids:
+            await uploads.discard_chunks(upload_id)
+        async with AsyncSessionLocal() as db:
+            await upload_crud.delete_upload_sessions(db, upload_ids)
+        purged += len(upload_ids)
+    if purged:
+        logger.info(f"Deleted {purged} expired upload sessions")
+
+
+async def purge_finished_jobs() -> None:
+    before = datetime.now(timezone.utc) - timedelta(hours=settings.JOB_RETENTION_HOURS)
+    async with AsyncSessionLocal() as db:
+        deleted = await job_crud.delete_finished_jobs(db, before)
+    if deleted:
+        logger.info(f"Deleted {deleted} finished jobs")
+
+
+async def pregenerate_renditions(source_key: str, names: list[str]) -> None:
+    await get_transcoder().pregenerate(source_key, names)
+
+
+jobs.register("analyze_audio", analyze_audio, concurrency=lambda: settings.ANALYSIS_WORKERS)
+jobs.register("pregenerate_renditions", pregenerate_renditions, concurrency=lambda: settings.TRANSCODE_WORKERS)
+jobs.register("release_audio_files", release_audio_files, concurrency=4)
+jobs.register("purge_user", accounts.purge_user, concurrency=2)
+jobs.register("purge_unreferenced_blobs", purge_unreferenced_blobs, every=lambda: settings.BLOB_GC_INTERVAL_SECONDS)
+jobs.register("requeue_stale_analysis", requeue_stale_analysis, every=lambda: settings.ANALYSIS_STALE_SECONDS)
+jobs.register(
+    "purge_expired_uploads", purge_expired_uploads, every=lambda: settings.UPLOAD_SESSION_GC_INTERVAL_SECONDS
+)
+jobs.register("purge_finished_jobs", purge_finished_jobs, every=3600)
+
+
+async def schedule_processing(db: AsyncSession, audios: list) -> None:
+    """Постановка обработки новых аудио: анализ и заранее заданные варианты (с commit)"""
+    for audio in audios:
+        await jobs.enqueue(db, "analyze_audio", {"audio_id": audio.id}, idempotency_key=analysis_key(audio.id))
+        if settings.RENDITIONS_PREGENERATE:
+            await jobs.enqueue(
+                db,
+                "pregenerate_renditions",
+                {"source_key": audio.path, "names": settings.RENDITIONS_PREGENERATE}
+            )
+    await db.commit()
+    jobs.notify()
+
+
+async def schedule_file_release(db: AsyncSession, audios: list) -> None:
+    """Постановка удаления файлов удалённых записей (без commit, в транзакции удаления)"""
+    if not audios:
+        return
+    await jobs.enqueue(
+        db,
+        "release_audio_files",
+        {
+            "hashes": [audio.content_hash for audio in audios if audio.content_hash],
+            "paths": [audio.path for audio in audios if not audio.content_hash]
+        }
+    )
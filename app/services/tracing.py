@@ -0,0 +1,233 @@
+"""Опциональная трассировка запросов и профилирование.
+
+Пока трассировка выключена, `span()` возвращает общий пустой контекстный
+менеджер, а хуки SQLAlchemy и middleware не устанавливаются, так что
+инструментированный код почти ничего не платит.
+"""
+import hashlib
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_NOOP = nullcontext()
+
+
+@dataclass(slots=True)
+class Trace:
+    start: float = field(default_factory=time.perf_counter)
+    spans: list[tuple[str, float]] = field(default_factory=list)
+
+    def add(self, name: str, duration: float) -> None:
+        self.spans.append((name, duration))
+
+    def totals(self) -> dict[str, tuple[int, float]]:
+        """Число и суммарная длительность спанов по имени"""
+        totals: dict[str, tuple[int, float]] = {}
+        for name, duration in self.spans:
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + duration)
+        return totals
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: Trace, name: str) -> None:
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.trace.add(self.name, time.perf_counter() - self.start)
+
+
+def span(name: str):
+    """Замер фазы запроса: `with span("jwt_decode"): ...`"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name)
+
+
+# --- Запросы к БД --------------------------------------------------------------
+
+_LITERALS_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*(?:\?|\$\d+|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|\$\d+|%\(\w+\)s|:\w+))+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> tuple[str, str]:
+    """Нормализованный запрос и короткий хеш для группировки в логах"""
+    normalized = _LITERALS_RE.sub("?", statement)
+    normalized = _IN_LIST_RE.sub("(...)", normalized)
+    normalized = _SPACE_RE.sub(" ", normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add("db_query", duration)
+    if settings.SLOW_QUERY_MS is not None and duration * 1000 >= settings.SLOW_QUERY_MS:
+        digest, normalized = fingerprint(statement)
+        logger.warning(f"Slow query {digest} took {duration * 1000:.1f}ms: {normalized[:500]}")
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Хуки времени выполнения запросов, если они нужны"""
+    if not settings.TRACING_ENABLED and settings.SLOW_QUERY_MS is None:
+        return
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- Сэмплирующий профилировщик -----------------------------------------------
+
+class StackSampler:
+    """Периодический снимок стека потока в формате folded stacks.
+
+    Результат (`frame;frame;frame count` построчно) принимают
+    flamegraph.pl и speedscope. Снимается поток event loop, поэтому
+    в выборку попадают и другие задачи, выполнявшиеся одновременно.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def _wants_profile(scope: Scope) -> bool:
+    return settings.PROFILING_ENABLED and b"__profile=1" in scope.get("query_string", b"")
+
+
+def _is_superuser(scope: Scope) -> bool:
+    # Импорт здесь: security тянет криптографию, не нужную при выключенном профилировании
+    from app.security import decode_token
+
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return False
+            try:
+                claims = decode_token(token)
+            except Exception:
+                return False
+            return claims.type == "access" and claims.is_superuser
+    return False
+
+
+class TracingMiddleware:
+    """Спаны запроса в заголовке `Server-Timing` и профилирование по запросу.
+
+    С `?__profile=1` и токеном суперпользователя вместо ответа
+    обработчика возвращается профиль в формате folded stacks.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if _wants_profile(scope) and _is_superuser(scope):
+            await self._profile(scope, receive, send)
+            return
+        if not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timings = ", ".join(
+                    f"{name};dur={total * 1000:.2f};desc=\"{count}x\""
+                    for name, (count, total) in trace.totals().items()
+                )
+                if timings:
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timings.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            elapsed = time.perf_counter() - trace.start
+            if elapsed * 1000 >= settings.TRACE_LOG_THRESHOLD_MS:
+                phases = ", ".join(
+                    f"{name}={total * 1000:.1f}ms/{count}" for name, (count, total) in trace.totals().items()
+                )
+                logger.warning(f"Slow request {scope['method']} {scope['path']} {elapsed * 1000:.1f}ms: {phases}")
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        status_code = 500
+
+        async def discard(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000)
+        sampler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            body = sampler.stop().encode()
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profiled-status", str(status_code).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.services.storage import get_storage, limit_stream
+from app.services.metrics import record_upload
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _open_temp(directory: Path):
+    fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    return os.fdopen(fd, "wb"), Path(tmp_name)
+
+
+def _finalize(buffer, tmp_path: Path, destination: Path) -> None:
+    buffer.flush()
+    os.fsync(buffer.fileno())
+    buffer.close()
+    os.replace(tmp_path, destination)
+
+
+def _discard(buffer, tmp_path: Path) -> None:
+    buffer.close()
+    tmp_path.unlink(missing_ok=True)
+
+
+def _write(buffer, chunk: bytes, hasher) -> None:
+    buffer.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+
+async def _iter_upload(file: UploadFile, chunk_size: int) -> AsyncIterator[bytes]:
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+async def save_stream(
+    chunks: AsyncIterator[bytes],
+    destination: Path,
+    max_size: int | None = None,
+    hasher=None
+) -> int:
+    """Потоковое сохранение данных на диск.
+
+    Блоки пишутся во временный файл в той же директории, который затем
+    атомарно переименовывается в `destination`. Дисковые операции
+    выполняются в пуле потоков, поэтому event loop не блокируется,
+    а потребление памяти не зависит от размера файла. Если передан
+    `hasher` (например, `hashlib.sha256()`), он обновляется по ходу записи.
+    Возвращает количество записанных байт.
+    """
+    destination.parent.mkdir(exist_ok=True, parents=True)
+    buffer, tmp_path = await run_in_threadpool(_open_temp, destination.parent)
+
+    written = 0
+    try:
+        async for chunk in chunks:
+            written += len(chunk)
+            if max_size is not None and written > max_size:
+                raise HTTPException(400, detail="File too large")
+            await run_in_threadpool(_write, buffer, chunk, hasher)
+        await run_in_threadpool(_finalize, buffer, tmp_path, destination)
+    except HTTPException:
+        await run_in_threadpool(_discard, buffer, tmp_path)
+        raise
+    except Exception as e:
+        await run_in_threadpool(_discard, buffer, tmp_path)
+        logger.error(f"Failed to save upload to {destination}: {str(e)}")
+        raise HTTPException(500, detail=f"Error saving file: {str(e)}")
+
+    return written
+
+
+async def save_upload_file(
+    file: UploadFile,
+    destination: Path,
+    max_size: int | None = None,
+    chunk_size: int | None = None,
+    hasher=None
+) -> int:
+    """Потоковое сохранение `UploadFile` блоками по `UPLOAD_CHUNK_SIZE`"""
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    return await save_stream(_iter_upload(file, chunk_size), destination, max_size, hasher)
+
+
+def session_expires_at() -> datetime:
+    """Срок загрузки по частям, отсчитываемый от текущего момента"""
+    return datetime.now(timezone.utc) + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+
+
+def chunk_key(upload_id: str, index: int) -> str:
+    return f"uploads/{upload_id}/{index:06d}.chunk"
+
+
+async def save_chunk(upload_id: str, index: int, chunks: AsyncIterator[bytes], max_size: int) -> int:
+    start = time.perf_counter()
+    size = await get_storage().put_stream(chunk_key(upload_id, index), limit_stream(chunks, max_size))
+    record_upload("chunk", size, time.perf_counter() - start)
+    return size
+
+
+async def list_chunks(upload_id: str) -> dict[int, int]:
+    """Принятые части загрузки: номер -> размер в байтах"""
+    objects = await get_storage().list(f"uploads/{upload_id}/")
+    return {
+        int(item.key.rsplit("/", 1)[-1].split(".")[0]): item.size
+        for item in objects
+        if item.key.endswith(".chunk")
+    }
+
+
+async def iter_chunks(upload_id: str, total_chunks: int) -> AsyncIterator[bytes]:
+    """Содержимое всех частей по порядку, без загрузки их в память целиком"""
+    storage = get_storage()
+    for index in range(total_chunks):
+        async for chunk in storage.get_range(chunk_key(upload_id, index)):
+            yield chunk
+
+
+async def discard_chunks(upload_id: str) -> None:
+    storage = get_storage()
+    objects = await storage.list(f"uploads/{upload_id}/")
+    await asyncio.gather(*(storage.delete(item.key) for item in objects))
+
+
+@asynccontextmanager
+async def local_copy(key: str) -> AsyncIterator[Path]:
+    """Путь к объекту хранилища на диске; удалённый объект скачивается в staging"""
+    storage = get_storage()
+    local_path = storage.local_path(key)
+    if local_path is not None:
+        yield local_path
+        return
+
+    staging_path = Path(settings.UPLOAD_STAGING_DIR) / f"copy-{uuid.uuid4().hex}"
+    await save_stream(storage.get_range(key), staging_path)
+    try:
+        yield staging_path
+    finally:
+        await run_in_threadpool(staging_path.unlink, True)
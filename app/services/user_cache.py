@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from cachetools import TTLCache
+from app.config import settings
+from app.models.user import User
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    """Неизменяемый снимок пользователя для зависимостей авторизации"""
+    id: int
+    email: str
+    username: str | None
+    yandex_id: str | None
+    is_active: bool
+    is_superuser: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            yandex_id=user.yandex_id,
+            is_active=bool(user.is_active),
+            is_superuser=bool(user.is_superuser),
+        )
+
+
+class UserCache:
+    """Ограниченный LRU-кеш пользователей с TTL, ключ — `sub` из токена.
+
+    TTL ограничивает время, за которое изменения, сделанные в другом
+    процессе (например, деактивация), становятся видны этому воркеру.
+    Записи в своём процессе инвалидируются явно из `user_crud`.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._users: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._emails_by_id: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email: str) -> UserSnapshot | None:
+        snapshot = self._users.get(email)
+        if snapshot is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return snapshot
+
+    def put(self, snapshot: UserSnapshot) -> None:
+        self._users[snapshot.email] = snapshot
+        self._emails_by_id[snapshot.id] = snapshot.email
+
+    def invalidate(self, user_id: int) -> None:
+        email = self._emails_by_id.pop(user_id, None)
+        if email is None:
+            email = next((s.email for s in self._users.values() if s.id == user_id), None)
+        if email is not None:
+            self._users.pop(email, None)
+
+    def clear(self) -> None:
+        self._users.clear()
+        self._emails_by_id.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._users),
+            "maxsize": int(self._users.maxsize),
+        }
+
+
+@lru_cache
+def get_user_cache() -> UserCache:
+    return UserCache(
+        maxsize=settings.USER_CACHE_MAXSIZE,
+        ttl=settings.USER_CACHE_TTL_SECONDS
+    )
@@ -1,43 +1,213 @@
-import httpx
+import asyncio
+import hashlib
+import random
+import time
+from functools import lru_cache
 from fastapi import HTTPException
 from app.config import settings
+from app.services.singleflight import SingleFlight
+from app.services.metrics import yandex_latency
+from app.services.tracing import span
 from cachetools import TTLCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+YANDEX_TOKEN_URL = "https://oauth.yandex.ru/token"
+YANDEX_INFO_URL = "https://login.yandex.ru/info"
+
 yandex_cache = TTLCache(maxsize=1000, ttl=300)
+yandex_cache_stats = {"hits": 0, "misses": 0}
+_user_info_flights = SingleFlight()
+
+
+class CircuitBreaker:
+    """Размыкатель цепи для внешнего сервиса.
+
+    После `failure_threshold` неудач подряд запросы сразу отклоняются
+    в течение `reset_timeout` секунд, затем пропускается одна пробная
+    попытка: при успехе цепь замыкается, при неудаче снова размыкается.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_in_progress:
+            self._trial_in_progress = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_progress = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def end_trial(self) -> None:
+        """Снятие пробной попытки, завершившейся без результата (отмена, другая ошибка)"""
+        self._trial_in_progress = False
+
+
+@lru_cache
+def get_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_threshold=settings.YANDEX_BREAKER_THRESHOLD,
+        reset_timeout=settings.YANDEX_BREAKER_RESET_SECONDS
+    )
+
+# httpx.AsyncClient; создаётся при первом запросе к Яндексу вместе с импортом httpx
+_client = None
+
+
+async def init_yandex_client(transport=None):
+    """Создание общего клиента на время жизни приложения.
+
+    `transport` позволяет подменить сеть, например `httpx.MockTransport`;
+    без него уже созданный клиент переиспользуется. Заменённый клиент
+    закрывается вместе со своими соединениями.
+    """
+    global _client
+    import httpx
+
+    if _client is not None and transport is None:
+        return _client
+    previous = _client
+    _client = httpx.AsyncClient(
+        http2=settings.YANDEX_HTTP2,
+        transport=transport,
+        timeout=httpx.Timeout(
+            settings.YANDEX_READ_TIMEOUT,
+            connect=settings.YANDEX_CONNECT_TIMEOUT
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.YANDEX_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.YANDEX_MAX_KEEPALIVE,
+            keepalive_expiry=settings.YANDEX_KEEPALIVE_EXPIRY
+        )
+    )
+    client = _client
+    if previous is not None:
+        await previous.aclose()
+    return client
+
+
+async def close_yandex_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def get_yandex_client():
+    if _client is None:
+        return await init_yandex_client()
+    return _client
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, settings.YANDEX_RETRY_BACKOFF * 2 ** attempt)
+
+
+_ENDPOINT_NAMES = {YANDEX_TOKEN_URL: "token", YANDEX_INFO_URL: "info"}
+
+
+async def _request(method: str, url: str, **kwargs):
+    import httpx
+
+    breaker = get_breaker()
+    trial = breaker.state == "half-open"
+    if not breaker.allow():
+        raise HTTPException(status_code=503, detail="Yandex OAuth is temporarily unavailable")
+
+    try:
+        client = await get_yandex_client()
+        endpoint = _ENDPOINT_NAMES.get(url, url)
+        # Повторяются только GET: код авторизации в POST /token одноразовый,
+        # и повтор запроса, который Яндекс уже обработал, всегда неудачен
+        retries = settings.YANDEX_RETRIES if method == "GET" else 0
+        start = time.perf_counter()
+        for attempt in range(retries + 1):
+            try:
+                with span(f"yandex_{endpoint}"):
+                    response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                logger.warning(f"Yandex request {url} failed: {e!r}")
+            else:
+                if response.status_code < 500:
+                    breaker.record_success()
+                    yandex_latency.observe(time.perf_counter() - start, endpoint, "ok")
+                    return response
+                logger.warning(f"Yandex request {url} returned {response.status_code}")
+
+            if attempt < retries:
+                await asyncio.sleep(_backoff(attempt))
+
+        breaker.record_failure()
+        yandex_latency.observe(time.perf_counter() - start, endpoint, "error")
+        raise HTTPException(status_code=503, detail="Yandex OAuth is temporarily unavailable")
+    finally:
+        # Пробная попытка, прерванная отменой или другой ошибкой, иначе
+        # оставила бы цепь разомкнутой до перезапуска процесса
+        if trial:
+            breaker.end_trial()
+
 
 async def get_yandex_token(code: str):
-    async with httpx.AsyncClient() as client:
-        data = {
-            "grant_type": "authorization_code",
-            "code": code,
-            "client_id": settings.YANDEX_CLIENT_ID,
-            "client_secret": settings.YANDEX_CLIENT_SECRET,
-            "redirect_uri": settings.YANDEX_REDIRECT_URI,
-        }
-        response = await client.post("https://oauth.yandex.ru/token", data=data)
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get Yandex token")
-        
-        return response.json()
+    data = {
+        "grant_type": "authorization_code",
+        "code": code,
+        "client_id": settings.YANDEX_CLIENT_ID,
+        "client_secret": settings.YANDEX_CLIENT_SECRET,
+        "redirect_uri": settings.YANDEX_REDIRECT_URI,
+    }
+    response = await _request("POST", YANDEX_TOKEN_URL, data=data)
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get Yandex token")
+
+    return response.json()
 
 async def get_yandex_user_info(access_token: str):
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        headers = {"Authorization": f"OAuth {access_token}"}
-        response = await client.get(
-            "https://login.yandex.ru/info",
-            headers={"Authorization": f"OAuth {access_token}"},
-            params={"format": "json"} 
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get user info from Yandex")
-        
-        return response.json()
-    
+    response = await _request(
+        "GET",
+        YANDEX_INFO_URL,
+        headers={"Authorization": f"OAuth {access_token}"},
+        params={"format": "json"}
+    )
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get user info from Yandex")
+
+    return response.json()
+
 async def get_yandex_user_info_cached(access_token: str):
-    if access_token in yandex_cache:
-        return yandex_cache[access_token]
-    
-    data = await get_yandex_user_info(access_token)
-    yandex_cache[access_token] = data
-    return data
\ No newline at end of file
+    key = hashlib.sha256(access_token.encode()).digest()
+    if key in yandex_cache:
+        yandex_cache_stats["hits"] += 1
+        return yandex_cache[key]
+
+    yandex_cache_stats["misses"] += 1
+    data = await _user_info_flights.do(key, lambda: get_yandex_user_info(access_token))
+    yandex_cache[key] = data
+    return data
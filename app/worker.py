@@ -0,0 +1,38 @@
+"""Отдельный процесс фоновых задач: `python -m app.worker`.
+
+Выполняет те же задачи, что и воркер внутри приложения; при запуске
+отдельно в приложении стоит выключить JOBS_IN_PROCESS. Процессов можно
+запустить несколько: задачи распределяются через `SKIP LOCKED`.
+"""
+import asyncio
+import logging
+import signal
+from app.services import tasks  # noqa: F401 - регистрирует типы задач
+from app.db.database import shutdown_db
+from app.services.analysis import get_analysis_pool
+from app.services.jobs import worker
+from app.services.storage import get_storage, close_storage
+
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    get_storage()
+    worker.start()
+    await stop.wait()
+
+    logger.info("Shutting down job worker...")
+    await worker.stop()
+    get_analysis_pool().shutdown()
+    await close_storage()
+    await shutdown_db()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
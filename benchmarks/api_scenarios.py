@@ -0,0 +1,489 @@
+"""Нагрузочные сценарии для горячих путей API.
+
+Приложение запускается в процессе (вместе с lifespan) поверх SQLite во
+временном каталоге или локального Postgres (`--database-url`); Яндекс
+OAuth подменён `httpx.MockTransport`. Сценарии:
+
+- `login` — поток входов через `/auth/yandex` для разных пользователей;
+- `list` — постраничный обход библиотеки через `/audio/` с курсором;
+- `upload` — параллельные загрузки файлов разного размера;
+- `stream` — случайные Range-запросы к `/audio/{id}/stream`.
+
+Для каждого сценария считаются RPS, p50/p95/p99 задержки, пиковый RSS
+(медиана по `--repeat` прогонам) и, отдельным коротким прогоном под tracemalloc, пик выделенной памяти.
+Результат сохраняется в JSON и сравнивается с базовым:
+
+    python -m benchmarks.api_scenarios run --out baseline.json
+    python -m benchmarks.api_scenarios run --scenario list --scenario stream --out new.json
+    python -m benchmarks.api_scenarios compare baseline.json new.json --threshold 10
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+SCENARIOS = ("login", "list", "upload", "stream")
+
+# Метрики, для которых рост — регрессия, и для которых регрессия — падение
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb", "alloc_peak_mb")
+HIGHER_IS_BETTER = ("rps",)
+
+
+def configure_environment(workdir: Path, database_url: str | None) -> None:
+    """Настройки приложения; должны быть заданы до импорта `app`"""
+    defaults = {
+        "POSTGRES_USER": "bench",
+        "POSTGRES_PASSWORD": "bench",
+        "POSTGRES_DB": "bench",
+        "POSTGRES_HOST": "localhost",
+        "POSTGRES_PORT": "5432",
+        "YANDEX_CLIENT_ID": "bench",
+        "YANDEX_CLIENT_SECRET": "bench",
+        "YANDEX_REDIRECT_URI": "http://localhost/callback",
+        "SECRET_KEY": "bench",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    os.environ["DATABASE_URL"] = database_url or f"sqlite+aiosqlite:///{workdir / 'bench.sqlite'}"
+    os.environ["DB_CREATE_ALL_ON_STARTUP"] = "true"
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["STORAGE_LOCAL_ROOT"] = str(workdir / "storage")
+    os.environ["RENDITION_CACHE_DIR"] = str(workdir / "renditions")
+    # Лимиты и квоты измеряются отдельно и здесь только мешают
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["STORAGE_QUOTA_BYTES"] = str(1 << 50)
+
+
+# --- Измерения ---------------------------------------------------------------
+
+def current_rss() -> int:
+    """Текущий RSS в байтах; без /proc — пиковый за время жизни процесса"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+async def sample_rss(peak: list[int], stop: asyncio.Event, interval: float = 0.01) -> None:
+    while not stop.is_set():
+        peak[0] = max(peak[0], current_rss())
+        await asyncio.sleep(interval)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+@dataclass
+class Result:
+    requests: int
+    errors: int
+    elapsed: float
+    latencies: list[float] = field(default_factory=list)
+    peak_rss: int = 0
+
+    def summary(self) -> dict[str, float]:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rps": self.requests / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "peak_rss_mb": self.peak_rss / 1024 / 1024,
+        }
+
+
+async def drive(
+    operation: Callable[[int], Awaitable[int]],
+    requests: int,
+    concurrency: int
+) -> Result:
+    """`requests` вызовов `operation(i)` не более чем по `concurrency` одновременно"""
+    result = Result(requests=requests, errors=0, elapsed=0.0)
+    counter = iter(range(requests))
+    peak = [current_rss()]
+    stop = asyncio.Event()
+
+    async def worker() -> None:
+        for i in counter:
+            started = time.perf_counter()
+            status_code = await operation(i)
+            result.latencies.append(time.perf_counter() - started)
+            if status_code >= 400:
+                result.errors += 1
+
+    sampler = asyncio.create_task(sample_rss(peak, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+    result.peak_rss = peak[0]
+    return result
+
+
+async def measure_allocations(
+    operation: Callable[[int], Awaitable[int]],
+    requests: int,
+    concurrency: int
+) -> dict[str, float]:
+    """Пик памяти под tracemalloc; отдельный прогон, так как трассировка искажает задержки"""
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await drive(operation, requests, concurrency)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "alloc_peak_mb": (peak - baseline) / 1024 / 1024,
+        "alloc_per_request_kb": (peak - baseline) / max(requests, 1) / 1024,
+    }
+
+
+# --- Окружение сценариев -----------------------------------------------------
+
+def yandex_transport(latency: float):
+    """Подмена Яндекс OAuth: токен и профиль выводятся из `code`"""
+    import httpx
+    from app.services.yandex_auth import YANDEX_INFO_URL, YANDEX_TOKEN_URL
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        if str(request.url).startswith(YANDEX_TOKEN_URL):
+            code = dict(httpx.QueryParams(request.content.decode()))["code"]
+            return httpx.Response(200, json={"access_token": f"token-{code}", "token_type": "bearer"})
+        if str(request.url).startswith(YANDEX_INFO_URL):
+            user = request.headers["authorization"].rsplit("-", 1)[-1]
+            return httpx.Response(200, json={
+                "id": f"ya{user}",
+                "login": f"bench{user}",
+                "default_email": f"bench{user}@example.com",
+            })
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler)
+
+
+def make_wav(size: int, sample_rate: int = 22050) -> bytes:
+    """WAV примерно заданного размера с шумом, чтобы фоновый анализ шёл как обычно"""
+    frames = max(size - 44, 2) // 2
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(os.urandom(frames * 2))
+    return buffer.getvalue()
+
+
+@dataclass
+class BenchUser:
+    id: int
+    headers: dict[str, str]
+
+
+async def create_users(count: int, prefix: str) -> list[BenchUser]:
+    from app.crud import user_crud
+    from app.db.database import AsyncSessionLocal
+    from app.schemas.schemas import UserCreate
+    from app.security import create_access_token
+
+    users = []
+    async with AsyncSessionLocal() as db:
+        for i in range(count):
+            email = f"{prefix}{i}@example.com"
+            user = await user_crud.get_user_by_email(db, email)
+            if user is None:
+                user = await user_crud.create_user(db, UserCreate(email=email, username=f"{prefix}{i}"))
+            token = create_access_token({"sub": email, "is_superuser": False})
+            users.append(BenchUser(user.id, {"Authorization": f"Bearer {token}"}))
+    return users
+
+
+# --- Сценарии ---------------------------------------------------------------
+
+@dataclass
+class Scenario:
+    operation: Callable[[int], Awaitable[int]]
+    requests: int
+
+
+async def setup_login(client, args) -> Scenario:
+    sequence = itertools.count()
+    rng = random.Random(0)
+
+    async def login(i: int) -> int:
+        # Каждый пятый вход — новый пользователь, остальные — повторные входы
+        # уже созданных; доля одинакова в прогреве и во всех прогонах
+        n = next(sequence)
+        user = n // 5 if n % 5 == 0 else rng.randrange(n // 5 + 1)
+        response = await client.post("/api/v1/auth/yandex", params={"code": f"{n}-{user}"})
+        return response.status_code
+
+    return Scenario(login, args.requests)
+
+
+async def setup_list(client, args) -> Scenario:
+    from app.crud import audio_crud
+    from app.db.database import AsyncSessionLocal
+
+    users = await create_users(args.users, "lister")
+    async with AsyncSessionLocal() as db:
+        for user in users:
+            if await audio_crud.get_audios_page(db, user.id, limit=1):
+                continue
+            for start in range(0, args.library_size, 1000):
+                await audio_crud.create_audios(db, user.id, [
+                    (f"track-{n:06d}.mp3", f"bench/{user.id}/{n}", None, 1024)
+                    for n in range(start, min(start + 1000, args.library_size))
+                ])
+                await db.commit()
+
+    cursors: dict[int, str | None] = {}
+
+    async def list_page(i: int) -> int:
+        # Каждый воркер листает библиотеку своего пользователя страница за страницей
+        user = users[i % len(users)]
+        params = {"limit": args.page_size}
+        if cursors.get(user.id):
+            params["cursor"] = cursors[user.id]
+        response = await client.get("/api/v1/audio/", params=params, headers=user.headers)
+        if response.status_code == 200:
+            cursors[user.id] = response.json()["next_cursor"]
+        return response.status_code
+
+    return Scenario(list_page, args.requests)
+
+
+async def setup_upload(client, args) -> Scenario:
+    users = await create_users(args.users, "uploader")
+    sizes = [int(s * 1024) for s in args.upload_sizes_kb]
+    payloads = {size: make_wav(size) for size in sizes}
+    run_id = time.time_ns()
+    # Сквозной номер: прогрев и повторные прогоны не должны давать одинаковых имён
+    sequence = itertools.count()
+
+    async def upload(i: int) -> int:
+        n = next(sequence)
+        user = users[i % len(users)]
+        size = sizes[i % len(sizes)]
+        # Уникальные байты, чтобы не срабатывала дедупликация blob'ов
+        body = payloads[size][:-8] + n.to_bytes(8, "little")
+        response = await client.post(
+            "/api/v1/audio/upload",
+            files={"file": (f"bench-{run_id}-{n}.wav", body, "audio/wav")},
+            headers=user.headers
+        )
+        return response.status_code
+
+    return Scenario(upload, args.uploads)
+
+
+async def setup_stream(client, args) -> Scenario:
+    users = await create_users(args.users, "streamer")
+    size = args.stream_size_kb * 1024
+    targets = []
+    for user in users:
+        response = await client.post(
+            "/api/v1/audio/upload",
+            files={"file": (f"stream-{time.time_ns()}.wav", make_wav(size), "audio/wav")},
+            headers=user.headers
+        )
+        response.raise_for_status()
+        targets.append((user, response.json()["id"]))
+    chunk = args.range_kb * 1024
+    rng = random.Random(0)
+
+    async def stream_range(i: int) -> int:
+        user, audio_id = targets[i % len(targets)]
+        start = rng.randrange(0, max(size - chunk, 1))
+        response = await client.get(
+            f"/api/v1/audio/{audio_id}/stream",
+            headers={**user.headers, "Range": f"bytes={start}-{start + chunk - 1}"}
+        )
+        return response.status_code
+
+    return Scenario(stream_range, args.requests)
+
+
+SETUPS = {
+    "login": setup_login,
+    "list": setup_list,
+    "upload": setup_upload,
+    "stream": setup_stream,
+}
+
+
+# --- Команды ------------------------------------------------------------------
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict[str, dict]) -> None:
+    header = f"{'scenario':<8} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'rss':>8} {'alloc':>8} {'errors':>6}"
+    print(header)
+    for name, r in results.items():
+        alloc = f"{r['alloc_peak_mb']:.1f}MB" if "alloc_peak_mb" in r else "-"
+        print(
+            f"{name:<8} {r['rps']:>9,.0f} {r['p50_ms']:>6.1f}ms {r['p95_ms']:>6.1f}ms "
+            f"{r['p99_ms']:>6.1f}ms {r['peak_rss_mb']:>6.0f}MB {alloc:>8} {r['errors']:>6}"
+        )
+
+
+async def run(args, workdir: Path) -> dict:
+    import httpx
+    from app.main import app, lifespan
+    from app.db.database import get_engine
+    from app.services.yandex_auth import init_yandex_client
+
+    # Клиент с подменённым транспортом создаётся заранее, и приложение его переиспользует
+    await init_yandex_client(yandex_transport(args.yandex_latency_ms / 1000))
+    results = {}
+    async with lifespan(app):
+        backend = get_engine().url.get_backend_name()
+        # Ошибки приложения считаются как ответы 500, а не прерывают прогон
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name in args.scenario or SCENARIOS:
+                scenario = await SETUPS[name](client, args)
+                if args.warmup:
+                    await drive(scenario.operation, min(args.warmup, scenario.requests), args.concurrency)
+                runs = [
+                    (await drive(scenario.operation, scenario.requests, args.concurrency)).summary()
+                    for _ in range(args.repeat)
+                ]
+                # Медиана по каждой метрике сглаживает разброс между прогонами
+                results[name] = {metric: statistics.median(r[metric] for r in runs) for metric in runs[0]}
+                if args.allocations:
+                    results[name].update(await measure_allocations(
+                        scenario.operation, max(scenario.requests // 5, 1), args.concurrency
+                    ))
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": backend,
+            "args": {k: v for k, v in vars(args).items() if k not in ("func", "out")},
+        },
+        "scenarios": results,
+    }
+
+
+def command_run(args) -> int:
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        configure_environment(Path(tmp), args.database_url)
+        report = asyncio.run(run(args, Path(tmp)))
+    print_results(report["scenarios"])
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"saved {args.out}")
+    return 0
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> tuple[list[str], bool]:
+    """Строки отчёта и признак регрессии больше `threshold` процентов"""
+    lines = []
+    regressed = False
+    for name, base in baseline["scenarios"].items():
+        new = current["scenarios"].get(name)
+        if new is None:
+            continue
+        lines.append(name)
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            if metric not in base or metric not in new or not base[metric]:
+                continue
+            change = (new[metric] - base[metric]) / base[metric] * 100
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            mark = ""
+            if worse > threshold:
+                mark = "  REGRESSION"
+                regressed = True
+            elif worse < -threshold:
+                mark = "  improved"
+            lines.append(f"  {metric:<14} {base[metric]:>12.2f} -> {new[metric]:>12.2f}  {change:+7.1f}%{mark}")
+        if new.get("errors", 0) > base.get("errors", 0):
+            lines.append(f"  errors         {base.get('errors', 0):>12} -> {new['errors']:>12}  REGRESSION")
+            regressed = True
+    return lines, regressed
+
+
+def command_compare(args) -> int:
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    print(f"baseline {baseline['meta'].get('revision')}  current {current['meta'].get('revision')}")
+    lines, regressed = compare(baseline, current, args.threshold)
+    print("\n".join(lines))
+    return 1 if regressed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(required=True)
+
+    run_parser = commands.add_parser("run", help="прогнать сценарии")
+    run_parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="по умолчанию все")
+    run_parser.add_argument("--database-url", help="по умолчанию SQLite во временном каталоге")
+    run_parser.add_argument("--requests", type=int, default=2000)
+    run_parser.add_argument("--uploads", type=int, default=200)
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--warmup", type=int, default=50)
+    run_parser.add_argument("--repeat", type=int, default=3, help="прогонов на сценарий, в отчёт идёт медиана")
+    run_parser.add_argument("--users", type=int, default=8)
+    run_parser.add_argument("--library-size", type=int, default=5000)
+    run_parser.add_argument("--page-size", type=int, default=50)
+    run_parser.add_argument("--upload-sizes-kb", type=float, nargs="+", default=[64, 512, 4096])
+    run_parser.add_argument("--stream-size-kb", type=int, default=4096)
+    run_parser.add_argument("--range-kb", type=int, default=256)
+    run_parser.add_argument("--yandex-latency-ms", type=float, default=0.0)
+    run_parser.add_argument("--no-allocations", dest="allocations", action="store_false")
+    run_parser.add_argument("--out", help="файл JSON для сохранения результатов")
+    run_parser.set_defaults(func=command_run)
+
+    compare_parser = commands.add_parser("compare", help="сравнить два сохранённых прогона")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="допуск, проценты")
+    compare_parser.set_defaults(func=command_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Пропускная способность авторизованного no-op эндпоинта.
+
+`legacy` повторяет прежний путь (`jwt.decode` + pydantic-модель на
+каждый запрос), `cached` использует `get_token_claims`. Пользователь
+в обоих случаях не загружается, чтобы измерять только проверку токена.
+
+    python -m benchmarks.auth_pipeline --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+
+os.environ.setdefault("POSTGRES_USER", "bench")
+os.environ.setdefault("POSTGRES_PASSWORD", "bench")
+os.environ.setdefault("POSTGRES_DB", "bench")
+os.environ.setdefault("POSTGRES_HOST", "localhost")
+os.environ.setdefault("POSTGRES_PORT", "5432")
+os.environ.setdefault("YANDEX_CLIENT_ID", "bench")
+os.environ.setdefault("YANDEX_CLIENT_SECRET", "bench")
+os.environ.setdefault("YANDEX_REDIRECT_URI", "http://localhost/callback")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import httpx
+from fastapi import Depends, FastAPI
+from jose import jwt
+from pydantic import BaseModel
+
+from app.config import settings
+from app.security import TokenClaims, create_access_token
+from app.services.auth import get_token_claims, oauth2_scheme
+
+
+class LegacyTokenPayload(BaseModel):
+    sub: str
+    exp: datetime
+    is_superuser: bool = False
+
+
+async def legacy_claims(token: str = Depends(oauth2_scheme)) -> LegacyTokenPayload:
+    payload = jwt.decode(
+        token,
+        settings.SECRET_KEY,
+        algorithms=[settings.ALGORITHM],
+        options={"verify_aud": False}
+    )
+    return LegacyTokenPayload(**payload)
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/legacy")
+    async def legacy(claims: LegacyTokenPayload = Depends(legacy_claims)):
+        return {"sub": claims.sub}
+
+    @app.get("/cached")
+    async def cached(claims: TokenClaims = Depends(get_token_claims)):
+        return {"sub": claims.sub}
+
+    return app
+
+
+async def run_case(client: httpx.AsyncClient, path: str, headers: dict, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def main(requests: int, concurrency: int, users: int) -> None:
+    tokens = [create_access_token({"sub": f"user{i}@example.com"}) for i in range(users)]
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/legacy", "/cached"):
+            rps = 0.0
+            for token in tokens:
+                headers = {"Authorization": f"Bearer {token}"}
+                rps += await run_case(client, path, headers, requests // users, concurrency)
+            print(f"{path:<8} {rps / users:,.0f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.users))
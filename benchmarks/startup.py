@@ -0,0 +1,251 @@
+"""Холодный старт приложения: импорт `app.main` и startup lifespan.
+
+Каждый прогон — новый процесс интерпретатора, как у только что
+запущенного пода. Считаются медианы по `--repeat` прогонам:
+
+- `import_ms` — импорт `app.main`;
+- `ready_ms` — от запуска процесса до конца startup lifespan, то есть
+  до готовности принимать запросы;
+- `frameworks_ms` — импорт одних FastAPI, SQLAlchemy и pydantic: нижняя
+  граница на этой машине, всё сверх неё — код приложения.
+
+Отдельный прогон под `python -X importtime` даёт вклад пакетов в импорт
+`app.main` и проверяет, что тяжёлые зависимости из LAZY_MODULES при
+импорте не загружаются. Ещё один прогон импортирует модули приложения
+без переменных окружения: при импорте настройки не читаются. Код
+возврата 1, если медиана `ready_ms` больше `--budget-ms`, какой-то из
+LAZY_MODULES импортирован или импорт без окружения не удался:
+
+    python -m benchmarks.startup run --budget-ms 1000 --out startup.json
+    python -m benchmarks.startup compare baseline.json startup.json --threshold 10
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.api_scenarios import configure_environment, git_revision
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Загружаются при первом использовании (запрос, lifespan, задача), а не при импорте
+LAZY_MODULES = ("jose", "passlib", "httpx", "asyncpg", "numpy", "boto3", "redis", "multiprocessing")
+
+METRICS = ("import_ms", "ready_ms", "frameworks_ms", "modules")
+
+FRAMEWORKS = "import fastapi, pydantic, pydantic_settings, sqlalchemy.orm, sqlalchemy.ext.asyncio"
+
+# Точки входа: приложение, отдельный воркер задач и модули с синглтонами
+BARE_IMPORT = "import app.main, app.worker, app.security"
+
+# Печатает время импорта и готовности от старта кода; процесс завершается после shutdown
+STARTUP = """
+import asyncio, time
+started = time.perf_counter()
+from app.main import app, lifespan
+imported = time.perf_counter()
+
+async def main():
+    async with lifespan(app):
+        print(f"{imported - started:.6f}", flush=True)
+
+asyncio.run(main())
+"""
+
+
+def child_environment(workdir: Path) -> dict[str, str]:
+    """Окружение api_scenarios без create_all и воркера задач: схему создают миграции"""
+    configure_environment(workdir, None)
+    env = dict(os.environ)
+    env["DB_CREATE_ALL_ON_STARTUP"] = "false"
+    env["JOBS_IN_PROCESS"] = "false"
+    return env
+
+
+def measure_startup(env: dict[str, str]) -> dict[str, float]:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", STARTUP],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    line = process.stdout.readline()
+    ready = time.perf_counter() - started
+    process.communicate(timeout=60)
+    if process.returncode or not line:
+        raise RuntimeError(f"Application startup failed with code {process.returncode}")
+    return {"import_ms": float(line) * 1000, "ready_ms": ready * 1000}
+
+
+def measure_frameworks(env: dict[str, str]) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", FRAMEWORKS], cwd=ROOT, env=env, check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def import_without_environment() -> str | None:
+    """Импорт без переменных окружения и .env; текст ошибки или None"""
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        # cwd без .env: pydantic-settings читает его из текущего каталога
+        result = subprocess.run(
+            [sys.executable, "-c", f"import sys; sys.path.insert(0, {str(ROOT)!r}); {BARE_IMPORT}"],
+            cwd=tmp, env={"PATH": os.environ.get("PATH", "")}, capture_output=True, text=True
+        )
+    if result.returncode:
+        # Строка исключения — последняя без отступа; ниже могут идти подробности pydantic
+        lines = [line for line in result.stderr.splitlines() if line and not line[0].isspace()]
+        return lines[-1] if lines else f"exit code {result.returncode}"
+    return None
+
+
+def parse_importtime(report: str) -> list[tuple[str, int, int, int]]:
+    """Строки `-X importtime`: (модуль, глубина, собственное и общее время в мкс)"""
+    entries = []
+    for line in report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        depth = len(name) - len(name.lstrip()) - 1
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def app_imports(entries: list[tuple[str, int, int, int]]) -> list[tuple[str, int, int, int]]:
+    """Поддерево импорта `app.main`: строки перед ним с большей глубиной"""
+    index = next(i for i, entry in enumerate(entries) if entry[0] == "app.main")
+    depth = entries[index][1]
+    start = index
+    while start > 0 and entries[start - 1][1] > depth:
+        start -= 1
+    return entries[start:index + 1]
+
+
+def import_profile(env: dict[str, str], top: int) -> dict:
+    with tempfile.TemporaryFile(mode="w+") as report:
+        # Отчёт пишется в stderr и больше буфера канала, поэтому идёт в файл
+        subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app.main"],
+            cwd=ROOT, env=env, stderr=report, check=True
+        )
+        report.seek(0)
+        entries = app_imports(parse_importtime(report.read()))
+
+    packages = Counter()
+    for name, _, self_us, _ in entries:
+        packages[name.split(".")[0]] += self_us
+    loaded = {name.split(".")[0] for name, *_ in entries}
+    return {
+        "total_ms": entries[-1][3] / 1000,
+        "modules": len(entries),
+        "packages": {name: us / 1000 for name, us in packages.most_common(top)},
+        "lazy_violations": sorted(loaded.intersection(LAZY_MODULES)),
+    }
+
+
+def print_report(report: dict) -> None:
+    startup = report["startup"]
+    print(" ".join(f"{metric} {startup[metric]:.0f}ms" for metric in startup))
+    profile = report["imports"]
+    print(f"importtime: {profile['modules']} modules, {profile['total_ms']:.0f}ms")
+    for name, ms in profile["packages"].items():
+        print(f"  {name:<20} {ms:>8.1f}ms")
+
+
+def command_run(args) -> int:
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        env = child_environment(Path(tmp))
+        # Прогрев: байткод и файловый кэш, как в образе с предкомпилированным кодом
+        measure_startup(env)
+        runs = [measure_startup(env) for _ in range(args.repeat)]
+        frameworks = [measure_frameworks(env) for _ in range(args.repeat)]
+        profile = import_profile(env, args.top)
+    bare_import_error = import_without_environment()
+
+    startup = {metric: statistics.median(r[metric] for r in runs) for metric in runs[0]}
+    startup["frameworks_ms"] = statistics.median(frameworks)
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("func", "out")},
+        },
+        "startup": startup,
+        "imports": {**profile, "bare_import_error": bare_import_error},
+    }
+    print_report(report)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"saved {args.out}")
+
+    failed = False
+    if profile["lazy_violations"]:
+        print(f"FAIL: imported at startup: {', '.join(profile['lazy_violations'])}")
+        failed = True
+    if bare_import_error:
+        print(f"FAIL: import without environment: {bare_import_error}")
+        failed = True
+    if args.budget_ms is not None and startup["ready_ms"] > args.budget_ms:
+        print(f"FAIL: ready_ms {startup['ready_ms']:.0f} > budget {args.budget_ms:.0f}")
+        failed = True
+    return 1 if failed else 0
+
+
+def metrics(report: dict) -> dict[str, float]:
+    # Число модулей не зависит от шума машины и ловит новые тяжёлые импорты
+    return {**report["startup"], "modules": report["imports"]["modules"]}
+
+
+def command_compare(args) -> int:
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    print(f"baseline {baseline['meta'].get('revision')}  current {current['meta'].get('revision')}")
+    regressed = False
+    for metric in METRICS:
+        base, new = metrics(baseline)[metric], metrics(current)[metric]
+        change = (new - base) / base * 100
+        mark = ""
+        # Рост frameworks_ms означает другую машину или версии пакетов, а не регрессию кода
+        if change > args.threshold and metric != "frameworks_ms":
+            mark = "  REGRESSION"
+            regressed = True
+        elif change < -args.threshold:
+            mark = "  improved"
+        print(f"  {metric:<14} {base:>10.1f} -> {new:>10.1f}  {change:+7.1f}%{mark}")
+    return 1 if regressed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(required=True)
+
+    run_parser = commands.add_parser("run", help="измерить холодный старт")
+    run_parser.add_argument("--repeat", type=int, default=7, help="прогонов, в отчёт идёт медиана")
+    run_parser.add_argument("--budget-ms", type=float, default=1000.0, help="предел медианы ready_ms")
+    run_parser.add_argument("--top", type=int, default=15, help="пакетов в отчёте importtime")
+    run_parser.add_argument("--out", help="файл JSON для сохранения результатов")
+    run_parser.set_defaults(func=command_run)
+
+    compare_parser = commands.add_parser("compare", help="сравнить два сохранённых прогона")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="допуск, проценты")
+    compare_parser.set_defaults(func=command_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Задержка event loop при параллельных загрузках.
+
+Сравнивает прежнюю схему (`await file.read()` + блокирующий `write`)
+с потоковым `save_upload_file`. Во время загрузки фоновая задача
+измеряет, насколько опаздывает `asyncio.sleep` — это и есть задержка,
+которую видят остальные запросы.
+
+    python -m benchmarks.upload_latency --uploads 50 --size-mb 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+os.environ.setdefault("POSTGRES_USER", "bench")
+os.environ.setdefault("POSTGRES_PASSWORD", "bench")
+os.environ.setdefault("POSTGRES_DB", "bench")
+os.environ.setdefault("POSTGRES_HOST", "localhost")
+os.environ.setdefault("POSTGRES_PORT", "5432")
+os.environ.setdefault("YANDEX_CLIENT_ID", "bench")
+os.environ.setdefault("YANDEX_CLIENT_SECRET", "bench")
+os.environ.setdefault("YANDEX_REDIRECT_URI", "http://localhost/callback")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from app.services.uploads import save_upload_file
+
+PROBE_INTERVAL = 0.005
+
+
+def build_app(target_dir: Path) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/buffered")
+    async def buffered(file: UploadFile = File(...)):
+        contents = await file.read()
+        with open(target_dir / f"{id(contents)}.bin", "wb") as buffer:
+            buffer.write(contents)
+        return {"size": len(contents)}
+
+    @app.post("/streaming")
+    async def streaming(file: UploadFile = File(...)):
+        size = await save_upload_file(file, target_dir / f"{id(file)}.bin")
+        return {"size": size}
+
+    return app
+
+
+async def probe_loop(samples: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def run_case(app: FastAPI, path: str, uploads: int, payload: bytes) -> dict:
+    samples: list[float] = []
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        tracemalloc.start()
+        probe = asyncio.create_task(probe_loop(samples, stop))
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post(path, files={"file": (f"{i}.wav", payload, "audio/wav")})
+            for i in range(uploads)
+        ))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses]
+    samples.sort()
+    return {
+        "elapsed_s": elapsed,
+        "lag_p50_ms": statistics.median(samples) * 1000,
+        "lag_p99_ms": samples[int(len(samples) * 0.99) - 1] * 1000,
+        "lag_max_ms": samples[-1] * 1000,
+        "peak_traced_mb": peak / 1024 / 1024,
+    }
+
+
+async def main(uploads: int, size_mb: int) -> None:
+    payload = os.urandom(size_mb * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(Path(tmp))
+        for path in ("/buffered", "/streaming"):
+            result = await run_case(app, path, uploads, payload)
+            print(
+                f"{path:<11} total={result['elapsed_s']:.2f}s "
+                f"lag p50={result['lag_p50_ms']:.1f}ms "
+                f"p99={result['lag_p99_ms']:.1f}ms "
+                f"max={result['lag_max_ms']:.1f}ms "
+                f"peak={result['peak_traced_mb']:.0f}MB"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--size-mb", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.uploads, args.size_mb))
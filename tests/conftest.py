@@ -0,0 +1,94 @@
+"""Общие фикстуры: приложение на SQLite во временном каталоге.
+
+Настройки читаются при первом обращении, поэтому окружение достаточно
+заполнить здесь, до первого теста. Каждый тест получает пустую базу.
+"""
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+
+_ROOT = Path(tempfile.mkdtemp(prefix="audio-service-tests-"))
+_DATABASE = _ROOT / "test.sqlite"
+
+for name, value in {
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "YANDEX_CLIENT_ID": "test",
+    "YANDEX_CLIENT_SECRET": "test",
+    "YANDEX_REDIRECT_URI": "http://localhost/callback",
+    "SECRET_KEY": "test-secret",
+}.items():
+    os.environ.setdefault(name, value)
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{_DATABASE}",
+    "STORAGE_BACKEND": "local",
+    "STORAGE_LOCAL_ROOT": str(_ROOT / "storage"),
+    "UPLOAD_STAGING_DIR": str(_ROOT / "staging"),
+    "RENDITION_CACHE_DIR": str(_ROOT / "renditions"),
+    "RESUMABLE_CHUNK_SIZE": str(128 * 1024),
+    "JOBS_IN_PROCESS": "false",
+    "JOB_POLL_INTERVAL": "0.05",
+    "JOB_RETRY_BACKOFF": "0",
+    "FINGERPRINT_ENABLED": "false",
+})
+
+
+@pytest.fixture(autouse=True)
+async def database():
+    from app.db.database import create_all_async, shutdown_db
+
+    _DATABASE.unlink(missing_ok=True)
+    await create_all_async()
+    yield
+    # Движок привязан к циклу событий теста
+    await shutdown_db()
+
+
+@pytest.fixture
+async def db(database):
+    from app.db.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+async def client(database):
+    from app.main import create_app
+
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def make_user():
+    """Пользователь с квотой и заголовки с его токеном"""
+    from app.crud import user_crud
+    from app.db.database import AsyncSessionLocal
+    from app.models.user import User
+    from app.schemas.schemas import UserCreate
+    from app.security import create_access_token
+    from sqlalchemy import update
+
+    async def make(quota: int | None = None):
+        # Уникальный email: кэш пользователей переживает пересоздание базы
+        username = f"u{uuid.uuid4().hex[:9]}"
+        email = f"{username}@example.com"
+        async with AsyncSessionLocal() as session:
+            user = await user_crud.create_user(session, UserCreate(email=email, username=username))
+            if quota is not None:
+                await session.execute(update(User).where(User.id == user.id).values(storage_quota=quota))
+                await session.commit()
+        token = create_access_token({"sub": email, "is_superuser": False})
+        return user, {"Authorization": f"Bearer {token}"}
+
+    return make
@@ -0,0 +1,50 @@
+from sqlalchemy import update
+
+from app.models.job import Job
+from app.services import accounts
+from app.services import tasks  # noqa: F401 - регистрирует типы задач
+
+
+async def set_purge_job(db, user_id: int, **values) -> None:
+    await db.execute(update(Job).where(Job.idempotency_key == accounts.purge_key(user_id)).values(**values))
+    await db.commit()
+
+
+async def test_schedule_purge_does_not_duplicate_queued_job(db):
+    first = await accounts.schedule_purge(db, [1, 2])
+    await db.commit()
+
+    second = await accounts.schedule_purge(db, [1, 2])
+    await db.commit()
+
+    assert second == first
+    assert len(set(first.values())) == 2
+
+
+async def test_schedule_purge_requeues_failed_job(db):
+    scheduled = await accounts.schedule_purge(db, [1])
+    await db.commit()
+    await set_purge_job(db, 1, status="failed", attempts=5, last_error="OSError: boom", finished_at=Job.run_at)
+
+    rescheduled = await accounts.schedule_purge(db, [1])
+    await db.commit()
+
+    assert rescheduled == scheduled
+    db.expire_all()
+    job = await accounts.get_purge_job(db, 1)
+    assert job.status == "queued"
+    assert job.attempts == 0
+    assert job.last_error is None
+    assert job.finished_at is None
+
+
+async def test_schedule_purge_keeps_finished_job(db):
+    await accounts.schedule_purge(db, [1])
+    await db.commit()
+    await set_purge_job(db, 1, status="done")
+
+    await accounts.schedule_purge(db, [1])
+    await db.commit()
+
+    db.expire_all()
+    assert (await accounts.get_purge_job(db, 1)).status == "done"
@@ -0,0 +1,114 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from app.crud import job_crud
+from app.db.database import AsyncSessionLocal
+from app.services import jobs
+
+
+@pytest.fixture
+def job_types(monkeypatch):
+    """Только типы задач теста: задачи приложения воркер не трогает"""
+    registered = {}
+    monkeypatch.setattr(jobs, "job_types", registered)
+    return registered
+
+
+async def wait_for_status(job_id: int, status: str, timeout: float = 5.0):
+    async def poll():
+        while True:
+            async with AsyncSessionLocal() as session:
+                job = await job_crud.get_job(session, job_id)
+            if job.status == status:
+                return job
+            await asyncio.sleep(0.02)
+
+    return await asyncio.wait_for(poll(), timeout)
+
+
+async def run_worker(job_id: int, status: str):
+    worker = jobs.Worker()
+    worker.start()
+    try:
+        return worker, await wait_for_status(job_id, status)
+    finally:
+        await worker.stop()
+
+
+async def test_enqueue_with_same_key_keeps_one_job(db, job_types):
+    jobs.register("noop", handler=lambda: None)
+
+    first = await jobs.enqueue(db, "noop", {}, idempotency_key="noop:1")
+    second = await jobs.enqueue(db, "noop", {}, idempotency_key="noop:1")
+    await db.commit()
+
+    assert first is not None
+    assert second is None
+    assert (await job_crud.get_job_by_key(db, "noop:1")).id == first
+
+
+async def test_claim_respects_limits_and_lease(db, job_types):
+    jobs.register("noop", handler=lambda: None)
+    for _ in range(3):
+        await jobs.enqueue(db, "noop", {})
+    await db.commit()
+    now = jobs._now()
+
+    claimed = await job_crud.claim_jobs(db, {"noop": 2}, now, lease_seconds=60)
+    assert len(claimed) == 2
+    assert all(job.status == "running" and job.attempts == 1 for job in claimed)
+
+    remaining = await job_crud.claim_jobs(db, {"noop": 2}, now, lease_seconds=60)
+    assert len(remaining) == 1
+
+    # Пока аренда не истекла, захваченные задачи никому не достаются
+    assert await job_crud.claim_jobs(db, {"noop": 5}, now, lease_seconds=60) == []
+    expired = await job_crud.claim_jobs(db, {"noop": 5}, now + timedelta(seconds=61), lease_seconds=60)
+    assert len(expired) == 3
+    assert all(job.attempts == 2 for job in expired)
+
+
+async def test_claim_skips_delayed_jobs(db, job_types):
+    jobs.register("noop", handler=lambda: None)
+    await jobs.enqueue(db, "noop", {}, delay=30)
+    await db.commit()
+
+    assert await job_crud.claim_jobs(db, {"noop": 1}, jobs._now(), lease_seconds=60) == []
+
+
+async def test_failed_attempt_is_retried(db, job_types):
+    calls = []
+
+    async def flaky(value: int) -> None:
+        calls.append(value)
+        if len(calls) == 1:
+            raise RuntimeError("first attempt fails")
+
+    jobs.register("flaky", flaky, max_attempts=3)
+    job_id = await jobs.enqueue(db, "flaky", {"value": 7})
+    await db.commit()
+
+    worker, job = await run_worker(job_id, "done")
+
+    assert calls == [7, 7]
+    assert job.attempts == 2
+    assert job.last_error == "RuntimeError: first attempt fails"
+    assert worker.counters["retried"] == 1
+
+
+async def test_job_fails_after_max_attempts(db, job_types):
+    async def broken() -> None:
+        raise ValueError("always")
+
+    jobs.register("broken", broken, max_attempts=2)
+    job_id = await jobs.enqueue(db, "broken", {})
+    await db.commit()
+
+    worker, job = await run_worker(job_id, "failed")
+
+    assert job.attempts == 2
+    assert job.last_error == "ValueError: always"
+    assert job.finished_at is not None
+    assert worker.counters["failed"] == 1
@@ -0,0 +1,113 @@
+import io
+import wave
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app.models.upload import UploadSession
+from app.services import tasks
+
+MiB = 1024 * 1024
+CHUNK = 128 * 1024  # RESUMABLE_CHUNK_SIZE из conftest, больше QUOTA_MULTIPART_SLACK_BYTES
+
+
+def make_wav(seconds: float = 1.0, sample_rate: int = 22050) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x01" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+async def usage(client, headers) -> int:
+    response = await client.get("/api/v1/audio/quota", headers=headers)
+    assert response.status_code == 200
+    return response.json()["used"]
+
+
+async def initiate(client, headers, total_size: int | None, filename: str = "track.wav"):
+    body = {"filename": filename}
+    if total_size is not None:
+        body["total_size"] = total_size
+    return await client.post("/api/v1/audio/uploads", json=body, headers=headers)
+
+
+async def test_initiate_requires_total_size_under_quota(client, make_user):
+    _, headers = await make_user(quota=MiB)
+
+    response = await initiate(client, headers, None)
+
+    assert response.status_code == 400
+    assert await usage(client, headers) == 0
+
+
+async def test_initiate_reserves_declared_size(client, make_user):
+    _, headers = await make_user(quota=MiB)
+
+    assert (await initiate(client, headers, 2 * MiB)).status_code == 413
+    assert (await initiate(client, headers, 600 * 1024, "a.wav")).status_code == 201
+    assert await usage(client, headers) == 600 * 1024
+    # Вторая загрузка уже не помещается рядом с резервом первой
+    assert (await initiate(client, headers, 600 * 1024, "b.wav")).status_code == 413
+
+
+async def test_abort_releases_reservation(client, make_user):
+    _, headers = await make_user(quota=MiB)
+    upload = (await initiate(client, headers, 500_000)).json()
+
+    response = await client.delete(f"/api/v1/audio/uploads/{upload['upload_id']}", headers=headers)
+
+    assert response.status_code == 204
+    assert await usage(client, headers) == 0
+
+
+async def test_chunks_use_reservation_not_remaining_quota(client, make_user):
+    _, headers = await make_user(quota=4 * CHUNK)
+    upload = (await initiate(client, headers, 4 * CHUNK)).json()
+    url = f"/api/v1/audio/uploads/{upload['upload_id']}/chunks"
+
+    # Резерв занял всю квоту, но части уже учтены в нём
+    for index in range(4):
+        response = await client.put(f"{url}/{index}", content=b"x" * CHUNK, headers=headers)
+        assert response.status_code == 200, response.text
+
+    assert (await client.put(f"{url}/4", content=b"x", headers=headers)).status_code == 400
+    assert await usage(client, headers) == 4 * CHUNK
+
+
+async def test_chunk_beyond_total_size_is_rejected(client, make_user):
+    _, headers = await make_user(quota=MiB)
+    upload = (await initiate(client, headers, CHUNK + 10)).json()
+    url = f"/api/v1/audio/uploads/{upload['upload_id']}/chunks"
+
+    assert (await client.put(f"{url}/1", content=b"x" * 11, headers=headers)).status_code == 400
+    assert (await client.put(f"{url}/1", content=b"x" * 10, headers=headers)).status_code == 200
+
+
+async def test_complete_keeps_size_in_quota(client, make_user):
+    _, headers = await make_user(quota=MiB)
+    data = make_wav(seconds=4)
+    upload = (await initiate(client, headers, len(data))).json()
+    url = f"/api/v1/audio/uploads/{upload['upload_id']}"
+    chunks = [data[start:start + CHUNK] for start in range(0, len(data), CHUNK)]
+    for index, chunk in enumerate(chunks):
+        assert (await client.put(f"{url}/chunks/{index}", content=chunk, headers=headers)).status_code == 200
+
+    response = await client.post(f"{url}/complete", json={"total_chunks": len(chunks)}, headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert await usage(client, headers) == len(data)
+    assert (await client.get(url, headers=headers)).status_code == 404
+
+
+async def test_expired_upload_releases_reservation(client, make_user, db):
+    _, headers = await make_user(quota=MiB)
+    assert (await initiate(client, headers, 300_000)).status_code == 201
+    await db.execute(update(UploadSession).values(expires_at=datetime.now(timezone.utc) - timedelta(minutes=1)))
+    await db.commit()
+
+    await tasks.purge_expired_uploads()
+
+    assert await usage(client, headers) == 0